@@ -0,0 +1,153 @@
+"""
+Admission control and load shedding for the `/chat` endpoint.
+
+When the LLM provider slows down, every request holds its worker thread for
+longer, new requests keep arriving, and eventually all of them time out
+together. Admission control bounds that:
+
+- At most `ADMISSION_MAX_CONCURRENT` requests run the pipeline at once.
+- Up to `ADMISSION_MAX_QUEUE` more wait for a slot, first come first served,
+  for at most `ADMISSION_QUEUE_TIMEOUT_S`.
+- Anything beyond that is shed immediately with a 503 and a `Retry-After`
+  estimated from the current queue and recent request latency.
+
+Admitted requests therefore never wait behind an unbounded backlog. Each
+session is also rate-limited by a token bucket, and a session that exceeds it
+gets a 429 with the time until its next token.
+"""
+
+# --- Core Imports ---
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# --- Local Imports ---
+import metrics
+
+# --- Admission Settings ---
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT_S = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "5"))
+
+# Questions per minute each session may ask, with bursts of up to SESSION_BURST.
+SESSION_RATE_PER_MINUTE = float(os.getenv("SESSION_RATE_PER_MINUTE", "10"))
+SESSION_BURST = int(os.getenv("SESSION_BURST", "5"))
+RATE_LIMIT_MAX_SESSIONS = int(os.getenv("RATE_LIMIT_MAX_SESSIONS", "10000"))
+
+ADMISSIONS = metrics.Counter(
+    "badgerbot_admissions_total",
+    "Admission decisions (admitted, queued, shed_queue_full, shed_queue_timeout, rate_limited).",
+    "outcome",
+)
+QUEUE_WAIT_SECONDS = metrics.Histogram(
+    "badgerbot_admission_queue_wait_seconds",
+    "Time admitted requests waited for a concurrency slot.",
+    "endpoint",
+)
+
+
+class Rejected(Exception):
+    """Raised when a request is not admitted. Carries the HTTP status and a retry delay."""
+
+    def __init__(self, status_code: int, detail: str, retry_after_s: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after_s = retry_after_s
+
+    @property
+    def headers(self) -> dict:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after_s)))}
+
+# --- Concurrency Limiter ---
+
+class AdmissionController:
+    """
+    A concurrency limit with a bounded FIFO queue. A finishing request hands
+    its slot directly to the oldest waiter, so new arrivals cannot jump the
+    queue.
+    """
+
+    def __init__(self, endpoint: str, max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 max_queue: int = ADMISSION_MAX_QUEUE, queue_timeout_s: float = ADMISSION_QUEUE_TIMEOUT_S):
+        self.endpoint = endpoint
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def retry_after_s(self) -> float:
+        """Estimates how long the current queue takes to drain, from the median request latency."""
+        median = metrics.REQUEST_SECONDS.quantile(self.endpoint, 0.5) or 1.0
+        return median * (len(self._waiters) + 1) / max(1, self.max_concurrent)
+
+    @contextmanager
+    def admit(self):
+        """Holds a concurrency slot for the enclosed block, or raises `Rejected`."""
+        start = time.perf_counter()
+        with self._lock:
+            if self.active < self.max_concurrent and not self._waiters:
+                self.active += 1
+                waiter = None
+            elif len(self._waiters) >= self.max_queue:
+                ADMISSIONS.inc("shed_queue_full")
+                raise Rejected(503, "The service is overloaded. Please retry shortly.", self.retry_after_s())
+            else:
+                waiter = threading.Event()
+                self._waiters.append(waiter)
+                ADMISSIONS.inc("queued")
+
+        if waiter is not None and not waiter.wait(self.queue_timeout_s):
+            with self._lock:
+                # The slot may have been handed over just as the wait timed out.
+                if not waiter.is_set():
+                    self._waiters.remove(waiter)
+                    ADMISSIONS.inc("shed_queue_timeout")
+                    raise Rejected(503, "The service is overloaded. Please retry shortly.", self.retry_after_s())
+
+        ADMISSIONS.inc("admitted")
+        QUEUE_WAIT_SECONDS.observe(self.endpoint, time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._waiters:
+                    self._waiters.popleft().set()
+                else:
+                    self.active -= 1
+
+# --- Per-Session Rate Limits ---
+
+class SessionRateLimiter:
+    """Token buckets per session, keeping the most recently active sessions."""
+
+    def __init__(self, rate_per_minute: float = SESSION_RATE_PER_MINUTE, burst: int = SESSION_BURST,
+                 max_sessions: int = RATE_LIMIT_MAX_SESSIONS):
+        self.rate_per_s = rate_per_minute / 60
+        self.burst = burst
+        self.max_sessions = max_sessions
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key: str):
+        """Takes a token from the session's bucket, or raises `Rejected` with the time until the next one."""
+        if self.rate_per_s <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate_per_s)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                ADMISSIONS.inc("rate_limited")
+                raise Rejected(429, "Too many questions in this session. Please slow down.",
+                               (1 - tokens) / self.rate_per_s)
+            self._buckets[key] = (tokens - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_sessions:
+                self._buckets.popitem(last=False)
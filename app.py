@@ -9,32 +9,105 @@
  * Date: 09/08/25
  */
 
-import React, { useState, useEffect, useRef } from 'react';
+import React, { useState, useEffect, useLayoutEffect, useRef, useCallback } from 'react';
 
 // --- Type Definitions for TypeScript ---
 interface Message {
+  id: string;
   role: 'user' | 'assistant';
   content: string;
   isError?: boolean;
 }
 
+// The JSON body returned by `/chat`.
+interface ChatResponse {
+  answer: string;
+  session_id: string;
+  turn: number | null;
+  // True when the answer did not depend on any history, i.e. a session's first question.
+  cacheable: boolean;
+}
+
+interface CachedTurn {
+  question: string;
+  answer: string;
+}
+
 interface ChatMessageProps {
   message: Message;
+  // Plays the entrance animation; off for messages scrolled back into view.
+  animate: boolean;
 }
 
+interface MessageListProps {
+  messages: Message[];
+  // Rendered after the messages, e.g. the loading indicator.
+  children?: React.ReactNode;
+}
+
+interface WebGLBackgroundProps {
+  // Stops the animation, e.g. while an answer is loading, keeping the last frame.
+  paused?: boolean;
+}
+
+// --- Background Settings ---
+// The shader is drawn into a smaller buffer that the browser scales up: the
+// effect is soft, so the lost detail is invisible and far fewer pixels are shaded.
+const BACKGROUND_RESOLUTION_SCALE = 0.5;
+const BACKGROUND_MAX_FPS = 30;
+// Optional URL of a pre-rendered frame. When set, it replaces the shader if
+// WebGL is unavailable or the user prefers reduced motion.
+const BACKGROUND_STATIC_IMAGE = '';
+
+const prefersReducedMotion = () =>
+  typeof window !== 'undefined' && window.matchMedia('(prefers-reduced-motion: reduce)').matches;
+
 // --- Component: WebGLBackground ---
 // Renders a visually engaging, branded background to enhance user immersion
-// and reinforce the UW-Madison identity.
-const WebGLBackground = () => {
+// and reinforce the UW-Madison identity. The animation only runs while the
+// tab is visible, the user allows motion, and it is not paused by the app.
+const WebGLBackground = ({ paused = false }: WebGLBackgroundProps) => {
   const canvasRef = useRef<HTMLCanvasElement>(null);
+  const pausedRef = useRef(paused);
+  // Set by the render effect so the `paused` prop can start and stop the loop.
+  const updateLoopRef = useRef<() => void>(() => {});
+  const [showStaticImage, setShowStaticImage] = useState(
+    () => BACKGROUND_STATIC_IMAGE !== '' && prefersReducedMotion()
+  );
+  // Set when WebGL is unavailable, so the static image is never swapped back out.
+  const webglUnavailableRef = useRef(false);
+
+  useEffect(() => {
+    pausedRef.current = paused;
+    updateLoopRef.current();
+  }, [paused]);
 
   useEffect(() => {
+    const motionQuery = window.matchMedia('(prefers-reduced-motion: reduce)');
+
+    // While the static image stands in for reduced motion, the canvas is not
+    // mounted. Once motion is allowed again, the canvas comes back and this
+    // effect re-runs to set up a fresh WebGL context on it.
+    if (showStaticImage) {
+      if (webglUnavailableRef.current) return;
+      const handleMotionChange = () => {
+        if (!motionQuery.matches) setShowStaticImage(false);
+      };
+      motionQuery.addEventListener('change', handleMotionChange);
+      handleMotionChange();
+      return () => motionQuery.removeEventListener('change', handleMotionChange);
+    }
+
     const canvas = canvasRef.current;
     if (!canvas) return;
 
-    const gl = canvas.getContext('webgl');
+    const gl = canvas.getContext('webgl', { antialias: false, depth: false, powerPreference: 'low-power' });
     if (!gl) {
       console.error("WebGL is not supported.");
+      if (BACKGROUND_STATIC_IMAGE) {
+        webglUnavailableRef.current = true;
+        setShowStaticImage(true);
+      }
       return;
     }
 
@@ -140,59 +213,279 @@ const WebGLBackground = () => {
     const resolutionUniformLocation = gl.getUniformLocation(program, "u_resolution");
     const timeUniformLocation = gl.getUniformLocation(program, "u_time");
 
-    let animationFrameId: number;
-    const render = (time: number) => {
-      time *= 0.001; // convert to seconds
-      
-      // Resize canvas to match display size
-      const { clientWidth, clientHeight } = gl.canvas;
-      if (gl.canvas.width !== clientWidth || gl.canvas.height !== clientHeight) {
-        gl.canvas.width = clientWidth;
-        gl.canvas.height = clientHeight;
-        gl.viewport(0, 0, gl.drawingBufferWidth, gl.drawingBufferHeight);
-      }
-      
-      gl.uniform2f(resolutionUniformLocation, gl.canvas.width, gl.canvas.height);
-      gl.uniform1f(timeUniformLocation, time);
-
+    // Sizes the drawing buffer to a fraction of the display size. The viewport
+    // and resolution uniform only change when the size does.
+    const resize = () => {
+      const width = Math.max(1, Math.floor(canvas.clientWidth * BACKGROUND_RESOLUTION_SCALE));
+      const height = Math.max(1, Math.floor(canvas.clientHeight * BACKGROUND_RESOLUTION_SCALE));
+      if (canvas.width === width && canvas.height === height) return false;
+      canvas.width = width;
+      canvas.height = height;
+      gl.viewport(0, 0, gl.drawingBufferWidth, gl.drawingBufferHeight);
+      gl.uniform2f(resolutionUniformLocation, width, height);
+      return true;
+    };
+    gl.uniform2f(resolutionUniformLocation, canvas.width, canvas.height);
+
+    // Animation time only advances while frames are drawn, so the effect
+    // resumes where it stopped instead of jumping ahead after a pause.
+    const frameInterval = 1000 / BACKGROUND_MAX_FPS;
+    let elapsed = 0;
+    let lastDrawn: number | null = null;
+    let animationFrameId: number | null = null;
+
+    const draw = () => {
+      resize();
+      gl.uniform1f(timeUniformLocation, elapsed * 0.001);
       gl.drawArrays(gl.TRIANGLE_STRIP, 0, 4);
+    };
+
+    const render = (now: number) => {
       animationFrameId = requestAnimationFrame(render);
+      // The 1 ms slack keeps a 60 Hz display at an even 30 fps despite timer jitter.
+      if (lastDrawn !== null && now - lastDrawn < frameInterval - 1) return;
+      elapsed += lastDrawn === null ? 0 : Math.min(now - lastDrawn, 4 * frameInterval);
+      lastDrawn = now;
+      draw();
     };
-    
-    animationFrameId = requestAnimationFrame(render);
-    
-    return () => {
-      cancelAnimationFrame(animationFrameId);
+
+    // Runs the loop only when it is wanted. With reduced motion, a single
+    // still frame is drawn, or the static image replaces the canvas if one is
+    // configured; the loop is never started on a canvas that is being removed.
+    const updateLoop = () => {
+      const showImage = motionQuery.matches && BACKGROUND_STATIC_IMAGE !== '';
+      const animate = !document.hidden && !pausedRef.current && !motionQuery.matches;
+      if (animate && animationFrameId === null) {
+        lastDrawn = null;
+        animationFrameId = requestAnimationFrame(render);
+      } else if (!animate && animationFrameId !== null) {
+        cancelAnimationFrame(animationFrameId);
+        animationFrameId = null;
+      }
+      if (showImage) setShowStaticImage(true);
+      else if (motionQuery.matches) draw();
     };
-  }, []);
 
+    // A resize clears the drawing buffer, so a stopped loop redraws its frame.
+    const handleResize = () => {
+      if (animationFrameId === null && resize()) draw();
+    };
+
+    updateLoopRef.current = updateLoop;
+    document.addEventListener('visibilitychange', updateLoop);
+    motionQuery.addEventListener('change', updateLoop);
+    window.addEventListener('resize', handleResize);
+    draw();
+    updateLoop();
+
+    return () => {
+      updateLoopRef.current = () => {};
+      document.removeEventListener('visibilitychange', updateLoop);
+      motionQuery.removeEventListener('change', updateLoop);
+      window.removeEventListener('resize', handleResize);
+      if (animationFrameId !== null) cancelAnimationFrame(animationFrameId);
+
+      // Release the GPU resources now rather than whenever the context is collected.
+      gl.deleteBuffer(positionBuffer);
+      gl.deleteProgram(program);
+      gl.deleteShader(vertexShader);
+      gl.deleteShader(fragmentShader);
+
+      // A lost context can never be restored on this canvas. React StrictMode
+      // cleans up and re-runs effects on the same canvas in development, so the
+      // context is only released once the canvas has really left the page.
+      setTimeout(() => {
+        if (!canvas.isConnected) gl.getExtension('WEBGL_lose_context')?.loseContext();
+      }, 0);
+    };
+  }, [showStaticImage]);
+
+  if (showStaticImage) {
+    return (
+      <div
+        className="absolute top-0 left-0 w-full h-full -z-10 bg-cover bg-center"
+        style={{ backgroundImage: `url(${BACKGROUND_STATIC_IMAGE})` }}
+      />
+    );
+  }
   return <canvas ref={canvasRef} className="absolute top-0 left-0 w-full h-full -z-10" />;
 };
 
 
+// --- Response Cache (IndexedDB) ---
+// Only answers that do not depend on conversation history are cacheable: the
+// backend marks the answers to a session's first question (including FAQ
+// answers) as `cacheable`. They are keyed on the normalized question alone and
+// only served for the first question of a new conversation, so a follow-up such
+// as "What are its prerequisites?" always reaches the backend, which resolves it
+// against the history. A first answer served from the cache is sent along with
+// the next question, so the backend starts the session with it.
+const CACHE_DB_NAME = 'badgerbot';
+const CACHE_STORE = 'responses';
+const CACHE_MAX_ENTRIES = 200;
+const CACHE_TTL_MS = 24 * 60 * 60 * 1000;
+
+interface CachedResponse {
+  key: string;
+  answer: string;
+  storedAt: number;
+}
+
+// Matches the backend's `normalize_question`: case, whitespace, and trailing punctuation.
+const normalizeQuestion = (question: string) =>
+  question.replace(/\s+/g, ' ').trim().replace(/[?.!]+$/, '').trim().toLowerCase();
+
+
+let cacheDbPromise: Promise<IDBDatabase | null> | null = null;
+
+// Opens the cache database once. Without IndexedDB (e.g. some private modes) the app runs uncached.
+const openCacheDb = (): Promise<IDBDatabase | null> => {
+  if (!cacheDbPromise) {
+    cacheDbPromise = new Promise(resolve => {
+      if (typeof indexedDB === 'undefined') return resolve(null);
+      const request = indexedDB.open(CACHE_DB_NAME, 1);
+      request.onupgradeneeded = () => {
+        const store = request.result.createObjectStore(CACHE_STORE, { keyPath: 'key' });
+        store.createIndex('storedAt', 'storedAt');
+      };
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => resolve(null);
+    });
+  }
+  return cacheDbPromise;
+};
+
+const getCachedResponse = async (key: string): Promise<string | null> => {
+  const db = await openCacheDb();
+  if (!db) return null;
+  return new Promise(resolve => {
+    const request = db.transaction(CACHE_STORE, 'readonly').objectStore(CACHE_STORE).get(key);
+    request.onsuccess = () => {
+      const entry = request.result as CachedResponse | undefined;
+      resolve(entry && Date.now() - entry.storedAt < CACHE_TTL_MS ? entry.answer : null);
+    };
+    request.onerror = () => resolve(null);
+  });
+};
+
+// Stores an answer and evicts the oldest entries beyond CACHE_MAX_ENTRIES.
+const putCachedResponse = async (key: string, answer: string) => {
+  const db = await openCacheDb();
+  if (!db) return;
+  const store = db.transaction(CACHE_STORE, 'readwrite').objectStore(CACHE_STORE);
+  store.put({ key, answer, storedAt: Date.now() } as CachedResponse);
+  const countRequest = store.count();
+  countRequest.onsuccess = () => {
+    let excess = countRequest.result - CACHE_MAX_ENTRIES;
+    if (excess <= 0) return;
+    store.index('storedAt').openCursor().onsuccess = (event) => {
+      const cursor = (event.target as IDBRequest<IDBCursorWithValue | null>).result;
+      if (cursor && excess-- > 0) {
+        cursor.delete();
+        cursor.continue();
+      }
+    };
+  };
+};
+
+// --- API Helpers ---
+
+let nextMessageId = 0;
+const newMessageId = () => `m${nextMessageId++}`;
+
+
 // --- Helper Components ---
 const Spinner = () => (
   <div className="w-6 h-6 border-4 border-gray-300 border-t-blue-500 rounded-full animate-spin"></div>
 );
 
+// --- Markdown Rendering ---
+// Answers use a small Markdown subset: paragraphs, line breaks, headings,
+// lists, bold, italics, inline code, and links. Text is HTML-escaped before
+// any markup is added, so an answer cannot inject HTML into the page.
+const escapeHtml = (text: string) =>
+  text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+
+const renderInline = (text: string) =>
+  escapeHtml(text)
+    .replace(/`([^`]+)`/g, '<code>$1</code>')
+    .replace(/\*\*([^*]+)\*\*/g, '<strong>$1</strong>')
+    .replace(/(^|[^*])\*([^*\s][^*]*)\*/g, '$1<em>$2</em>')
+    .replace(/\[([^\]]+)\]\((https?:\/\/[^\s)]+)\)/g, '<a href="$2" target="_blank" rel="noopener noreferrer">$1</a>');
+
+// Renders one block (text between blank lines) to HTML.
+const renderBlock = (block: string): string => {
+  let html = '';
+  let list: 'ul' | 'ol' | null = null;
+  let paragraph: string[] = [];
+
+  const flushParagraph = () => {
+    if (paragraph.length) html += `<p>${paragraph.map(renderInline).join('<br />')}</p>`;
+    paragraph = [];
+  };
+  const closeList = () => {
+    if (list) html += `</${list}>`;
+    list = null;
+  };
+
+  for (const line of block.split('\n')) {
+    const heading = line.match(/^(#{1,4})\s+(.*)$/);
+    const item = line.match(/^\s*(?:([-*+])|\d+[.)])\s+(.*)$/);
+    if (heading) {
+      flushParagraph();
+      closeList();
+      const level = heading[1].length + 2;
+      html += `<h${level}>${renderInline(heading[2])}</h${level}>`;
+    } else if (item) {
+      flushParagraph();
+      const type = item[1] ? 'ul' : 'ol';
+      if (list !== type) {
+        closeList();
+        html += `<${type}>`;
+        list = type;
+      }
+      html += `<li>${renderInline(item[2])}</li>`;
+    } else {
+      closeList();
+      paragraph.push(line);
+    }
+  }
+  flushParagraph();
+  closeList();
+  return html;
+};
+
+// A block is only parsed when its text changes. Text appended to a message only
+// extends its last block, so the earlier blocks are never re-parsed.
+const MarkdownBlock = React.memo(({ source }: { source: string }) => (
+  <div dangerouslySetInnerHTML={{ __html: renderBlock(source) }} />
+));
+
+const MarkdownContent = ({ content }: { content: string }) => (
+  <div className="prose prose-sm">
+    {content.split(/\n{2,}/).map((block, index) => <MarkdownBlock key={index} source={block} />)}
+  </div>
+);
+
 // Component: ChatMessage - Displays a single user or bot message, ensuring a clear, readable chat history.
-const ChatMessage: React.FC<ChatMessageProps> = ({ message }) => {
+// Memoized: messages are immutable, so only new messages render.
+const ChatMessage = React.memo(({ message, animate }: ChatMessageProps) => {
   const { role, content, isError } = message;
   const isUser = role === 'user';
 
   return (
-    <div className={`flex items-start gap-3 my-4 ${isUser ? 'justify-end' : 'justify-start'}`}>
+    <div className={`flex items-start gap-3 py-2 ${isUser ? 'justify-end' : 'justify-start'}`}>
       {!isUser && (
         <div className="w-10 h-10 bg-gray-700 rounded-full flex items-center justify-center text-white font-bold flex-shrink-0">
           B
         </div>
       )}
       <div 
-        className={`p-4 max-w-lg rounded-2xl shadow-md animate-fade-in-up
+        className={`p-4 max-w-lg rounded-2xl shadow-md ${animate ? 'animate-fade-in-up' : ''}
           ${isUser ? 'bg-blue-600 text-white rounded-br-none' : 'bg-white text-gray-800 rounded-bl-none'}
           ${isError ? 'bg-red-100 text-red-800 border border-red-300' : ''}`}
       >
-        <div className="prose prose-sm" dangerouslySetInnerHTML={{ __html: content.replace(/\n/g, '<br />') }} />
+        <MarkdownContent content={content} />
       </div>
        {isUser && (
         <div className="w-10 h-10 bg-gray-300 rounded-full flex items-center justify-center text-gray-600 font-bold flex-shrink-0">
@@ -201,6 +494,126 @@ const ChatMessage: React.FC<ChatMessageProps> = ({ message }) => {
       )}
     </div>
   );
+});
+
+// --- Component: MessageList ---
+// Renders only the messages in or near the viewport, with spacers standing in
+// for the rest, so long sessions stay cheap to render. Message heights are
+// measured as they render; unmeasured ones use an estimate. The list follows
+// new messages only while the user is at the bottom, and jumps there instead
+// of starting a smooth scroll on every update.
+const ESTIMATED_MESSAGE_HEIGHT = 120;
+const OVERSCAN_PX = 800;
+const STICK_TO_BOTTOM_PX = 80;
+
+const MessageList = ({ messages, children }: MessageListProps) => {
+  const scrollRef = useRef<HTMLElement>(null);
+  const heightsRef = useRef(new Map<string, number>());
+  const animatedRef = useRef(new Set<string>());
+  const stickToBottomRef = useRef(true);
+  const lastMessageIdRef = useRef<string | null>(null);
+  const scrollFrameRef = useRef<number | null>(null);
+  const [viewport, setViewport] = useState({ top: 0, height: 0 });
+  const [, setMeasured] = useState(0);
+
+  const observerRef = useRef<ResizeObserver | null>(null);
+  if (observerRef.current === null && typeof ResizeObserver !== 'undefined') {
+    observerRef.current = new ResizeObserver(entries => {
+      let changed = false;
+      for (const entry of entries) {
+        const element = entry.target as HTMLElement;
+        // Elements of messages scrolled out of view are detached, not resized.
+        if (!element.isConnected) {
+          observerRef.current?.unobserve(element);
+          continue;
+        }
+        const id = element.dataset.messageId as string;
+        const height = element.offsetHeight;
+        if (heightsRef.current.get(id) !== height) {
+          heightsRef.current.set(id, height);
+          changed = true;
+        }
+      }
+      if (changed) setMeasured(version => version + 1);
+    });
+  }
+
+  const measure = useCallback((element: HTMLDivElement | null) => {
+    if (element) observerRef.current?.observe(element);
+  }, []);
+
+  const updateViewport = useCallback(() => {
+    scrollFrameRef.current = null;
+    const element = scrollRef.current;
+    if (!element) return;
+    stickToBottomRef.current =
+      element.scrollHeight - element.scrollTop - element.clientHeight < STICK_TO_BOTTOM_PX;
+    setViewport(prev => (prev.top === element.scrollTop && prev.height === element.clientHeight)
+      ? prev
+      : { top: element.scrollTop, height: element.clientHeight });
+  }, []);
+
+  const handleScroll = () => {
+    if (scrollFrameRef.current === null) scrollFrameRef.current = requestAnimationFrame(updateViewport);
+  };
+
+  useEffect(() => {
+    updateViewport();
+    window.addEventListener('resize', handleScroll);
+    return () => {
+      window.removeEventListener('resize', handleScroll);
+      if (scrollFrameRef.current !== null) cancelAnimationFrame(scrollFrameRef.current);
+      observerRef.current?.disconnect();
+    };
+  }, []);
+
+  // A question the user just asked always brings the list back to the bottom.
+  const lastMessage = messages[messages.length - 1];
+  if (lastMessage && lastMessage.id !== lastMessageIdRef.current) {
+    lastMessageIdRef.current = lastMessage.id;
+    if (lastMessage.role === 'user') stickToBottomRef.current = true;
+  }
+
+  // Runs after every render, before paint, so following the answer never flickers.
+  useLayoutEffect(() => {
+    const element = scrollRef.current;
+    if (element && stickToBottomRef.current) element.scrollTop = element.scrollHeight;
+    messages.forEach(message => animatedRef.current.add(message.id));
+  });
+
+  // Find the window of messages to render from the measured (or estimated) heights.
+  const heights = messages.map(message => heightsRef.current.get(message.id) ?? ESTIMATED_MESSAGE_HEIGHT);
+  const windowTop = viewport.top - OVERSCAN_PX;
+  const windowBottom = viewport.top + viewport.height + OVERSCAN_PX;
+  let first = messages.length;
+  let last = -1;
+  let paddingTop = 0;
+  let paddingBottom = 0;
+  let offset = 0;
+  heights.forEach((height, index) => {
+    if (offset + height < windowTop) paddingTop += height;
+    else if (offset > windowBottom) paddingBottom += height;
+    else {
+      first = Math.min(first, index);
+      last = index;
+    }
+    offset += height;
+  });
+
+  return (
+    <main ref={scrollRef} onScroll={handleScroll} className="flex-1 overflow-y-auto p-6">
+      <div className="max-w-3xl mx-auto">
+        <div style={{ paddingTop, paddingBottom }}>
+          {messages.slice(first, last + 1).map((msg) => (
+            <div key={msg.id} ref={measure} data-message-id={msg.id}>
+              <ChatMessage message={msg} animate={!animatedRef.current.has(msg.id)} />
+            </div>
+          ))}
+        </div>
+        {children}
+      </div>
+    </main>
+  );
 };
 
 
@@ -209,70 +622,110 @@ const ChatMessage: React.FC<ChatMessageProps> = ({ message }) => {
 // state management, and API communication.
 const App: React.FC = () => {
   const [messages, setMessages] = useState<Message[]>([
-    { role: 'assistant', content: "Hello! How can I help you with the Computer Sciences major today?" }
+    { id: 'greeting', role: 'assistant', content: "Hello! How can I help you with the Computer Sciences major today?" }
   ]);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [sessionId, setSessionId] = useState<string | null>(null);
+  // The session's turn counter from the last response. Echoing it back lets the
+  // backend serve the history from its in-process cache when it is current.
+  const [turn, setTurn] = useState<number | null>(null);
+  // A first answer served from the browser cache, not yet recorded by the backend.
+  const [cachedTurn, setCachedTurn] = useState<CachedTurn | null>(null);
 
-  const messagesEndRef = useRef<HTMLDivElement>(null);
+  // The request still in flight, so a new question (or unmounting) can cancel it.
+  // Aborting only stops the browser waiting: the backend still answers the
+  // abandoned question and records it in the session history, so later answers
+  // may take it into account even though it was never shown. The client's
+  // `turn` is then behind, which makes the backend re-read the history.
+  const abortControllerRef = useRef<AbortController | null>(null);
 
-  useEffect(() => {
-    messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
-  }, [messages]);
+  useEffect(() => () => abortControllerRef.current?.abort(), []);
+
+  const addMessage = (message: Message) => setMessages(prev => [...prev, message]);
 
   // Function: handleSubmit - Manages the full user interaction cycle:
   // sending the query, handling the loading state, and rendering the AI response.
+  // Asking a new question cancels the previous one if it is still in flight.
   const handleSubmit = async (e: React.FormEvent<HTMLFormElement>) => {
     e.preventDefault();
-    if (!input.trim() || isLoading) return;
+    const question = input;
+    if (!question.trim()) return;
+
+    abortControllerRef.current?.abort();
+    const controller = new AbortController();
+    abortControllerRef.current = controller;
 
-    const userMessage: Message = { role: 'user', content: input };
-    setMessages(prev => [...prev, userMessage]);
+    addMessage({ id: newMessageId(), role: 'user', content: question });
     setInput('');
-    setIsLoading(true);
 
+    // 1. The first question of a conversation may be answered from the browser cache.
+    const isFirstQuestion = !sessionId && !cachedTurn;
+    const cached = isFirstQuestion ? await getCachedResponse(normalizeQuestion(question)) : null;
+    if (controller.signal.aborted) return;
+    if (cached !== null) {
+      addMessage({ id: newMessageId(), role: 'assistant', content: cached });
+      setCachedTurn({ question, answer: cached });
+      abortControllerRef.current = null;
+      setIsLoading(false);
+      return;
+    }
+
+    setIsLoading(true);
     try {
       // Configuration: The API endpoint for the backend. This must be updated post-deployment.
       const API_URL = "https://your-api-gateway-url.execute-api-us-east-1.amazonaws.com/prod/chat"; 
 
       const payload = {
-        question: input,
+        question: question,
         session_id: sessionId,
+        turn: turn,
+        cached_turn: sessionId ? null : cachedTurn,
       };
 
+      // 2. Ask the backend. A newer question aborts this request.
       const response = await fetch(API_URL, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(payload),
+        signal: controller.signal,
       });
 
       if (!response.ok) {
         throw new Error(`API Error: ${response.status} ${response.statusText}`);
       }
 
-      const result = await response.json();
+      const result: ChatResponse = await response.json();
+      if (controller.signal.aborted) return;
 
-      const assistantMessage: Message = { role: 'assistant', content: result.answer };
-      setMessages(prev => [...prev, assistantMessage]);
+      // 3. Show the answer, and cache it if it did not depend on the history.
+      addMessage({ id: newMessageId(), role: 'assistant', content: result.answer });
       setSessionId(result.session_id);
+      setTurn(result.turn);
+      setCachedTurn(null);
+      if (result.cacheable) putCachedResponse(normalizeQuestion(question), result.answer);
 
     } catch (err: any) {
+      // Replaced by a newer question, which shows its own answer.
+      if (err.name === 'AbortError') return;
       console.error("Failed to fetch from API:", err);
-      const errorMessage: Message = { 
+      addMessage({
+        id: newMessageId(),
         role: 'assistant', 
         content: `**Error:** Could not connect to the advisor API. Please try again later.\n\n*Details: ${err.message}*`,
         isError: true 
-      };
-      setMessages(prev => [...prev, errorMessage]);
+      });
     } finally {
-      setIsLoading(false);
+      if (abortControllerRef.current === controller) {
+        abortControllerRef.current = null;
+        setIsLoading(false);
+      }
     }
   };
 
   return (
     <div className="font-sans h-screen flex flex-col relative isolate overflow-hidden">
-      <WebGLBackground />
+      <WebGLBackground paused={isLoading} />
       {/* Header */}
       <header className="bg-white/70 backdrop-blur-sm shadow-md p-4 flex items-center justify-between border-b border-white/20">
         <div className="flex items-center gap-3">
@@ -287,23 +740,19 @@ const App: React.FC = () => {
       </header>
       
       {/* Chat Messages Area */}
-      <main className="flex-1 overflow-y-auto p-6">
-        <div className="max-w-3xl mx-auto">
-          {messages.map((msg, index) => <ChatMessage key={index} message={msg} />)}
-          {isLoading && (
-            <div className="flex items-start gap-3 my-4 justify-start">
-               <div className="w-10 h-10 bg-gray-700 rounded-full flex items-center justify-center text-white font-bold flex-shrink-0">
-                  B
-               </div>
-              <div className="p-4 max-w-lg rounded-2xl shadow-md bg-white text-gray-800 rounded-bl-none flex items-center">
-                <Spinner />
-                <span className="ml-3 text-gray-500">BadgerBot is thinking...</span>
-              </div>
+      <MessageList messages={messages}>
+        {isLoading && (
+          <div className="flex items-start gap-3 my-4 justify-start">
+             <div className="w-10 h-10 bg-gray-700 rounded-full flex items-center justify-center text-white font-bold flex-shrink-0">
+                B
+             </div>
+            <div className="p-4 max-w-lg rounded-2xl shadow-md bg-white text-gray-800 rounded-bl-none flex items-center">
+              <Spinner />
+              <span className="ml-3 text-gray-500">BadgerBot is thinking...</span>
             </div>
-          )}
-          <div ref={messagesEndRef} />
-        </div>
-      </main>
+          </div>
+        )}
+      </MessageList>
 
       {/* Input Form */}
       <footer className="bg-white/70 backdrop-blur-sm border-t border-white/20 p-4">
@@ -315,12 +764,11 @@ const App: React.FC = () => {
               onChange={(e) => setInput(e.target.value)}
               placeholder="Ask a question about the CS major..."
               className="flex-1 p-3 border border-gray-300 rounded-full focus:outline-none focus:ring-2 focus:ring-blue-500 transition"
-              disabled={isLoading}
             />
             <button
               type="submit"
               className="bg-blue-600 text-white rounded-full p-3 hover:bg-blue-700 disabled:bg-gray-400 transition-colors"
-              disabled={isLoading || !input.trim()}
+              disabled={!input.trim()}
             >
               <svg xmlns="http://www.w3.org/2000/svg" className="h-6 w-6" fill="none" viewBox="0 0 24 24" stroke="currentColor">
                 <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M5 10l7-7m0 0l7 7m-7-7v18" />
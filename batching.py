@@ -0,0 +1,169 @@
+"""
+Micro-batching for the model forward passes of the UW-Madison CS Advisor backend.
+
+When the backend runs as a long-lived service, concurrent requests each embed
+their query and re-rank their candidates with a batch size of one. The
+`MicroBatcher` collects those small inputs from concurrent callers for a few
+milliseconds and runs them through the model as a single batched call.
+
+The collection window only opens when there is evidence of concurrency, so a
+lone request is flushed immediately and pays no extra latency.
+"""
+
+# --- Core Imports ---
+import os
+import queue
+import threading
+import time
+from typing import List, Tuple
+
+# --- LangChain Imports ---
+from langchain_core.embeddings import Embeddings
+from langchain_community.cross_encoders import BaseCrossEncoder
+
+# --- Local Imports ---
+import metrics
+
+# Default tuning, overridable through the environment.
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "3"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+
+BATCH_SIZE = metrics.Histogram(
+    "badgerbot_model_batch_size",
+    "Number of inputs per batched model forward pass.",
+    "batcher",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+
+class _Submission:
+    """A caller's inputs, waiting to be folded into the next batch."""
+
+    def __init__(self, items: list):
+        self.items = items
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Groups list inputs from concurrent callers into one call of `batch_fn`.
+
+    `batch_fn` must accept a list of inputs and return a list of results of the
+    same length and order. Each caller gets back exactly the slice of results
+    that corresponds to its own inputs.
+    """
+
+    def __init__(self, batch_fn, name: str, max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        # Whether the previous batch contained more than one submission. Used
+        # as the signal that requests are currently arriving concurrently.
+        self._contended = False
+
+    def submit(self, items: list) -> list:
+        """Queues `items` for the next batch and blocks until its results are ready."""
+        if not items:
+            return []
+        if self.max_wait <= 0:
+            BATCH_SIZE.observe(self.name, len(items))
+            return self.batch_fn(items)
+
+        self._ensure_worker()
+        submission = _Submission(items)
+        self._queue.put(submission)
+        submission.done.wait()
+        if submission.error is not None:
+            raise submission.error
+        return submission.results
+
+    def _ensure_worker(self):
+        """Starts the background worker thread on first use."""
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        """Blocks for the first submission, then gathers any that join within the window."""
+        batch = [self._queue.get()]
+        size = len(batch[0].items)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                # Without recent contention, only take what is already queued;
+                # a lone request should not wait for company that isn't coming.
+                if self._contended:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    submission = self._queue.get(timeout=remaining)
+                else:
+                    submission = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(submission)
+            size += len(submission.items)
+        self._contended = len(batch) > 1
+        return batch
+
+    def _run(self):
+        """Worker loop: collect a batch, run one forward pass, and hand back the slices."""
+        while True:
+            batch = self._collect()
+            inputs = [item for submission in batch for item in submission.items]
+            BATCH_SIZE.observe(self.name, len(inputs))
+            try:
+                outputs = self.batch_fn(inputs)
+            except Exception as e:
+                for submission in batch:
+                    submission.error = e
+                    submission.done.set()
+                continue
+
+            offset = 0
+            for submission in batch:
+                submission.results = list(outputs[offset:offset + len(submission.items)])
+                offset += len(submission.items)
+                submission.done.set()
+
+# --- LangChain Adapters ---
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model so that concurrent `embed_query` calls are
+    computed together. Document embedding is already batched by the caller and
+    is passed straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self.batcher = MicroBatcher(embeddings.embed_documents, name="embed_query")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.submit([text])[0]
+
+
+class BatchedCrossEncoder(BaseCrossEncoder):
+    """
+    Wraps a cross-encoder so that the (query, chunk) pairs of concurrent
+    re-ranking calls are scored in one forward pass.
+    """
+
+    def __init__(self, cross_encoder: BaseCrossEncoder):
+        self.cross_encoder = cross_encoder
+        self.batcher = MicroBatcher(cross_encoder.score, name="rerank")
+
+    def score(self, text_pairs: List[Tuple[str, str]]) -> List[float]:
+        return self.batcher.submit(list(text_pairs))
@@ -0,0 +1,128 @@
+"""
+Benchmarks per-turn write cost and latency of the two chat-history layouts.
+
+Runs a long simulated conversation against a local DynamoDB stand-in, such as
+DynamoDB Local (`docker run -p 8000:8000 amazon/dynamodb-local`) or
+`moto_server`, once with the session-item layout and once with the per-turn
+layout. Both use temporary tables, which are deleted afterwards.
+
+For selected turns it reports the latency of writing the turn and of reading
+the history, the size of the item the write touched, and the write capacity
+units the write consumes. WCUs are derived from DynamoDB's item-size rules:
+one unit per started KB of the larger of the item before and after the write.
+
+Usage:
+    python benchmarks/bench_chat_store.py [--endpoint-url http://localhost:8000] [--turns 50]
+"""
+
+# --- Core Imports ---
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- AWS Imports ---
+import boto3
+
+# --- Local Imports ---
+from chat_store import SessionItemStore, TurnItemStore, create_turns_table, turn_item
+
+QUESTION = "Which courses do I still need for the advanced requirements if I have taken CS 400 and CS 354?"
+
+
+def item_size(value, name: str = "") -> int:
+    """Approximates the stored size of an attribute following DynamoDB's sizing rules."""
+    size = len(name.encode("utf-8"))
+    if isinstance(value, str):
+        return size + len(value.encode("utf-8"))
+    if isinstance(value, bool) or value is None:
+        return size + 1
+    if isinstance(value, (int, float, Decimal)):
+        return size + math.ceil(len(str(value).lstrip("-").replace(".", "")) / 2) + 1
+    if isinstance(value, dict):
+        return size + 3 + sum(1 + item_size(v, k) for k, v in value.items())
+    if isinstance(value, list):
+        return size + 3 + sum(1 + item_size(v) for v in value)
+    return size + len(str(value))
+
+
+def write_units(before: int, after: int) -> int:
+    return math.ceil(max(before, after, 1) / 1024)
+
+
+def create_session_table(dynamodb, name: str):
+    table = dynamodb.create_table(
+        TableName=name,
+        KeySchema=[{'AttributeName': 'session_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'session_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    table.wait_until_exists()
+    return table
+
+
+def run_layout(layout: str, store, table, turns: int, answer: str, report_turns: set) -> dict:
+    session_id = str(uuid.uuid4())
+    turn = 0
+    size_before = 0
+    rows = {}
+    for number in range(1, turns + 1):
+        start = time.perf_counter()
+        turn, _ = store.append(session_id, QUESTION, answer, turn)
+        write_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        store.load(session_id)
+        read_ms = (time.perf_counter() - start) * 1000
+
+        if layout == "session":
+            item = table.get_item(Key={'session_id': session_id})['Item']
+            size_after = item_size(item)
+            units = write_units(size_before, size_after)
+            size_before = size_after
+        else:
+            size_after = item_size(turn_item(session_id, turn, QUESTION, answer))
+            units = write_units(0, size_after)
+        rows[number] = (write_ms, read_ms, size_after, units)
+
+    for number in sorted(report_turns):
+        if number in rows:
+            write_ms, read_ms, size, units = rows[number]
+            print(f"{layout:<8} {number:>5} {write_ms:>10.2f} {read_ms:>10.2f} {size:>10} {units:>5}")
+    total_units = sum(row[3] for row in rows.values())
+    print(f"{layout:<8} total: {total_units} WCU over {turns} turns, "
+          f"median write {statistics.median(row[0] for row in rows.values()):.2f} ms")
+    return rows
+
+
+def run(endpoint_url: str, turns: int, answer_chars: int):
+    dynamodb = boto3.resource('dynamodb', endpoint_url=endpoint_url)
+    suffix = uuid.uuid4().hex[:8]
+    session_table = create_session_table(dynamodb, f"BenchChatSessions-{suffix}")
+    turns_table = create_turns_table(dynamodb, f"BenchChatTurns-{suffix}")
+    answer = ("The remaining advanced requirements can be met with CS 537, CS 540 and CS 577. " * 50)[:answer_chars]
+    report_turns = {1, 5, 10, 20, 30, 40, turns}
+
+    try:
+        print(f"{'layout':<8} {'turn':>5} {'write ms':>10} {'read ms':>10} {'item B':>10} {'WCU':>5}")
+        run_layout("session", SessionItemStore(session_table), session_table, turns, answer, report_turns)
+        run_layout("turns", TurnItemStore(turns_table), turns_table, turns, answer, report_turns)
+    finally:
+        session_table.delete()
+        turns_table.delete()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the session-item and per-turn chat-history layouts.")
+    parser.add_argument("--endpoint-url", default=os.getenv("DYNAMODB_ENDPOINT_URL", "http://localhost:8000"),
+                        help="Endpoint of the local DynamoDB stand-in.")
+    parser.add_argument("--turns", type=int, default=50, help="Turns in the simulated conversation.")
+    parser.add_argument("--answer-chars", type=int, default=1200, help="Length of each simulated answer.")
+    args = parser.parse_args()
+    run(args.endpoint_url, args.turns, args.answer_chars)
@@ -0,0 +1,80 @@
+"""
+Benchmarks the four-year-plan solver on worst-case inputs.
+
+The hardest inputs for the search are students with no completed coursework,
+many requested electives, and the fewest terms that still admit a schedule.
+The wide-catalog cases request the last 10 to 40 COMP SCI courses of the
+catalog and exercise the search budget (`PLAN_CAP_STATES`, `PLAN_MAX_STATES`,
+`PLAN_TIMEOUT_S`): each must finish, with a plan or a budget error, within
+about `PLAN_TIMEOUT_S`. Each scenario is solved repeatedly and the median and
+worst times are reported along with the number of search states explored.
+
+Usage:
+    python benchmarks/bench_planner.py [--runs 20]
+"""
+
+# --- Core Imports ---
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- Local Imports ---
+from knowledge_base import all_course_data
+from planner import generate_plan, PlanningError
+
+
+def terms(count: int) -> list:
+    """Returns `count` consecutive Fall/Spring term names starting in Fall 2026."""
+    names = []
+    year = 2026
+    for i in range(count):
+        names.append(f"{'Fall' if i % 2 == 0 else 'Spring'} {year + (i + 1) // 2}")
+    return names
+
+
+MANY_ELECTIVES = [
+    "CS 407", "CS 412", "CS 506", "CS 520", "CS 536", "CS 537", "CS 538", "CS 540",
+    "CS 541", "CS 542", "CS 544", "CS 552", "CS 559", "CS 564", "CS 570", "CS 577", "CS 642",
+]
+
+CS_CATALOG = [course["course_code"] for course in all_course_data if course["course_code"].startswith("COMP SCI")]
+
+SCENARIOS = [
+    ("zero credits, 8 terms", [], terms(8), []),
+    ("zero credits, 6 terms", [], terms(6), []),
+    ("zero credits, 17 electives, 8 terms", [], terms(8), MANY_ELECTIVES),
+    ("zero credits, 17 electives, 6 terms", [], terms(6), MANY_ELECTIVES),
+    ("sophomore, 4 terms", ["CS 200", "CS 300", "MATH 221", "MATH 222", "CS 240"], terms(4), []),
+    ("zero credits, 3 terms (infeasible)", [], terms(3), []),
+    ("wide catalog: last 10 CS, 6 terms", [], terms(6), CS_CATALOG[-10:]),
+    ("wide catalog: last 20 CS, 9 terms", [], terms(9), CS_CATALOG[-20:]),
+    ("wide catalog: last 40 CS, 9 terms", [], terms(9), CS_CATALOG[-40:]),
+    ("wide catalog: last 40 CS, 12 terms", [], terms(12), CS_CATALOG[-40:]),
+]
+
+
+def run(runs: int):
+    print(f"{'scenario':<40} {'median ms':>10} {'max ms':>10} {'states':>8}  result")
+    for name, completed, term_names, desired in SCENARIOS:
+        durations, states, outcome = [], 0, ""
+        for _ in range(runs):
+            start = time.perf_counter()
+            try:
+                plan = generate_plan(completed, term_names, desired_courses=desired)
+                states = plan["search"]["states_explored"]
+                outcome = f"{sum(len(term['courses']) for term in plan['terms'])} courses scheduled"
+            except PlanningError as e:
+                states = 0
+                outcome = "budget exceeded" if "search budget" in str(e) else "infeasible"
+            durations.append((time.perf_counter() - start) * 1000)
+        print(f"{name:<40} {statistics.median(durations):>10.2f} {max(durations):>10.2f} {states:>8}  {outcome}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the four-year-plan solver.")
+    parser.add_argument("--runs", type=int, default=20, help="Repetitions per scenario.")
+    run(parser.parse_args().runs)
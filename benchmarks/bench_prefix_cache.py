@@ -0,0 +1,105 @@
+"""
+Benchmarks time-to-first-token for the BadgerBot answer prompt with and
+without a stable prompt prefix.
+
+Several simulated sessions run interleaved, turn by turn, against the stub
+LLM backend. The stub charges prompt-processing time only for the part of a
+prompt not covered by its prefix cache, which is how a provider or inference
+server with prefix caching behaves. With the stub's decode latency at zero,
+the time until a response arrives is the time to first token.
+
+Two prompt layouts are compared:
+
+    interleaved   The previous layout: the retrieved context sits inside the
+                  system message, ahead of the chat history.
+    stable        `prompts.qa_prompt`: static instructions, then history, then
+                  context and question.
+
+Usage:
+    python benchmarks/bench_prefix_cache.py [--sessions 8] [--turns 4] [--prefill-us 10]
+"""
+
+# --- Core Imports ---
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- LangChain Imports ---
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+# --- Local Imports ---
+from knowledge_base import all_course_data
+from llm_providers import StubBackend
+from prompts import BADGERBOT_INSTRUCTIONS, qa_prompt
+
+# The layout used before the prompt was reordered.
+interleaved_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", BADGERBOT_INSTRUCTIONS + "\n\nContext:\n{context}"),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ]
+)
+
+LAYOUTS = [("interleaved", interleaved_prompt), ("stable", qa_prompt)]
+
+QUESTIONS = [
+    "What is {code} about?",
+    "What are the prerequisites for {code}?",
+    "Does {code} count toward the advanced requirements?",
+    "How many credits is {code}, and is there an honors section?",
+]
+
+
+def retrieved_context(session: int, turn: int) -> str:
+    """Four catalog courses standing in for the re-ranked chunks of one turn."""
+    start = (session * 7 + turn * 4) % len(all_course_data)
+    courses = [all_course_data[(start + i) % len(all_course_data)] for i in range(4)]
+    return "\n\n".join(json.dumps(course, indent=2)[:1000] for course in courses)
+
+
+def run(sessions: int, turns: int, prefill_us: float):
+    print(f"{'layout':<12} {'turn':<10} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9} {'cached':>8}")
+    for layout, prompt in LAYOUTS:
+        stub = StubBackend(prefill_us_per_char=prefill_us)
+        histories = [[] for _ in range(sessions)]
+        results = {"first": [], "follow-up": []}
+
+        # Sessions are interleaved turn by turn, as concurrent users would be.
+        for turn in range(turns):
+            for session in range(sessions):
+                code = all_course_data[(session * 5 + turn) % len(all_course_data)]["course_code"]
+                question = QUESTIONS[turn % len(QUESTIONS)].format(code=code)
+                text = prompt.format_prompt(
+                    input=question, chat_history=histories[session], context=retrieved_context(session, turn)
+                ).to_string()
+
+                cached = stub.cached_prefix_length(text) / len(text)
+                start = time.perf_counter()
+                answer = stub.complete(text, None, 0.2, 1024)
+                ttft = (time.perf_counter() - start) * 1000
+                results["first" if turn == 0 else "follow-up"].append((ttft, cached))
+                histories[session] += [HumanMessage(content=question), AIMessage(content=answer)]
+
+        for kind, samples in results.items():
+            if not samples:
+                continue
+            durations = [ttft for ttft, _ in samples]
+            cached = statistics.mean(fraction for _, fraction in samples)
+            print(f"{layout:<12} {kind:<10} {statistics.mean(durations):>9.1f} {statistics.median(durations):>9.1f} "
+                  f"{max(durations):>9.1f} {cached:>7.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark time-to-first-token with and without a stable prompt prefix.")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent simulated sessions.")
+    parser.add_argument("--turns", type=int, default=4, help="Turns per session.")
+    parser.add_argument("--prefill-us", type=float, default=10.0, help="Stub prompt-processing time per uncached character, in microseconds.")
+    args = parser.parse_args()
+    run(args.sessions, args.turns, args.prefill_us)
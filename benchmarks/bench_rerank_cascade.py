@@ -0,0 +1,123 @@
+"""
+Benchmarks the cross-encoder cascade: re-ranking latency and recall@4 for a
+range of relative dense-score cutoffs (`RERANK_RELATIVE_CUTOFF`).
+
+Each question of an offline question set is routed and dense-searched once.
+The candidates are then pruned at every cutoff and the survivors are scored
+by the cross-encoder. Recall@4 is measured against re-ranking all candidates,
+the current behaviour: the fraction of the unpruned top 4 that the pruned
+cascade still returns. It needs no relevance labels, and a recall of 1.0
+means pruning changed no answer's context.
+
+The question set combines the FAQ paraphrases, the router's seed questions,
+and templated questions about a sample of courses. `--traces` adds the
+standalone questions of sampled production traces (see `tracing.py`).
+
+Loads the real embedding and cross-encoder models.
+
+Usage:
+    python benchmarks/bench_rerank_cascade.py [--cutoffs 0,0.6,0.7,0.8,0.9] [--repeats 3] [--traces traces/]
+"""
+
+# --- Core Imports ---
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- Local Imports ---
+import query_analysis
+from faq_cache import FAQ_INTENTS
+from knowledge_base import all_course_data
+from retrieval import ROUTE_SEEDS, chunk_id
+from retrieval_service import load_local_retrieval
+from tracing import load_traces
+
+COURSE_QUESTIONS = [
+    "What is {code} about?",
+    "What are the prerequisites for {code}?",
+    "Does {code} count toward the advanced requirements?",
+]
+CONSTRAINT_QUESTIONS = [
+    "Which advanced courses count for physical science breadth?",
+    "Are there intermediate CS courses worth 3 credits?",
+    "Which elementary courses have an honors section?",
+    "What courses cover machine learning or artificial intelligence?",
+    "Which courses satisfy the quantitative reasoning B requirement?",
+]
+
+
+def offline_questions(course_step: int, traces_dir: str = None) -> list:
+    """Builds the offline question set, without duplicates."""
+    questions = [paraphrase for intent in FAQ_INTENTS for paraphrase in intent["paraphrases"]]
+    questions += [question for seeds in ROUTE_SEEDS.values() for question in seeds]
+    for course in all_course_data[::course_step]:
+        questions += [template.format(code=course["course_code"]) for template in COURSE_QUESTIONS]
+    questions += CONSTRAINT_QUESTIONS
+    if traces_dir:
+        questions += [trace["standalone_question"] for trace in load_traces(traces_dir) if trace.get("standalone_question")]
+    return list(dict.fromkeys(questions))
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(cutoffs: list, repeats: int, course_step: int, traces_dir: str):
+    backend = load_local_retrieval()
+    retriever = backend.retriever
+    top_n = retriever.reranker.top_n
+    questions = offline_questions(course_step, traces_dir)
+    print(f"{len(questions)} questions, top_n={top_n}, search_k={retriever.search_k}")
+
+    # 1. Route and dense-search every question once; only re-ranking is compared.
+    searches = []
+    for question in questions:
+        embedding = backend.embed_query(question)
+        course_filter = query_analysis.build_course_filter(question)
+        collections = retriever.select_collections(question, embedding, course_filter)
+        candidates = retriever.dense_search(embedding, collections, course_filter, with_distances=True)
+        searches.append((question, candidates))
+
+    # 2. The reference ranking: every candidate scored by the cross-encoder.
+    reference = {
+        question: {chunk_id(document) for document, _ in retriever.score_candidates(question, [d for d, _ in candidates])[:top_n]}
+        for question, candidates in searches
+    }
+
+    # 3. For each cutoff, prune, score the survivors, and compare with the reference.
+    print(f"{'cutoff':>7} {'scored':>7} {'pruned':>7} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(top_n):>9} {'min':>6}")
+    for cutoff in cutoffs:
+        latencies, scored_counts, recalls, total_candidates = [], [], [], 0
+        for question, candidates in searches:
+            kept = retriever.prune_candidates(candidates, cutoff)
+            documents = [document for document, _ in kept]
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                ranked = retriever.score_candidates(question, documents)
+                timings.append((time.perf_counter() - start) * 1000)
+            latencies.append(statistics.median(timings))
+            scored_counts.append(len(documents))
+            total_candidates += len(candidates)
+            expected = reference[question]
+            found = {chunk_id(document) for document, _ in ranked[:top_n]}
+            recalls.append(len(expected & found) / len(expected) if expected else 1.0)
+        pruned = 1 - sum(scored_counts) / max(1, total_candidates)
+        print(f"{cutoff:>7.2f} {statistics.mean(scored_counts):>7.1f} {pruned:>7.0%} {percentile(latencies, 0.5):>8.2f} "
+              f"{percentile(latencies, 0.95):>8.2f} {statistics.mean(recalls):>9.3f} {min(recalls):>6.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark re-ranking latency and recall for dense-score cutoffs.")
+    parser.add_argument("--cutoffs", default="0,0.5,0.6,0.7,0.75,0.8,0.85,0.9",
+                        help="Comma-separated relative cutoffs to compare (0 disables pruning).")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed cross-encoder runs per question; the median is used.")
+    parser.add_argument("--course-step", type=int, default=5, help="Ask about every Nth course in the catalog.")
+    parser.add_argument("--traces", default=None, help="Also use the standalone questions of traces in this directory.")
+    args = parser.parse_args()
+    run([float(cutoff) for cutoff in args.cutoffs.split(",")], args.repeats, args.course_step, args.traces)
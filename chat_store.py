@@ -0,0 +1,354 @@
+"""
+Chat-history storage in Amazon DynamoDB.
+
+Two item layouts are supported, selected with `CHAT_HISTORY_LAYOUT`:
+
+    session   One item per session in `ChatbotHistory`, holding the whole
+              `messages` list. Every turn rewrites the item, so the write
+              capacity a turn consumes grows with the length of the
+              conversation.
+    turns     One item per turn in `ChatbotTurns`, keyed by `session_id` with
+              the turn number as sort key. A turn writes one small item, so its
+              cost stays constant. Reads `Query` the most recent turns
+              newest-first and stop after `HISTORY_MAX_TURNS`.
+
+Both layouts keep a per-session turn counter, which the in-process history
+cache uses to detect stale copies.
+
+With `CHAT_HISTORY_TTL_DAYS` set, every write stamps an `expires_at` epoch
+time for DynamoDB's TTL deletion. A session item's expiry is refreshed on
+each turn. In the per-turn layout each turn expires on its own, so long
+sessions lose their oldest turns first. DynamoDB deletes expired items
+lazily, so reads also skip items that have expired.
+
+Usage:
+    python chat_store.py create-table          # Create the per-turn table
+    python chat_store.py enable-ttl            # Turn on TTL deletion for both tables
+    python chat_store.py migrate [--dry-run]   # Copy sessions into per-turn items
+"""
+
+# --- Core Imports ---
+import argparse
+import os
+import time
+
+# --- AWS Imports ---
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+# --- LangChain Imports ---
+from langchain_core.messages import HumanMessage, AIMessage
+
+# --- Storage Settings ---
+SESSION_LAYOUT = "session"
+TURNS_LAYOUT = "turns"
+CHAT_HISTORY_LAYOUT = os.getenv("CHAT_HISTORY_LAYOUT", SESSION_LAYOUT)
+SESSION_TABLE = os.getenv("CHAT_HISTORY_TABLE", "ChatbotHistory")
+TURNS_TABLE = os.getenv("CHAT_TURNS_TABLE", "ChatbotTurns")
+
+# Chat history expires this many days after it was last written (0 keeps it forever).
+CHAT_HISTORY_TTL_DAYS = float(os.getenv("CHAT_HISTORY_TTL_DAYS", "30"))
+TTL_ATTRIBUTE = "expires_at"
+
+# Only the most recent turns are passed to the model as history.
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "20"))
+
+# Points the client at a local DynamoDB (e.g. http://localhost:8000) for development.
+DYNAMODB_ENDPOINT_URL = os.getenv("DYNAMODB_ENDPOINT_URL")
+
+# --- Message Conversion ---
+
+def to_messages(items) -> list:
+    """Converts stored {'type', 'content'} items into LangChain messages."""
+    history = []
+    for msg in items:
+        if msg['type'] == 'human':
+            history.append(HumanMessage(content=msg['content']))
+        elif msg['type'] == 'ai':
+            history.append(AIMessage(content=msg['content']))
+    return history
+
+
+def expiry_time(now: float = None):
+    """Returns the `expires_at` value for an item written now, or None without a TTL."""
+    if CHAT_HISTORY_TTL_DAYS <= 0:
+        return None
+    return int((now or time.time()) + CHAT_HISTORY_TTL_DAYS * 86400)
+
+
+def is_expired(item: dict, now: float = None) -> bool:
+    """Whether an item's TTL has passed, even if DynamoDB has not deleted it yet."""
+    expires_at = item.get(TTL_ATTRIBUTE)
+    return expires_at is not None and int(expires_at) <= (now or time.time())
+
+
+def recent(messages: list) -> list:
+    """Keeps the messages of the last HISTORY_MAX_TURNS turns."""
+    return messages[-2 * HISTORY_MAX_TURNS:] if HISTORY_MAX_TURNS > 0 else messages
+
+# --- Session-Item Layout ---
+
+class SessionItemStore:
+    """The original layout: one item per session with a growing `messages` list."""
+
+    def __init__(self, table):
+        self.table = table
+
+    # Attempts at appending at the expected turn when other writers race for the session.
+    MAX_WRITE_ATTEMPTS = 3
+
+    def load(self, session_id: str, consistent_read: bool = False):
+        """Returns the session's recent messages and its turn counter."""
+        response = self.table.get_item(Key={'session_id': session_id}, ConsistentRead=consistent_read)
+        item = response.get('Item', {})
+        if item and is_expired(item):
+            # Delete it now, so the next turn starts a fresh item instead of appending to it.
+            self._delete_expired(session_id)
+            return [], 0
+        messages = item.get('messages', [])
+        # Items written before the turn counter existed hold one human and one AI message per turn.
+        turn = int(item.get('turn', len(messages) // 2))
+        return recent(to_messages(messages)), turn
+
+    def append(self, session_id: str, human_message: str, ai_message: str, turn: int):
+        """
+        Appends a turn and increments the turn counter. `turn` is the counter
+        the history was read at. The update is conditional on the counter
+        still being `turn`, so nothing is read back on the common path. If
+        another process has written to the session since, re-reads the
+        session and appends after its latest turn. Returns the new turn
+        counter and, in that case, the session's recent messages.
+        """
+        # Appends new messages to the list, or creates the list if it doesn't exist.
+        update_expression = "SET messages = list_append(if_not_exists(messages, :empty_list), :new_messages), #turn = if_not_exists(#turn, :turn) + :one"
+        values = {
+            ':new_messages': [
+                {'type': 'human', 'content': human_message},
+                {'type': 'ai', 'content': ai_message}
+            ],
+            ':empty_list': [],
+            ':one': 1,
+        }
+        expires_at = expiry_time()
+        if expires_at is not None:
+            update_expression += f", {TTL_ATTRIBUTE} = :expires_at"
+            values[':expires_at'] = expires_at
+
+        refreshed = None
+        for _ in range(self.MAX_WRITE_ATTEMPTS):
+            try:
+                # Items written before the turn counter existed have no `turn` and always match.
+                self.table.update_item(
+                    Key={'session_id': session_id},
+                    UpdateExpression=update_expression,
+                    ConditionExpression="attribute_not_exists(#turn) OR #turn = :turn",
+                    ExpressionAttributeNames={'#turn': 'turn'},
+                    ExpressionAttributeValues={**values, ':turn': turn},
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                refreshed, turn = self.load(session_id, consistent_read=True)
+                continue
+            if refreshed is not None:
+                refreshed = recent(refreshed + [HumanMessage(content=human_message), AIMessage(content=ai_message)])
+            return turn + 1, refreshed
+        raise RuntimeError(f"Could not append a turn to session {session_id}.")
+
+    def _delete_expired(self, session_id: str):
+        try:
+            self.table.delete_item(
+                Key={'session_id': session_id},
+                ConditionExpression=f"{TTL_ATTRIBUTE} <= :now",
+                ExpressionAttributeValues={':now': int(time.time())},
+            )
+        except ClientError as e:
+            # Another process wrote a new turn in the meantime; the session is live again.
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+# --- Per-Turn Layout ---
+
+def turn_item(session_id: str, turn: int, human_message: str, ai_message: str) -> dict:
+    """Builds the item that stores a single turn."""
+    item = {
+        'session_id': session_id,
+        'turn': turn,
+        'human': human_message,
+        'ai': ai_message,
+        'created_at': int(time.time()),
+    }
+    expires_at = expiry_time()
+    if expires_at is not None:
+        item[TTL_ATTRIBUTE] = expires_at
+    return item
+
+
+class TurnItemStore:
+    """One item per turn, keyed by (session_id, turn)."""
+
+    # Attempts at claiming the next turn number when other writers race for it.
+    MAX_WRITE_ATTEMPTS = 3
+
+    def __init__(self, table):
+        self.table = table
+
+    def load(self, session_id: str, consistent_read: bool = False):
+        """Returns the session's recent messages and its turn counter."""
+        response = self.table.query(
+            KeyConditionExpression=Key('session_id').eq(session_id),
+            ScanIndexForward=False,
+            Limit=HISTORY_MAX_TURNS,
+            ConsistentRead=consistent_read,
+        )
+        items = list(reversed(response.get('Items', [])))
+        messages = []
+        for item in items:
+            if not is_expired(item):
+                messages += [HumanMessage(content=item['human']), AIMessage(content=item['ai'])]
+        # Expired turns still count, so turn numbers are never reused before DynamoDB deletes them.
+        turn = int(items[-1]['turn']) if items else 0
+        return messages, turn
+
+    def append(self, session_id: str, human_message: str, ai_message: str, turn: int):
+        """
+        Writes the turn as item number `turn + 1`. If that number was already
+        taken by another process, re-reads the session and writes after the
+        latest turn. Returns the new turn counter and, in that case, the
+        session's recent messages.
+        """
+        refreshed = None
+        for _ in range(self.MAX_WRITE_ATTEMPTS):
+            try:
+                self.table.put_item(
+                    Item=turn_item(session_id, turn + 1, human_message, ai_message),
+                    ConditionExpression="attribute_not_exists(session_id)",
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                # The conflicting turn was just written; an eventually consistent
+                # read could miss it and retry the same turn number.
+                refreshed, turn = self.load(session_id, consistent_read=True)
+                continue
+            if refreshed is not None:
+                refreshed = recent(refreshed + [HumanMessage(content=human_message), AIMessage(content=ai_message)])
+            return turn + 1, refreshed
+        raise RuntimeError(f"Could not claim a turn number for session {session_id}.")
+
+# --- Store Setup ---
+
+def dynamodb_resource():
+    """Creates the DynamoDB resource. On AWS Lambda, credentials come from the execution role."""
+    return boto3.resource('dynamodb', endpoint_url=DYNAMODB_ENDPOINT_URL)
+
+
+def create_chat_store(layout: str = CHAT_HISTORY_LAYOUT, dynamodb=None):
+    """Returns the chat-history store for the configured item layout."""
+    dynamodb = dynamodb or dynamodb_resource()
+    if layout == TURNS_LAYOUT:
+        return TurnItemStore(dynamodb.Table(TURNS_TABLE))
+    if layout == SESSION_LAYOUT:
+        return SessionItemStore(dynamodb.Table(SESSION_TABLE))
+    raise ValueError(f"Unknown CHAT_HISTORY_LAYOUT '{layout}'.")
+
+
+def create_turns_table(dynamodb=None, table_name: str = TURNS_TABLE):
+    """Creates the per-turn table (on-demand capacity) and waits until it is active."""
+    dynamodb = dynamodb or dynamodb_resource()
+    table = dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {'AttributeName': 'session_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'turn', 'KeyType': 'RANGE'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'session_id', 'AttributeType': 'S'},
+            {'AttributeName': 'turn', 'AttributeType': 'N'},
+        ],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    table.wait_until_exists()
+    enable_ttl(dynamodb, table_name)
+    print(f"Table '{table_name}' is ready.")
+    return table
+
+
+def enable_ttl(dynamodb=None, table_name: str = SESSION_TABLE):
+    """Turns on DynamoDB TTL deletion on the `expires_at` attribute of a table."""
+    dynamodb = dynamodb or dynamodb_resource()
+    client = dynamodb.meta.client
+    status = client.describe_time_to_live(TableName=table_name)["TimeToLiveDescription"]
+    if status.get("TimeToLiveStatus") in ("ENABLED", "ENABLING"):
+        return
+    client.update_time_to_live(
+        TableName=table_name,
+        TimeToLiveSpecification={'Enabled': True, 'AttributeName': TTL_ATTRIBUTE},
+    )
+    print(f"Enabled TTL on '{table_name}.{TTL_ATTRIBUTE}'.")
+
+# --- Migration ---
+
+def session_to_turn_items(item: dict) -> list:
+    """Splits a session item's `messages` list into per-turn items."""
+    items = []
+    pending_human = None
+    for msg in item.get('messages', []):
+        if msg['type'] == 'human':
+            if pending_human is not None:
+                items.append((pending_human, ""))
+            pending_human = msg['content']
+        elif msg['type'] == 'ai':
+            items.append((pending_human or "", msg['content']))
+            pending_human = None
+    if pending_human is not None:
+        items.append((pending_human, ""))
+    return [turn_item(item['session_id'], turn, human, ai) for turn, (human, ai) in enumerate(items, start=1)]
+
+
+def migrate_sessions(source, target, dry_run: bool = False) -> dict:
+    """
+    Copies every session item in `source` into per-turn items in `target`.
+    The copy is idempotent: re-running it rewrites the same keys.
+    """
+    sessions = turns = 0
+    scan_kwargs = {}
+    with target.batch_writer(overwrite_by_pkeys=['session_id', 'turn']) as batch:
+        while True:
+            page = source.scan(**scan_kwargs)
+            for item in page.get('Items', []):
+                turn_items = session_to_turn_items(item)
+                sessions += 1
+                turns += len(turn_items)
+                if not dry_run:
+                    for record in turn_items:
+                        batch.put_item(Item=record)
+            if 'LastEvaluatedKey' not in page:
+                break
+            scan_kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+    action = "Would migrate" if dry_run else "Migrated"
+    print(f"{action} {sessions} sessions into {turns} turn items.")
+    return {"sessions": sessions, "turns": turns}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the DynamoDB chat-history tables.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("create-table", help=f"Create the per-turn table '{TURNS_TABLE}'.")
+    subcommands.add_parser("enable-ttl", help=f"Enable TTL deletion on '{SESSION_TABLE}' and '{TURNS_TABLE}'.")
+    migrate_parser = subcommands.add_parser("migrate", help=f"Copy '{SESSION_TABLE}' sessions into '{TURNS_TABLE}'.")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="Count the sessions and turns without writing.")
+    args = parser.parse_args()
+
+    resource = dynamodb_resource()
+    if args.command == "create-table":
+        create_turns_table(resource)
+    elif args.command == "enable-ttl":
+        for name in (SESSION_TABLE, TURNS_TABLE):
+            try:
+                enable_ttl(resource, name)
+            except resource.meta.client.exceptions.ResourceNotFoundException:
+                print(f"Table '{name}' does not exist; skipped.")
+    else:
+        migrate_sessions(resource.Table(SESSION_TABLE), resource.Table(TURNS_TABLE), dry_run=args.dry_run)
@@ -1,56 +1,233 @@
-
+import argparse
+import os
 import sqlite3
+import threading
+import time
 from langchain.schema import HumanMessage, AIMessage
 
+# --- Database Settings ---
+
+DB_PATH = os.getenv("SQLITE_DB_PATH", "rag_app.db")
+
+# Sessions with no new message for this many days are expired (0 keeps them forever).
+CHAT_HISTORY_TTL_DAYS = float(os.getenv("CHAT_HISTORY_TTL_DAYS", "30"))
+
+# The compaction job deletes expired sessions a few at a time and pauses between
+# batches, so each write lock it takes is short and writers are never locked out for long.
+COMPACTION_BATCH_SESSIONS = int(os.getenv("COMPACTION_BATCH_SESSIONS", "50"))
+COMPACTION_VACUUM_PAGES = int(os.getenv("COMPACTION_VACUUM_PAGES", "200"))
+COMPACTION_PAUSE_S = float(os.getenv("COMPACTION_PAUSE_S", "0.05"))
+COMPACTION_INTERVAL_S = float(os.getenv("COMPACTION_INTERVAL_S", "3600"))
+
 # --- Database Setup ---
 
 def get_db_connection():
     """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect('rag_app.db')
+    conn = sqlite3.connect(DB_PATH, timeout=5.0)
     conn.row_factory = sqlite3.Row
     return conn
 
+def expiry_cutoff(now: float = None):
+    """Returns the timestamp before which a session's last message makes it expired, or None without a TTL."""
+    if CHAT_HISTORY_TTL_DAYS <= 0:
+        return None
+    return int((now or time.time()) - CHAT_HISTORY_TTL_DAYS * 86400)
+
 def create_chat_history_table():
-    """Creates the chat_history table if it doesn't already exist."""
+    """
+    Creates the chat_history table if it doesn't already exist, and upgrades
+    tables created before messages had a `created_at` timestamp.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
+
+    # Incremental auto-vacuum lets the compaction job return freed pages in small
+    # steps. It must be set before the first table is created; an existing
+    # database is converted once with a full VACUUM.
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+    # Write-ahead logging lets readers continue while compaction deletes.
+    cursor.execute("PRAGMA journal_mode = WAL")
+
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS chat_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             session_id TEXT NOT NULL,
             message_type TEXT NOT NULL,
-            content TEXT NOT NULL
+            content TEXT NOT NULL,
+            created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
         );
     """)
+    columns = [row['name'] for row in cursor.execute("PRAGMA table_info(chat_history)")]
+    if 'created_at' not in columns:
+        # Existing messages are dated to the upgrade, so they get a full TTL.
+        cursor.execute("ALTER TABLE chat_history ADD COLUMN created_at INTEGER")
+        cursor.execute("UPDATE chat_history SET created_at = ? WHERE created_at IS NULL", (int(time.time()),))
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id, created_at)")
     conn.commit()
     conn.close()
     print("Database and chat_history table are ready.")
 
 # --- Chat History Management ---
 
+def _delete_if_expired(cursor, session_id: str, cutoff):
+    """
+    Deletes all of a session's messages if its last message is older than
+    `cutoff`, so a new message starts a fresh session instead of bringing the
+    expired history back. Returns the number of rows deleted.
+    """
+    if cutoff is None:
+        return 0
+    cursor.execute("""
+        DELETE FROM chat_history WHERE session_id = ?
+        AND (SELECT MAX(created_at) FROM chat_history WHERE session_id = ?) < ?
+    """, (session_id, session_id, cutoff))
+    return cursor.rowcount
+
 def add_message_to_history(session_id: str, message_type: str, content: str):
-    """Adds a new message to the chat history for a given session."""
+    """
+    Adds a new message to the chat history for a given session. An expired
+    session is cleared first, in the same transaction.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
+    _delete_if_expired(cursor, session_id, expiry_cutoff())
     cursor.execute(
-        "INSERT INTO chat_history (session_id, message_type, content) VALUES (?, ?, ?)",
-        (session_id, message_type, content)
+        "INSERT INTO chat_history (session_id, message_type, content, created_at) VALUES (?, ?, ?, ?)",
+        (session_id, message_type, content, int(time.time()))
     )
     conn.commit()
     conn.close()
 
 def get_chat_history(session_id: str):
-    """Retrieves the chat history for a given session and formats it for LangChain."""
+    """
+    Retrieves the chat history for a given session and formats it for LangChain.
+    An expired session has no history; its messages are deleted on the spot
+    rather than left for compaction.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT message_type, content FROM chat_history WHERE session_id = ? ORDER BY id", (session_id,))
-    
+    cursor.execute("SELECT message_type, content, created_at FROM chat_history WHERE session_id = ? ORDER BY id", (session_id,))
+    rows = cursor.fetchall()
+
+    cutoff = expiry_cutoff()
+    if rows and cutoff is not None and max(row['created_at'] or 0 for row in rows) < cutoff:
+        _delete_if_expired(cursor, session_id, cutoff)
+        conn.commit()
+        conn.close()
+        return []
+    conn.close()
+
     history = []
-    for row in cursor.fetchall():
+    for row in rows:
         if row['message_type'] == 'human':
             history.append(HumanMessage(content=row['content']))
         elif row['message_type'] == 'ai':
             history.append(AIMessage(content=row['content']))
-            
-    conn.close()
     return history
+
+# --- Expiry and Compaction ---
+
+def _write_transaction(conn, statement: str, params=()):
+    """
+    Runs one statement in its own write transaction. Returns the number of
+    rows it changed and how long the write lock was held, i.e. how long
+    writers were paused.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    start = time.perf_counter()
+    try:
+        cursor = conn.execute(statement, params)
+        cursor.fetchall()
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return cursor.rowcount, (time.perf_counter() - start) * 1000
+
+def compact_expired_history(batch_sessions: int = COMPACTION_BATCH_SESSIONS, vacuum_pages: int = COMPACTION_VACUUM_PAGES,
+                            pause_s: float = COMPACTION_PAUSE_S):
+    """
+    Deletes expired sessions in small batches and returns their freed pages
+    to the file system with incremental vacuum steps. Each step is its own
+    short write transaction, followed by a pause so writers can get in.
+    Returns the rows and pages reclaimed and how long writers were paused.
+    """
+    cutoff = expiry_cutoff()
+    report = {"rows_deleted": 0, "batches": 0, "pages_reclaimed": 0, "total_pause_ms": 0.0, "max_pause_ms": 0.0}
+    if cutoff is None:
+        return report
+
+    def record_pause(pause_ms):
+        report["total_pause_ms"] += pause_ms
+        report["max_pause_ms"] = max(report["max_pause_ms"], pause_ms)
+
+    def vacuum_step():
+        free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        _, pause_ms = _write_transaction(conn, f"PRAGMA incremental_vacuum({int(vacuum_pages)})")
+        record_pause(pause_ms)
+        reclaimed = max(0, free_before - conn.execute("PRAGMA freelist_count").fetchone()[0])
+        report["pages_reclaimed"] += reclaimed
+        return reclaimed
+
+    conn = get_db_connection()
+    conn.isolation_level = None  # Transactions are managed explicitly.
+    try:
+        # 1. Delete one batch of expired sessions at a time, returning some of the freed
+        #    pages after each. Expiry is checked inside the DELETE itself, so a session
+        #    that just received a message is never deleted.
+        while True:
+            deleted, pause_ms = _write_transaction(conn, """
+                DELETE FROM chat_history WHERE session_id IN (
+                    SELECT session_id FROM chat_history
+                    GROUP BY session_id HAVING MAX(created_at) < ?
+                    LIMIT ?
+                )
+            """, (cutoff, batch_sessions))
+            record_pause(pause_ms)
+            if deleted <= 0:
+                break
+            report["rows_deleted"] += deleted
+            report["batches"] += 1
+            vacuum_step()
+            time.sleep(pause_s)
+
+        # 2. Return the remaining free pages.
+        while conn.execute("PRAGMA freelist_count").fetchone()[0] > 0 and vacuum_step():
+            time.sleep(pause_s)
+    finally:
+        conn.close()
+
+    report["total_pause_ms"] = round(report["total_pause_ms"], 2)
+    report["max_pause_ms"] = round(report["max_pause_ms"], 2)
+    print(f"Compaction reclaimed {report['rows_deleted']} rows and {report['pages_reclaimed']} pages in "
+          f"{report['batches']} batches (writers paused {report['total_pause_ms']} ms total, "
+          f"{report['max_pause_ms']} ms max).")
+    return report
+
+def start_compaction_job(interval_s: float = COMPACTION_INTERVAL_S):
+    """Runs the compaction every `interval_s` seconds on a background daemon thread."""
+    def run():
+        while True:
+            try:
+                compact_expired_history()
+            except Exception as e:
+                print(f"Error compacting chat history: {e}")
+            time.sleep(interval_s)
+
+    thread = threading.Thread(target=run, name="chat-history-compaction", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the SQLite chat history database.")
+    parser.add_argument("command", choices=["create", "compact"], help="Create/upgrade the table, or delete expired sessions.")
+    parser.add_argument("--loop", action="store_true", help="With 'compact', keep running every COMPACTION_INTERVAL_S seconds.")
+    args = parser.parse_args()
+    if args.command == "create":
+        create_chat_history_table()
+    elif args.loop:
+        start_compaction_job().join()
+    else:
+        compact_expired_history()
@@ -0,0 +1,396 @@
+"""
+Deterministic degree-audit engine for the B.S. in Computer Sciences.
+
+The requirement sections of the knowledge base (`cs_bs_requirements_data`,
+`cs_bs_advanced_requirements_data` and `ls_bs_degree_requirements_data`) are
+compiled once into a list of rules: required course sets, alternative course
+sequences, "choose N of" groups, and credit minimums over the breadth and level
+designations of each catalog course. A student's completed courses are then
+evaluated against every rule in a single pass, and the remaining requirements
+are returned as structured data.
+
+Requirements that cannot be checked from a course list, such as GPA or the
+language requirement, are reported as "not_evaluated" rather than guessed.
+"""
+
+# --- Core Imports ---
+from functools import lru_cache
+
+# --- Local Imports ---
+from knowledge_base import (
+    all_course_data, cs_bs_requirements_data, cs_bs_advanced_requirements_data,
+    ls_bs_degree_requirements_data
+)
+from requisites import find_course_mentions
+
+# Rule statuses.
+COMPLETE = "complete"
+INCOMPLETE = "incomplete"
+NEEDS_REVIEW = "needs_review"
+NOT_EVALUATED = "not_evaluated"
+
+_CATALOG = {course["course_code"]: course for course in all_course_data}
+
+# --- Course Helpers ---
+
+def course_keys(code: str) -> frozenset:
+    """
+    Returns the "SUBJECT NUMBER" forms of a possibly cross-listed code, so that
+    "STAT/MATH 309" and "MATH 309" are recognized as the same course.
+    """
+    subjects, number = code.rsplit(" ", 1)
+    return frozenset(f"{subject} {number}" for subject in subjects.split("/"))
+
+
+def normalize_courses(courses) -> tuple:
+    """
+    Resolves user-written course references ("CS 300", "comp sci/math 240")
+    to catalog codes. Returns `(recognized, unrecognized)`.
+    """
+    recognized, unrecognized = [], []
+    for text in courses:
+        codes = find_course_mentions(text)
+        if not codes:
+            unrecognized.append(text)
+        for code in codes:
+            if code not in recognized:
+                recognized.append(code)
+    return recognized, unrecognized
+
+
+def course_credits(code: str, overrides: dict = None):
+    """
+    Credits for a course: an explicit override, else the catalog value (the
+    minimum of a range such as "1-3"), else None when unknown.
+    """
+    if overrides and code in overrides:
+        return float(overrides[code])
+    course = _CATALOG.get(code)
+    if course is None:
+        return None
+    credits = course.get("credits")
+    if isinstance(credits, str):
+        credits = credits.split("-")[0]
+    return float(credits)
+
+
+def _designation(code: str) -> dict:
+    return _CATALOG.get(code, {}).get("designation", {})
+
+# --- Rule Compilation ---
+
+def _options(codes) -> list:
+    return [{"code": code, "keys": course_keys(code)} for code in codes]
+
+
+@lru_cache(maxsize=1)
+def compile_rules() -> tuple:
+    """Compiles the requirement sections of the knowledge base into audit rules."""
+    major = cs_bs_requirements_data["requirements_for_the_major"]
+    advanced = cs_bs_advanced_requirements_data["requirements_for_the_major"]
+    advanced_courses = advanced["advanced_computer_science_courses"]
+    ls = ls_bs_degree_requirements_data["requirements"]
+
+    basic_cs = major["basic_computer_sciences"]
+    calculus = major["basic_calculus"]
+    extra_math = major["additional_mathematics"]
+
+    rules = [
+        # --- CS major: foundational courses ---
+        {"id": "basic_computer_sciences", "group": "major", "title": "Basic Computer Sciences",
+         "kind": "all_of", "description": basic_cs["summary"],
+         "courses": _options(course["code"] for course in basic_cs["courses"])},
+        {"id": "basic_calculus", "group": "major", "title": "Basic Calculus",
+         "kind": "one_sequence", "description": calculus["summary"],
+         "sequences": [{"name": seq["name"], "courses": _options(seq["courses"])} for seq in calculus["sequences"]]},
+        {"id": "linear_algebra", "group": "major", "title": "Linear Algebra",
+         "kind": "choose", "count": 1, "description": extra_math["linear_algebra"]["requirement"],
+         "options": _options(extra_math["linear_algebra"]["options"])},
+        {"id": "probability_or_statistics", "group": "major", "title": "Probability or Statistics",
+         "kind": "choose", "count": 1, "description": extra_math["probability_or_statistics"]["requirement"],
+         "options": _options(extra_math["probability_or_statistics"]["options"])},
+    ]
+
+    # --- CS major: advanced areas. A course may only fill one of these areas. ---
+    for area_id, title, count in (
+        ("theory", "Theory", 1),
+        ("software_and_hardware", "Software & Hardware", 2),
+        ("applications", "Applications", 1),
+    ):
+        area = advanced_courses[area_id]
+        rules.append({"id": area_id, "group": "major", "title": title, "kind": "choose", "count": count,
+                      "exclusive": True, "description": area["requirement"], "options": _options(area["options"])})
+    rules.append({"id": "electives", "group": "major", "title": "Electives", "kind": "choose", "count": 2,
+                  "exclusive": True, "description": advanced["electives"]["requirement"],
+                  "options": _options(advanced["electives"]["options"])})
+
+    # --- L&S Bachelor of Science degree requirements ---
+    breadth = ls["ls_breadth"]
+    rules += [
+        {"id": "ls_mathematics", "group": "ls_degree", "title": "L&S Mathematics", "kind": "ls_mathematics",
+         "description": ls["mathematics"]},
+        {"id": "ls_natural_science", "group": "ls_degree", "title": "L&S Breadth: Natural Science",
+         "kind": "credits", "description": breadth["natural_science"], "minimum": 12,
+         "designation": ("breadth", ("Natural Sci", "Physical Sci"))},
+        {"id": "ls_physical_science", "group": "ls_degree", "title": "L&S Breadth: Physical Science",
+         "kind": "credits", "description": breadth["natural_science"], "minimum": 6,
+         "designation": ("breadth", ("Physical Sci",))},
+        {"id": "ls_biological_science", "group": "ls_degree", "title": "L&S Breadth: Biological Science",
+         "kind": "credits", "description": breadth["natural_science"], "minimum": 6,
+         "designation": ("breadth", ("Biological Sci",))},
+        {"id": "ls_humanities", "group": "ls_degree", "title": "L&S Breadth: Humanities",
+         "kind": "credits", "description": breadth["humanities"], "minimum": 12,
+         "designation": ("breadth", ("Humanities", "Literature")),
+         # Literature credits count toward Humanities, and at least 6 of the 12 must be Literature.
+         "sub_requirements": [
+             {"id": "ls_literature", "group": "ls_degree", "title": "Literature",
+              "kind": "credits", "description": breadth["humanities"], "minimum": 6,
+              "designation": ("breadth", ("Literature",))},
+         ]},
+        {"id": "ls_social_science", "group": "ls_degree", "title": "L&S Breadth: Social Science",
+         "kind": "credits", "description": breadth["social_science"], "minimum": 12,
+         "designation": ("breadth", ("Social Sci",))},
+        {"id": "ls_depth", "group": "ls_degree", "title": "Intermediate/Advanced Credits",
+         "kind": "credits", "description": ls["depth_of_intermediate_advanced_coursework"], "minimum": 60,
+         "designation": ("level", ("Intermediate", "Advanced"))},
+        {"id": "ls_total_credits", "group": "ls_degree", "title": "Total Credits",
+         "kind": "total_credits", "description": ls["total_credits"], "minimum": 120},
+        {"id": "ls_language", "group": "ls_degree", "title": "Language",
+         "kind": "not_evaluated", "description": ls["language"]},
+        {"id": "ls_residence", "group": "ls_degree", "title": "UW-Madison Experience",
+         "kind": "not_evaluated", "description": ls["uw_madison_experience"]},
+        {"id": "ls_quality_of_work", "group": "ls_degree", "title": "Quality of Work",
+         "kind": "not_evaluated", "description": "; ".join(ls["quality_of_work"])},
+    ]
+    return tuple(rules)
+
+# --- Evaluation ---
+
+def _match_exclusive_areas(rules, completed_keys: dict) -> dict:
+    """
+    Assigns completed courses to the advanced CS areas so that each course
+    fills at most one slot, maximizing the number of filled slots (bipartite
+    matching with augmenting paths). Returns {rule_id: [codes]}.
+    """
+    slots = [(rule["id"], rule) for rule in rules for _ in range(rule["count"])]
+    candidates = [
+        [code for code, keys in completed_keys.items() if any(keys & option["keys"] for option in rule["options"])]
+        for _, rule in slots
+    ]
+    owner = {}
+
+    def assign(slot: int, seen: set) -> bool:
+        for code in candidates[slot]:
+            if code in seen:
+                continue
+            seen.add(code)
+            if code not in owner or assign(owner[code], seen):
+                owner[code] = slot
+                return True
+        return False
+
+    for slot in range(len(slots)):
+        assign(slot, set())
+
+    assigned = {rule["id"]: [] for rule in rules}
+    for code, slot in sorted(owner.items(), key=lambda item: item[1]):
+        assigned[slots[slot][0]].append(code)
+    return assigned
+
+
+def _result(rule: dict, status: str, satisfied_by=(), remaining=None, note: str = None) -> dict:
+    result = {
+        "id": rule["id"], "group": rule["group"], "title": rule["title"],
+        "description": rule["description"], "status": status, "satisfied_by": list(satisfied_by),
+    }
+    if remaining:
+        result["remaining"] = remaining
+    if note:
+        result["note"] = note
+    return result
+
+
+def audit(completed_courses, course_credit_overrides: dict = None, total_credits: float = None) -> dict:
+    """
+    Evaluates completed courses against every compiled requirement and returns
+    the satisfied and remaining requirements as structured data.
+    """
+    completed, unrecognized = normalize_courses(completed_courses)
+    overrides = {}
+    for text, credits in (course_credit_overrides or {}).items():
+        for code in normalize_courses([text])[0]:
+            overrides[code] = credits
+
+    completed_keys = {code: course_keys(code) for code in completed}
+    all_keys = frozenset().union(*completed_keys.values()) if completed_keys else frozenset()
+    uncatalogued = [code for code in completed if code not in _CATALOG]
+    unknown_credit = [code for code in completed if course_credits(code, overrides) is None]
+
+    def matching(options):
+        return [option["code"] for option in options if option["keys"] & all_keys]
+
+    rules = compile_rules()
+    exclusive = _match_exclusive_areas([rule for rule in rules if rule.get("exclusive")], completed_keys)
+
+    results = []
+    for rule in rules:
+        kind = rule["kind"]
+        if kind == "all_of":
+            done = matching(rule["courses"])
+            missing = [option["code"] for option in rule["courses"] if option["code"] not in done]
+            results.append(_result(rule, INCOMPLETE if missing else COMPLETE, done, {"courses": missing} if missing else None))
+
+        elif kind == "one_sequence":
+            best = None
+            for sequence in rule["sequences"]:
+                done = matching(sequence["courses"])
+                missing = [option["code"] for option in sequence["courses"] if option["code"] not in done]
+                if best is None or len(missing) < len(best[2]):
+                    best = (sequence["name"], done, missing)
+            name, done, missing = best
+            remaining = {"sequence": name, "courses": missing} if missing else None
+            results.append(_result(rule, INCOMPLETE if missing else COMPLETE, done, remaining))
+
+        elif kind == "choose":
+            done = exclusive[rule["id"]] if rule.get("exclusive") else matching(rule["options"])[:rule["count"]]
+            still_needed = rule["count"] - len(done)
+            remaining = None
+            if still_needed > 0:
+                remaining = {"choose": still_needed,
+                             "options": [option["code"] for option in rule["options"] if not option["keys"] & all_keys]}
+            results.append(_result(rule, INCOMPLETE if remaining else COMPLETE, done, remaining))
+
+        elif kind == "ls_mathematics":
+            results.append(_evaluate_ls_mathematics(rule, completed, overrides))
+
+        elif kind == "credits":
+            results.append(_evaluate_credits(rule, completed, overrides, uncatalogued))
+
+        elif kind == "total_credits":
+            earned = total_credits if total_credits is not None else sum(course_credits(code, overrides) or 0 for code in completed)
+            status = COMPLETE if earned >= rule["minimum"] else INCOMPLETE
+            note = None
+            if total_credits is None and unknown_credit and status == INCOMPLETE:
+                status = NEEDS_REVIEW
+                note = f"Credits are unknown for: {', '.join(unknown_credit)}."
+            remaining = {"credits": rule["minimum"] - earned} if earned < rule["minimum"] else None
+            results.append(_result(rule, status, [], remaining, note))
+
+        else:
+            results.append(_result(rule, NOT_EVALUATED))
+
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {
+        "completed_courses": completed,
+        "unrecognized_courses": unrecognized,
+        "requirements": results,
+        "summary": summary,
+    }
+
+
+def _evaluate_credits(rule: dict, completed: list, overrides: dict, uncatalogued: list) -> dict:
+    """
+    A credit minimum over courses with a designation. A rule with
+    sub-requirements (minimums within its own credits) is only complete when
+    each of them is; their results are nested under "sub_requirements".
+    """
+    field, values = rule["designation"]
+    counted = [code for code in completed
+               if any(value in _designation(code).get(field, "") for value in values)]
+    earned = sum(course_credits(code, overrides) or 0 for code in counted)
+    sub_results = [_evaluate_credits(sub, completed, overrides, uncatalogued) for sub in rule.get("sub_requirements", ())]
+    status = COMPLETE if earned >= rule["minimum"] and all(sub["status"] == COMPLETE for sub in sub_results) else INCOMPLETE
+    note = None
+    if status == INCOMPLETE and uncatalogued:
+        # Designations are only known for catalog courses, so other courses may still count.
+        status = NEEDS_REVIEW
+        note = f"Designations are unknown for: {', '.join(uncatalogued)}."
+    remaining = {"credits": rule["minimum"] - earned} if earned < rule["minimum"] else None
+    result = _result(rule, status, counted, remaining, note)
+    if sub_results:
+        result["sub_requirements"] = sub_results
+    return result
+
+
+def _evaluate_ls_mathematics(rule: dict, completed: list, overrides: dict) -> dict:
+    """
+    Two 3+ credit Intermediate/Advanced courses in MATH, COMP SCI or STAT, with
+    at most one each from COMP SCI and STAT. Levels are only known for catalog
+    courses, so other MATH/STAT courses are flagged for review.
+    """
+    counted, unverified, subjects_used = [], [], set()
+    for code in completed:
+        subjects = set(code.rsplit(" ", 1)[0].split("/"))
+        if not subjects & {"MATH", "COMP SCI", "STAT"}:
+            continue
+        if code not in _CATALOG:
+            unverified.append(code)
+            continue
+        level = _designation(code).get("level", "")
+        if level not in ("Intermediate", "Advanced") or (course_credits(code, overrides) or 0) < 3:
+            continue
+        # Cross-listed courses count toward the first limited subject they carry.
+        limited = next((subject for subject in ("COMP SCI", "STAT") if subject in subjects and "MATH" not in subjects), None)
+        if limited and limited in subjects_used:
+            continue
+        if limited:
+            subjects_used.add(limited)
+        counted.append(code)
+
+    if len(counted) >= 2:
+        return _result(rule, COMPLETE, counted[:2])
+    remaining = {"courses": 2 - len(counted)}
+    if unverified:
+        return _result(rule, NEEDS_REVIEW, counted, remaining, f"Levels are unknown for: {', '.join(unverified)}.")
+    return _result(rule, INCOMPLETE, counted, remaining)
+
+# --- Chat Grounding ---
+
+_AUDIT_CUES = ("left", "remaining", "still need", "what else", "have taken", "i've taken", "ive taken",
+               "completed", "finished", "audit", "on track", "to graduate")
+
+
+def format_audit(result: dict) -> str:
+    """Renders an audit result as plain text suitable for the LLM context."""
+    lines = [f"Degree audit computed from the official requirements for completed courses: {', '.join(result['completed_courses'])}."]
+    for requirement in result["requirements"]:
+        if requirement["status"] == NOT_EVALUATED:
+            continue
+        line = f"- {requirement['title']}: {requirement['status'].replace('_', ' ')}"
+        if requirement["satisfied_by"]:
+            line += f" (satisfied by {', '.join(requirement['satisfied_by'])})"
+        remaining = requirement.get("remaining")
+        if remaining:
+            if "options" in remaining:
+                line += f"; still choose {remaining['choose']} from: {', '.join(remaining['options'])}"
+            elif "credits" in remaining:
+                line += f"; {remaining['credits']:g} more credits needed"
+            elif isinstance(remaining.get("courses"), list):
+                line += f"; still needed: {', '.join(remaining['courses'])}"
+            else:
+                line += f"; {remaining['courses']} more course(s) needed"
+        if requirement.get("note"):
+            line += f". {requirement['note']}"
+        lines.append(line)
+        for sub in requirement.get("sub_requirements", ()):
+            line = f"  - of which {sub['title']}: {sub['status'].replace('_', ' ')}"
+            if sub.get("remaining"):
+                line += f"; {sub['remaining']['credits']:g} more credits needed"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def describe_for_question(question: str):
+    """
+    Runs an audit when a question lists completed courses and asks what is
+    left, returning the formatted result, or None for other questions.
+    """
+    lowered = question.lower()
+    if not any(cue in lowered for cue in _AUDIT_CUES):
+        return None
+    completed, _ = normalize_courses([question])
+    if len(completed) < 2:
+        return None
+    return format_audit(audit(completed))
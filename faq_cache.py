@@ -0,0 +1,222 @@
+"""
+Precomputed answers for the FAQ-shaped questions in the knowledge base.
+
+A large share of first-turn questions ask about fixed topics such as how to
+declare the major, honors, scholarships, or career resources. This module
+holds a curated list of those FAQ intents, an offline job that generates a
+canonical answer for each intent with the full RAG pipeline, and a matcher
+that lets `/chat` serve the stored answer when a new question is close enough
+to one of the intents.
+
+The cache records a hash of the knowledge-base content it was built from and
+is ignored, and regenerated by the offline job, whenever that content changes.
+
+Usage:
+    python faq_cache.py            # Rebuild only if the knowledge base changed
+    python faq_cache.py --force    # Rebuild unconditionally
+"""
+
+# --- Core Imports ---
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+# --- Local Imports ---
+import knowledge_base
+
+FAQ_CACHE_PATH = os.getenv("FAQ_CACHE_PATH", "faq_answers.json")
+
+# Minimum cosine similarity between a question and an intent's paraphrases for
+# the precomputed answer to be served instead of running the pipeline.
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.9"))
+
+# --- FAQ Intents ---
+# Each intent has a canonical question, which is answered by the pipeline, and
+# a set of paraphrases that are embedded for matching incoming questions.
+FAQ_INTENTS = [
+    {
+        "intent": "how_to_declare",
+        "question": "How do I declare the computer sciences major?",
+        "paraphrases": [
+            "How do I declare the computer sciences major?",
+            "How do I get into the CS major?",
+            "What are the requirements to declare computer science?",
+            "How can I become a computer science major at UW-Madison?",
+        ],
+    },
+    {
+        "intent": "declaration_gpa",
+        "question": "What GPA do I need to declare the computer sciences major?",
+        "paraphrases": [
+            "What GPA do I need to declare the computer sciences major?",
+            "What is the minimum GPA to get into the CS major?",
+            "Which courses count toward the GPA for declaring CS?",
+        ],
+    },
+    {
+        "intent": "residence_requirements",
+        "question": "What are the residence and quality of work requirements for the computer sciences major?",
+        "paraphrases": [
+            "What are the residence and quality of work requirements for the computer sciences major?",
+            "How many CS credits do I need to take on campus?",
+            "What GPA do I need in my major courses to graduate?",
+        ],
+    },
+    {
+        "intent": "honors_in_the_major",
+        "question": "How do I earn Honors in the Computer Sciences major?",
+        "paraphrases": [
+            "How do I earn Honors in the Computer Sciences major?",
+            "What are the requirements for honors in the CS major?",
+            "How do I do a senior honors thesis in computer science?",
+        ],
+    },
+    {
+        "intent": "scholarships",
+        "question": "What scholarships are available for computer sciences students?",
+        "paraphrases": [
+            "What scholarships are available for computer sciences students?",
+            "How do I find scholarships as a CS major?",
+            "Where can I apply for computer science scholarships?",
+        ],
+    },
+    {
+        "intent": "advising",
+        "question": "Who can help me with advising for the computer sciences major?",
+        "paraphrases": [
+            "Who can help me with advising for the computer sciences major?",
+            "How do I meet with a computer sciences advisor?",
+            "Where can I get academic advising for CS?",
+        ],
+    },
+    {
+        "intent": "career_resources",
+        "question": "What career resources are available to computer sciences students?",
+        "paraphrases": [
+            "What career resources are available to computer sciences students?",
+            "Are there career fairs for CS students?",
+            "What does SuccessWorks offer computer science majors?",
+            "How do I find internships as a CS major?",
+        ],
+    },
+]
+
+# --- Knowledge Base Fingerprint ---
+
+def knowledge_base_hash() -> str:
+    """Returns a stable SHA-256 hash of all knowledge-base content."""
+    content = {
+        name: value
+        for name, value in sorted(vars(knowledge_base).items())
+        if not name.startswith("_") and isinstance(value, (dict, list))
+    }
+    serialized = json.dumps({"intents": FAQ_INTENTS, "knowledge_base": content}, sort_keys=True)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+# --- Cache Lookup ---
+
+class FAQCache:
+    """An in-memory index of precomputed FAQ answers and their intent embeddings."""
+
+    def __init__(self, intents: list, answers: list, embeddings: np.ndarray, owners: list):
+        self.intents = intents
+        self.answers = answers
+        # One row per paraphrase, L2-normalized so a dot product is a cosine similarity.
+        self.embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        self.owners = np.asarray(owners)
+
+    @classmethod
+    def load(cls, path: str = FAQ_CACHE_PATH, expected_hash: str = None):
+        """
+        Loads the cache file, returning None if it is missing or was built from
+        different knowledge-base content than `expected_hash`.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        if expected_hash is not None and data.get("kb_hash") != expected_hash:
+            print("FAQ cache is stale (knowledge base changed); precomputed answers disabled.")
+            return None
+
+        intents, answers, vectors, owners = [], [], [], []
+        for index, entry in enumerate(data["intents"]):
+            intents.append(entry["intent"])
+            answers.append(entry["answer"])
+            vectors.extend(entry["embeddings"])
+            owners.extend([index] * len(entry["embeddings"]))
+        if not vectors:
+            return None
+        return cls(intents, answers, np.asarray(vectors, dtype=np.float32), owners)
+
+    def match(self, query_embedding, threshold: float = FAQ_MATCH_THRESHOLD):
+        """
+        Returns `(intent, answer, score)` for the closest intent if its
+        similarity reaches `threshold`, otherwise None.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / np.linalg.norm(query)
+        scores = self.embeddings @ query
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        owner = int(self.owners[best])
+        return self.intents[owner], self.answers[owner], float(scores[best])
+
+# --- Offline Build Job ---
+
+def build_faq_cache(answer_fn, embeddings, path: str = FAQ_CACHE_PATH, force: bool = False) -> bool:
+    """
+    Generates and stores the canonical answer and paraphrase embeddings for
+    every FAQ intent. `answer_fn` maps a question to an answer and
+    `embeddings` is anything with an `embed_documents` method, such as a
+    LangChain embedding model or a retrieval backend. Returns False without doing
+    any work if the existing cache already matches the knowledge base.
+    """
+    kb_hash = knowledge_base_hash()
+    if not force and os.path.exists(path):
+        with open(path) as f:
+            if json.load(f).get("kb_hash") == kb_hash:
+                print("FAQ cache is up to date; nothing to regenerate.")
+                return False
+
+    entries = []
+    for intent in FAQ_INTENTS:
+        start = time.perf_counter()
+        answer = answer_fn(intent["question"])
+        entries.append({
+            "intent": intent["intent"],
+            "question": intent["question"],
+            "answer": answer,
+            "embeddings": embeddings.embed_documents(intent["paraphrases"]),
+        })
+        print(f"Generated answer for '{intent['intent']}' in {time.perf_counter() - start:.1f}s.")
+
+    # Write to a temporary file first so a running service never reads a partial cache.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"kb_hash": kb_hash, "generated_at": time.time(), "intents": entries}, f)
+    os.replace(tmp_path, path)
+    print(f"Wrote {len(entries)} precomputed FAQ answers to {path}.")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute answers for the FAQ intents.")
+    parser.add_argument("--force", action="store_true", help="Regenerate even if the knowledge base is unchanged.")
+    parser.add_argument("--output", default=FAQ_CACHE_PATH, help="Path of the cache file to write.")
+    args = parser.parse_args()
+
+    # The backend is imported lazily so the lookup side of this module stays lightweight.
+    import main
+    main.load_retriever()
+    build_faq_cache(
+        lambda question: main.run_conversational_rag(question, []),
+        main.retrieval_backend,
+        path=args.output,
+        force=args.force,
+    )
@@ -0,0 +1,47 @@
+"""
+Gunicorn configuration for running the backend as a multi-worker service in
+preload mode (see `shared_index.py`).
+
+    gunicorn main:app -c gunicorn.conf.py
+
+Before any worker starts, the master builds the shared retrieval index in a
+separate process, so the master itself never holds the embedding model. The
+application module is preloaded, so workers are forked with the imported
+libraries already in shared memory; each worker then maps the shared index and
+loads its models in the startup event, one worker at a time.
+"""
+
+# --- Core Imports ---
+import os
+import shutil
+import subprocess
+import sys
+
+# Workers read SHARED_INDEX_DIR when the application is imported, which happens
+# before the server hooks below run, so it is set as soon as the config loads.
+os.environ.setdefault("SHARED_INDEX_DIR", "/dev/shm/badgerbot-index" if os.path.isdir("/dev/shm") else "/tmp/badgerbot-index")
+SHARED_INDEX_DIR = os.environ["SHARED_INDEX_DIR"]
+
+# --- Server Settings ---
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Workers load their models during startup, waiting their turn for the model lock.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+
+# --- Server Hooks ---
+
+def on_starting(server):
+    """Builds (or validates) the shared index before the first worker is forked."""
+    shutil.rmtree(os.path.join(SHARED_INDEX_DIR, "workers"), ignore_errors=True)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shared_index.py")
+    subprocess.run([sys.executable, script, "build", "--dir", SHARED_INDEX_DIR], check=True)
+
+
+def child_exit(server, worker):
+    """Removes an exited worker's memory report."""
+    try:
+        os.remove(os.path.join(SHARED_INDEX_DIR, "workers", f"{worker.pid}.json"))
+    except OSError:
+        pass
@@ -0,0 +1,69 @@
+"""
+In-process, write-through cache of recent chat histories.
+
+Warm Lambda containers and long-lived workers usually serve consecutive turns
+of the same session, and each turn used to re-read the whole session item
+from DynamoDB even though the same process had just written it.
+
+Every session item carries a turn counter that is incremented atomically with
+each write. The cache stores each session's messages together with the turn
+they correspond to, and the client echoes back the turn it last received. A
+read is served from memory only when the cached turn equals the client's
+turn. If another process has served the session in the meantime, the turns
+differ and the history is read from DynamoDB again.
+"""
+
+# --- Core Imports ---
+import os
+import threading
+from collections import OrderedDict
+
+# --- Local Imports ---
+import metrics
+
+# Number of sessions kept in memory per process.
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "1024"))
+
+HISTORY_CACHE_LOOKUPS = metrics.Counter(
+    "badgerbot_history_cache_lookups_total",
+    "Chat-history cache lookups by result (hit, stale, miss).",
+    "result",
+)
+
+
+class SessionHistoryCache:
+    """A thread-safe LRU map from session id to (turn, messages)."""
+
+    def __init__(self, max_sessions: int = HISTORY_CACHE_SIZE):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, turn: int):
+        """Returns a copy of the session's messages if they are cached at `turn`, otherwise None."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                HISTORY_CACHE_LOOKUPS.inc("miss")
+                return None
+            if entry[0] != turn:
+                HISTORY_CACHE_LOOKUPS.inc("stale")
+                return None
+            self._sessions.move_to_end(session_id)
+            HISTORY_CACHE_LOOKUPS.inc("hit")
+            return list(entry[1])
+
+    def put(self, session_id: str, turn: int, messages: list):
+        """Stores the session's messages as of `turn`, evicting the least recently used session if full."""
+        if self.max_sessions <= 0:
+            return
+        with self._lock:
+            self._sessions[session_id] = (turn, list(messages))
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def invalidate(self, session_id: str):
+        """Drops a session, e.g. after a failed write left its cached copy in doubt."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
@@ -0,0 +1,346 @@
+"""
+LLM provider layer with timeouts, hedged requests and failover.
+
+`ProviderLLM` is a LangChain LLM that forwards each prompt to an ordered list
+of backends. The attempt on the primary backend is bounded by a timeout. If
+the attempt is still running when it reaches that backend's observed p95
+latency, a second, hedged attempt is issued to the next backend (or to the
+same one when only one is configured), and whichever finishes first wins.
+When an attempt fails, the next backend is tried straight away.
+
+Backends are configured through `LLM_PROVIDERS`, a comma-separated list of
+specs tried in order:
+
+    together:<model>   A model served by Together AI (needs TOGETHER_API_KEY)
+    local:<base_url>   An OpenAI-compatible completions server, such as vLLM or
+                       the llama.cpp server, serving LOCAL_LLM_MODEL
+    stub               A local deterministic backend, for offline load tests
+
+For example, `LLM_PROVIDERS=together:mistralai/Mistral-7B-Instruct-v0.2,stub`.
+"""
+
+# --- Core Imports ---
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, List, Optional
+
+import requests
+
+# --- LangChain Imports ---
+from langchain_community.llms import Together
+from langchain_core.language_models.llms import LLM
+
+# --- Local Imports ---
+import metrics
+
+# --- Provider Settings ---
+DEFAULT_PROVIDERS = "together:mistralai/Mistral-7B-Instruct-v0.2"
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", DEFAULT_PROVIDERS)
+
+# Overall time allowed for one completion, across all attempts.
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+
+# A hedged attempt is issued once the primary attempt has run for this
+# quantile of the backend's most recent LLM_HEDGE_WINDOW latencies. Hedging
+# stays off until the backend has enough observations for the quantile to be
+# meaningful.
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+
+# Simulated latency of the stub backend: a base latency, plus a slow tail on
+# a fraction of calls. The sequence of latencies is seeded, so it is repeatable.
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+LLM_STUB_TAIL_RATE = float(os.getenv("LLM_STUB_TAIL_RATE", "0"))
+LLM_STUB_TAIL_MS = float(os.getenv("LLM_STUB_TAIL_MS", "2000"))
+LLM_STUB_SEED = int(os.getenv("LLM_STUB_SEED", "0"))
+
+# Simulated prompt processing of the stub backend: time per prompt character
+# not covered by its prefix cache, which keeps the most recent prompts.
+LLM_STUB_PREFILL_US_PER_CHAR = float(os.getenv("LLM_STUB_PREFILL_US_PER_CHAR", "0"))
+LLM_STUB_PREFIX_CACHE_SIZE = int(os.getenv("LLM_STUB_PREFIX_CACHE_SIZE", "64"))
+
+# Model name sent to `local:` completions servers.
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "default")
+
+# Attempts run on worker threads so they can be abandoned at their deadline.
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_MAX_WORKERS", "32")), thread_name_prefix="llm")
+
+LLM_SECONDS = metrics.Histogram(
+    "badgerbot_llm_seconds",
+    "Latency of successful LLM attempts per backend.",
+    "backend",
+)
+LLM_EVENTS = metrics.Counter(
+    "badgerbot_llm_events_total",
+    "Hedges, failovers, errors and timeouts in the LLM provider layer.",
+    "event",
+)
+
+# --- Latency Tracking ---
+
+class LatencyWindow:
+    """
+    The most recent latencies of one backend. Unlike the `LLM_SECONDS`
+    histogram, whose quantiles are bucket bounds, it gives the exact
+    quantile, and it follows the backend's current latency rather than its
+    whole history.
+    """
+
+    def __init__(self, size: int = LLM_HEDGE_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Returns the `q` quantile of the window, interpolating between samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        position = q * (len(samples) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(samples) - 1)
+        return samples[lower] + (samples[upper] - samples[lower]) * (position - lower)
+
+
+_latency_windows = {}
+_latency_windows_lock = threading.Lock()
+
+
+def latency_window(backend_name: str) -> LatencyWindow:
+    """Returns the latency window of a backend, creating it on first use."""
+    with _latency_windows_lock:
+        return _latency_windows.setdefault(backend_name, LatencyWindow())
+
+# --- Backends ---
+
+class TogetherBackend:
+    """A model served by the Together AI completions API."""
+
+    requires = ("TOGETHER_API_KEY",)
+
+    def __init__(self, model: str):
+        self.name = f"together:{model}"
+        self.model = model
+
+    def complete(self, prompt: str, stop: Optional[List[str]], temperature: float, max_tokens: int) -> str:
+        llm = Together(model=self.model, temperature=temperature, max_tokens=max_tokens)
+        return llm.invoke(prompt, stop=stop)
+
+
+class LocalServerBackend:
+    """
+    An OpenAI-compatible completions server. Requests are tagged with
+    `cache_prompt` so that servers which support it keep the prompt's KV cache
+    and reuse it for later prompts with the same prefix.
+    """
+
+    requires = ()
+
+    def __init__(self, base_url: str, model: str = LOCAL_LLM_MODEL):
+        self.name = f"local:{base_url}"
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+
+    def complete(self, prompt: str, stop: Optional[List[str]], temperature: float, max_tokens: int) -> str:
+        response = requests.post(
+            f"{self.base_url}/completions",
+            json={
+                "model": self.model,
+                "prompt": prompt,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stop": stop,
+                "cache_prompt": True,
+            },
+            timeout=LLM_TIMEOUT_S,
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["text"]
+
+
+class StubBackend:
+    """
+    A deterministic local backend. Reformulation prompts get the latest
+    question back unchanged, and answer prompts get a fixed-format answer
+    quoting the start of the retrieved context.
+
+    Like an inference server with prefix caching, it only charges prompt
+    processing time for the part of a prompt that is not a prefix of a
+    recently seen prompt.
+    """
+
+    name = "stub"
+    requires = ()
+
+    def __init__(self, seed: int = LLM_STUB_SEED, prefill_us_per_char: float = LLM_STUB_PREFILL_US_PER_CHAR,
+                 prefix_cache_size: int = LLM_STUB_PREFIX_CACHE_SIZE):
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.prefill_us_per_char = prefill_us_per_char
+        self._recent_prompts = deque(maxlen=prefix_cache_size)
+
+    def cached_prefix_length(self, prompt: str) -> int:
+        """Returns the length of the longest prefix `prompt` shares with a cached prompt."""
+        with self._lock:
+            return max((len(os.path.commonprefix([prompt, cached])) for cached in self._recent_prompts), default=0)
+
+    def _prefill(self, prompt: str) -> float:
+        if not self.prefill_us_per_char:
+            return 0.0
+        uncached = len(prompt) - self.cached_prefix_length(prompt)
+        with self._lock:
+            self._recent_prompts.append(prompt)
+        return uncached * self.prefill_us_per_char / 1e6
+
+    def _latency(self) -> float:
+        with self._lock:
+            slow = self._random.random() < LLM_STUB_TAIL_RATE
+        return (LLM_STUB_TAIL_MS if slow else LLM_STUB_LATENCY_MS) / 1000.0
+
+    def complete(self, prompt: str, stop: Optional[List[str]], temperature: float, max_tokens: int) -> str:
+        time.sleep(self._prefill(prompt) + self._latency())
+        questions = re.findall(r"^Human: (.*)$", prompt, flags=re.MULTILINE)
+        question = questions[-1].strip() if questions else ""
+        context = prompt.split("Context:", 1)[1] if "Context:" in prompt else ""
+        if not context:
+            text = question
+        else:
+            text = f"Here is what the documents say about \"{question}\": " + " ".join(context.split()[:60])
+        for sequence in stop or []:
+            text = text.split(sequence, 1)[0]
+        return text
+
+
+def _make_backend(spec: str):
+    kind, _, argument = spec.strip().partition(":")
+    if kind == "together" and argument:
+        return TogetherBackend(argument)
+    if kind == "local" and argument:
+        return LocalServerBackend(argument)
+    if kind == "stub":
+        return StubBackend()
+    raise ValueError(f"Unknown LLM provider spec '{spec}'.")
+
+
+@lru_cache(maxsize=None)
+def configured_backends(providers: str = LLM_PROVIDERS) -> tuple:
+    """Returns the backends named in a providers string, in failover order."""
+    backends = tuple(_make_backend(spec) for spec in providers.split(",") if spec.strip())
+    if not backends:
+        raise ValueError("LLM_PROVIDERS must name at least one backend.")
+    return backends
+
+
+def missing_credentials(providers: str = LLM_PROVIDERS) -> list:
+    """Lists the environment variables the configured backends need but are unset."""
+    required = {variable for backend in configured_backends(providers) for variable in backend.requires}
+    return sorted(variable for variable in required if not os.getenv(variable))
+
+# --- LangChain LLM ---
+
+class ProviderLLM(LLM):
+    """A LangChain LLM that hedges and fails over between the configured backends."""
+
+    backends: tuple
+    temperature: float = 0.2
+    max_tokens: int = 1024
+    timeout: float = LLM_TIMEOUT_S
+    # Default stop sequences, used when a call does not pass its own.
+    stop: Optional[List[str]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "badgerbot_providers"
+
+    def _hedge_delay(self, backend) -> Optional[float]:
+        window = latency_window(backend.name)
+        if window.count() < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return window.quantile(LLM_HEDGE_QUANTILE)
+
+    def _attempt(self, backend, prompt: str, stop: Optional[List[str]]) -> str:
+        start = time.perf_counter()
+        text = backend.complete(prompt, stop, self.temperature, self.max_tokens)
+        elapsed = time.perf_counter() - start
+        LLM_SECONDS.observe(backend.name, elapsed)
+        latency_window(backend.name).observe(elapsed)
+        return text
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        stop = stop or self.stop
+        start = time.monotonic()
+        deadline = start + self.timeout
+        queue = list(self.backends)
+        pending = {}
+        errors = []
+        hedge = None
+
+        def launch():
+            backend = queue.pop(0)
+            future = _executor.submit(self._attempt, backend, prompt, stop)
+            pending[future] = backend
+            return future
+
+        launch()
+        hedge_at = None
+        delay = self._hedge_delay(self.backends[0])
+        if delay is not None:
+            hedge_at = start + delay
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wake = min(deadline, hedge_at) if hedge_at and not hedge else deadline
+            done, _ = wait(pending, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    # Fail over: try the next backend immediately.
+                    print(f"LLM backend '{backend.name}' failed: {e}")
+                    LLM_EVENTS.inc("error")
+                    errors.append(e)
+                    if queue:
+                        LLM_EVENTS.inc("failover")
+                        launch()
+                    continue
+                if future is hedge:
+                    LLM_EVENTS.inc("hedge_win")
+                return text
+
+            # Hedge: the primary attempt has outlived its recent p95, so start a second one.
+            if not done and not hedge and hedge_at and time.monotonic() >= hedge_at:
+                LLM_EVENTS.inc("hedge")
+                if not queue:
+                    queue.append(self.backends[0])
+                hedge = launch()
+
+        if pending:
+            LLM_EVENTS.inc("timeout")
+            raise TimeoutError(f"No LLM backend answered within {self.timeout:g}s.")
+        raise RuntimeError(f"All LLM backends failed: {errors[-1] if errors else 'no backends'}")
+
+
+def build_llm(temperature: float = 0.2, max_tokens: int = 1024, stop: Optional[List[str]] = None,
+              providers: str = LLM_PROVIDERS) -> ProviderLLM:
+    """Creates an LLM over the configured backends."""
+    return ProviderLLM(
+        backends=configured_backends(providers), temperature=temperature, max_tokens=max_tokens, stop=stop
+    )
@@ -11,59 +11,95 @@ Date: 9/8/25
 """
 
 # --- Core Imports ---
-import json
 import os
+import re
+import threading
+import time
 import uuid
-from typing import Optional
+from typing import Dict, List, Optional
 
 # --- AWS & Serverless Imports ---
-import boto3
 from mangum import Mangum # Adapter for running FastAPI on AWS Lambda
 
 # --- FastAPI Imports ---
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, model_validator
 
 # --- LangChain Imports ---
 # Components for building the conversational RAG pipeline.
 from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.cross_encoders import HuggingFaceCrossEncoder
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import CrossEncoderReranker
-from langchain_community.llms import Together
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import HumanMessage, AIMessage
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # --- Local Imports ---
-# Knowledge base content, packaged with the deployment.
-from knowledge_base import (
-    cs_bs_description_data, cs_bs_how_to_get_in_data, cs_bs_requirements_data,
-    cs_bs_advanced_requirements_data, cs_bs_residence_honors_data,
-    cs_bs_learning_outcomes_data, cs_bs_four_year_plan_data,
-    cs_bs_scholarships_data, cs_bs_advising_careers_data,
-    all_course_data, ls_bs_degree_requirements_data,
-    university_general_education_requirements_data
-)
+import metrics
+from singleflight import SingleFlight
+from admission import AdmissionController, Rejected, SessionRateLimiter
+from tracing import TraceSink, estimate_tokens, start_trace
+from history_cache import SessionHistoryCache
+from chat_store import create_chat_store, recent
+from faq_cache import FAQCache, FAQ_CACHE_PATH, knowledge_base_hash
+from requisites import get_requisite_graph
+import degree_audit
+import planner
+import query_analysis
+from retrieval_service import RETRIEVAL_SERVICE_URL, RemoteRetrieval, load_local_retrieval
+from shared_index import SHARED_INDEX_DIR, report_worker_memory
+from llm_providers import build_llm, missing_credentials
+from prompts import contextualize_q_prompt, qa_prompt, TURN_STOP_SEQUENCES, REFORMULATION_STOP_SEQUENCES
 
 # --- AWS Setup ---
-# Initialize the DynamoDB client.
+# Initialize the DynamoDB chat-history store, using the item layout set by CHAT_HISTORY_LAYOUT.
 # In the AWS Lambda environment, authentication is handled automatically by the execution role.
-dynamodb = boto3.resource('dynamodb')
-chat_history_table = dynamodb.Table('ChatbotHistory')
+chat_store = create_chat_store()
 
 # --- Data Models ---
+class CachedTurn(BaseModel):
+    """A first-turn exchange the client answered from its own response cache."""
+    question: str
+    answer: str
+
 class ChatRequest(BaseModel):
     """Defines the expected structure for incoming API requests."""
     question: str
     session_id: Optional[str] = None
+    # The `turn` returned by the previous response, used to validate the cached history.
+    turn: Optional[int] = None
+    # Sent with the question that follows a cached first answer, so the new session starts with it.
+    cached_turn: Optional[CachedTurn] = None
+
+class RetrieveBatchRequest(BaseModel):
+    """Defines the expected structure for batched retrieval requests."""
+    queries: List[str]
+    top_n: int = 4
+
+class AuditRequest(BaseModel):
+    """Defines the expected structure for degree-audit requests."""
+    completed_courses: List[str]
+    course_credits: Dict[str, float] = {}
+    total_credits: Optional[float] = None
+
+class PlanRequest(BaseModel):
+    """Defines the expected structure for four-year-plan requests."""
+    completed_courses: List[str] = []
+    terms: List[str]
+    desired_courses: List[str] = []
+    course_credits: Dict[str, float] = {}
+    min_credits: float = planner.MIN_TERM_CREDITS
+    max_credits: float = planner.MAX_TERM_CREDITS
+
+    @model_validator(mode="after")
+    def check_credit_range(self):
+        """Rejects an inverted per-term credit range as invalid input (422) before any search runs."""
+        if self.min_credits > self.max_credits:
+            raise ValueError(f"min_credits ({self.min_credits:g}) must not exceed max_credits ({self.max_credits:g}).")
+        return self
 
 # --- FastAPI Application Setup ---
 app = FastAPI(
@@ -72,209 +108,536 @@ app = FastAPI(
     version="1.1.0",
 )
 
-# The retriever model is defined globally. This is a performance optimization for
-# AWS Lambda, allowing the model to be loaded only once during a "cold start"
-# and reused across subsequent "warm" invocations.
-compression_retriever = None
+# The retrieval backend is defined globally. This is a performance optimization for
+# AWS Lambda, allowing the models to be loaded only once during a "cold start"
+# and reused across subsequent "warm" invocations. It is either the in-process
+# models or a client of the remote retrieval service (see `retrieval_service.py`).
+retrieval_backend = None
+
+# Precomputed answers for FAQ intents, built offline by `faq_cache.py`. Only
+# loaded when it matches the current knowledge-base content.
+faq_cache = None
+FAQ_HITS = metrics.Counter(
+    "badgerbot_faq_cache_hits_total",
+    "First-turn questions answered from the precomputed FAQ cache.",
+    "intent",
+)
+
+# Coalesces concurrent first-turn requests that ask the same question, so that
+# a burst of identical questions shares one retrieval and generation.
+inflight_questions = SingleFlight()
+COALESCED_REQUESTS = metrics.Counter(
+    "badgerbot_coalesced_requests_total",
+    "Requests that reused the answer of an identical in-flight request.",
+    "endpoint",
+)
+
+# Recently used chat histories, written through on every turn so that
+# consecutive turns served by this process skip the DynamoDB read.
+history_cache = SessionHistoryCache()
+
+# Bounds concurrent `/chat` pipelines and their queue, and rate-limits each session
+# (see `admission.py`).
+chat_admission = AdmissionController("/chat")
+session_limiter = SessionRateLimiter()
+
+# Sampled retrieval traces are appended to a rotating JSONL file under TRACE_DIR.
+trace_sink = TraceSink()
+
+# Upper limit on the number of queries accepted by one `/retrieve/batch` call.
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "64"))
+
+# --- Lambda Lifecycle Settings ---
+# On AWS Lambda the service is initialized while this module is imported, i.e. in
+# the Lambda init phase. That phase runs before any traffic with provisioned
+# concurrency and is snapshotted with SnapStart, so no user request pays for
+# loading the models. Elsewhere, initialization runs in the startup event.
+INIT_ON_IMPORT = os.getenv("INIT_ON_IMPORT", "1" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "0") == "1"
+LAMBDA_INIT_TYPE = os.getenv("AWS_LAMBDA_INITIALIZATION_TYPE", "on-demand")
+
+# Invoking the function with this key set (e.g. `{"warmup": true}` from a scheduled
+# rule) only makes sure the environment is initialized.
+WARMUP_EVENT_KEY = os.getenv("WARMUP_EVENT_KEY", "warmup")
+WARMUP_QUERY = "What are the prerequisites for COMP SCI 400?"
+
+initialized = False
+first_request = True
+_init_lock = threading.Lock()
+
+START_TYPES = metrics.Counter(
+    "badgerbot_request_starts_total",
+    "Requests by start type: cold (paid for initialization), prewarmed (first "
+    "request after initialization ran ahead of traffic), or warm.",
+    "start",
+)
 
 # --- RAG Pipeline Initialization ---
 
-@app.on_event("startup")
 def load_retriever():
     """
-    This startup event handler initializes the core RAG retriever model. This
-    process runs only once when the service starts, ensuring the model is
-    ready to handle requests efficiently.
+    Initializes the core RAG retriever model. This runs only once per process,
+    through `initialize`, ensuring the model is ready to handle requests
+    efficiently.
     """
-    global compression_retriever
+    global retrieval_backend, faq_cache
     
-    # Verify that the necessary API key is configured.
-    if not os.getenv("TOGETHER_API_KEY"):
-        raise ValueError("TOGETHER_API_KEY not found in environment.")
-
-    # 1. Load and structure knowledge base content from various sources.
-    documents = []
-    cs_data_parts = [
-        cs_bs_description_data, cs_bs_how_to_get_in_data, cs_bs_requirements_data, 
-        cs_bs_advanced_requirements_data, cs_bs_residence_honors_data, 
-        cs_bs_learning_outcomes_data, cs_bs_four_year_plan_data, cs_bs_scholarships_data,
-        cs_bs_advising_careers_data
-    ]
-    master_cs_data = {}
-    for part in cs_data_parts:
-        master_cs_data.update(part)
-    documents.append(Document(page_content=json.dumps(master_cs_data, indent=2), metadata={"source": "CS_BS_Major_Master_Document"}))
-    
-    for course in all_course_data:
-        documents.append(Document(page_content=json.dumps(course, indent=2), metadata={"source": f"{course.get('course_code', 'Unknown_Course')}.json"}))
-    
-    documents.append(Document(page_content=json.dumps(ls_bs_degree_requirements_data, indent=2), metadata={"source": "LS_BS_Degree_Requirements"}))
-    documents.append(Document(page_content=json.dumps(university_general_education_requirements_data, indent=2), metadata={"source": "University_General_Requirements"}))
+    # Verify that the API keys needed by the configured LLM backends are set.
+    missing = missing_credentials()
+    if missing:
+        raise ValueError(f"{', '.join(missing)} not found in environment.")
+
+    startup_start = time.perf_counter()
+    kb_hash = knowledge_base_hash()
+
+    # 1. Set up retrieval: query embedding, routing, dense search and re-ranking. When
+    #    RETRIEVAL_SERVICE_URL is set they run in the remote retrieval service and this
+    #    process loads no models; otherwise the models and index are loaded here.
+    #    The retrieval backend is stored in the global scope for reuse.
+    if RETRIEVAL_SERVICE_URL:
+        retrieval_backend = RemoteRetrieval(RETRIEVAL_SERVICE_URL)
+        if not retrieval_backend.ready():
+            print(f"Retrieval service at {RETRIEVAL_SERVICE_URL} is not ready yet; requests will retry it.")
+        print(f"Using the retrieval service at {RETRIEVAL_SERVICE_URL}.")
+    else:
+        retrieval_backend = load_local_retrieval(kb_hash)
+        # Run one retrieval so the models' first-call overhead is paid now, not by a user.
+        retrieval_backend.retrieve(WARMUP_QUERY)
+        print("Retriever loaded successfully.")
+
+    # 2. Compile the requisite graph up front so the first prerequisite question doesn't pay for it.
+    get_requisite_graph()
+
+    # 3. Load the precomputed FAQ answers, provided they were built from the current knowledge base.
+    faq_cache = FAQCache.load(FAQ_CACHE_PATH, kb_hash)
+    if faq_cache:
+        print(f"Loaded {len(faq_cache.intents)} precomputed FAQ answers.")
+
+    # 4. In preload mode, report this worker's memory use now that everything is loaded.
+    if SHARED_INDEX_DIR and not RETRIEVAL_SERVICE_URL:
+        report_worker_memory(SHARED_INDEX_DIR, shared_index=retrieval_backend.shared_index,
+                             model_lock_wait_s=retrieval_backend.model_lock_wait_s,
+                             startup_s=round(time.perf_counter() - startup_start, 3))
+
+def initialize() -> bool:
+    """
+    Runs `load_retriever` once per process, however many callers race to it.
+    Returns True only for the call that did the work.
+    """
+    global initialized
+    if initialized:
+        return False
+    with _init_lock:
+        if initialized:
+            return False
+        load_retriever()
+        initialized = True
+        return True
 
-    # 2. Segment the documents into smaller, more manageable chunks for efficient processing.
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
-    texts = text_splitter.split_documents(documents)
+@app.on_event("startup")
+def on_startup():
+    """Initializes the service before a long-running server accepts requests."""
+    initialize()
 
-    # 3. Convert text chunks into numerical vectors (embeddings) and load them into an in-memory vector store.
-    embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2"
-    embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
-    vectorstore = Chroma.from_documents(texts, embeddings)
-    
-    # 4. Configure the final retriever, which combines the vector store with a re-ranking model to improve search relevance.
-    base_retriever = vectorstore.as_retriever(search_kwargs={"k": 12})
-    cross_encoder_model = HuggingFaceCrossEncoder(model_name="cross-encoder/ms-marco-MiniLM-L-6-v2")
-    compressor = CrossEncoderReranker(model=cross_encoder_model, top_n=4)
-    
-    # The fully configured retriever is stored in the global scope for reuse.
-    compression_retriever = ContextualCompressionRetriever(
-        base_compressor=compressor, base_retriever=base_retriever
-    )
-    print("Retriever loaded successfully.")
+@app.middleware("http")
+async def report_cold_start(request: Request, call_next):
+    """
+    Initializes the process if that has not happened yet, and reports whether
+    the request paid for it in the `X-Cold-Start` header.
+    """
+    global first_request
+    initialized_now = False if initialized else await run_in_threadpool(initialize)
+    start_type = "cold" if initialized_now else ("prewarmed" if first_request else "warm")
+    first_request = False
+    START_TYPES.inc(start_type)
+    response = await call_next(request)
+    response.headers["X-Cold-Start"] = "true" if initialized_now else "false"
+    return response
 
 # --- DynamoDB Helper Functions ---
 
 def get_chat_history_from_dynamo(session_id: str):
     """
     Retrieves and formats the chat history for a given session from DynamoDB.
+    Returns the recent messages and the session's turn counter.
     """
-    history = []
     try:
-        response = chat_history_table.get_item(Key={'session_id': session_id})
-        if 'Item' in response and 'messages' in response['Item']:
-            messages = response['Item']['messages']
-            for msg in messages:
-                if msg['type'] == 'human':
-                    history.append(HumanMessage(content=msg['content']))
-                elif msg['type'] == 'ai':
-                    history.append(AIMessage(content=msg['content']))
+        return chat_store.load(session_id)
     except Exception as e:
         print(f"Error getting history from DynamoDB: {e}")
-    return history
+    return [], 0
 
-def save_messages_to_dynamo(session_id: str, human_message: str, ai_message: str):
+def save_messages_to_dynamo(session_id: str, human_message: str, ai_message: str, turn: int = 0):
     """
-    Saves the latest user query and AI response to the session's chat history in DynamoDB.
+    Saves the latest user query and AI response to the session's chat history
+    in DynamoDB. `turn` is the counter the history was read at. Returns the
+    new turn counter and, when another process has written to the session
+    since, its recent messages.
     """
     try:
-        # Appends new messages to the list, or creates the list if it doesn't exist.
-        chat_history_table.update_item(
-            Key={'session_id': session_id},
-            UpdateExpression="SET messages = list_append(if_not_exists(messages, :empty_list), :new_messages)",
-            ExpressionAttributeValues={
-                ':new_messages': [
-                    {'type': 'human', 'content': human_message},
-                    {'type': 'ai', 'content': ai_message}
-                ],
-                ':empty_list': []
-            }
-        )
+        return chat_store.append(session_id, human_message, ai_message, turn)
     except Exception as e:
         print(f"Error saving messages to DynamoDB: {e}")
+        return None, None
+
+def load_chat_history(session_id: str, turn: Optional[int]):
+    """
+    Returns the session's messages and turn counter, from the in-process cache
+    when the client's `turn` shows the cached copy is current, otherwise from
+    DynamoDB.
+    """
+    if turn is not None:
+        cached = history_cache.get(session_id, turn)
+        if cached is not None:
+            return cached, turn
+    history, stored_turn = get_chat_history_from_dynamo(session_id)
+    history_cache.put(session_id, stored_turn, history)
+    return history, stored_turn
+
+def save_chat_turn(session_id: str, chat_history: list, turn: int, question: str, answer: str) -> int:
+    """
+    Writes the new turn through to DynamoDB and the in-process cache, and
+    returns the session's new turn counter.
+    """
+    new_turn, stored_history = save_messages_to_dynamo(session_id, question, answer, turn)
+    if new_turn is None:
+        history_cache.invalidate(session_id)
+        return turn
+    if stored_history is None:
+        stored_history = recent(chat_history + [HumanMessage(content=question), AIMessage(content=answer)])
+    history_cache.put(session_id, new_turn, stored_history)
+    return new_turn
 
 # --- Conversational Chain Creation ---
 
-def create_conversational_rag_chain(retriever):
+# Standalone questions are short, so reformulation gets a small budget.
+REFORMULATION_MAX_TOKENS = int(os.getenv("REFORMULATION_MAX_TOKENS", "96"))
+
+ANSWER_TYPES = metrics.Counter(
+    "badgerbot_answer_types_total",
+    "Questions answered per answer type, which selects the generation budget.",
+    "type",
+)
+
+def create_llm(max_tokens: int = 1024, stop: list = None):
     """
-    Constructs the complete conversational RAG chain on a per-request basis.
-    This dynamic creation allows the inclusion of a specific user's chat
-    history for contextual understanding.
+    Creates the language model used for question reformulation and answering.
+    Requests go through the provider layer, which applies timeouts, hedging,
+    and failover across the backends configured in `LLM_PROVIDERS`.
     """
-    llm = Together(model="mistralai/Mistral-7B-Instruct-v0.2", temperature=0.2, max_tokens=1024)
+    return build_llm(temperature=0.2, max_tokens=max_tokens, stop=stop)
 
-    # 1. Define a prompt to rephrase the user's latest question into a standalone
-    #    query, using the conversation history for context.
-    contextualize_q_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", "Given a chat history and the latest user question which might reference context in the chat history, formulate a standalone question which can be understood without the chat history. Do NOT answer the question, just reformulate it if needed and otherwise return it as is."),
-            MessagesPlaceholder("chat_history"),
-            ("human", "{input}"),
-        ]
-    )
-    
-    # 2. Create a history-aware retriever that uses the above prompt to reformulate
-    #    the question before searching the knowledge base.
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, contextualize_q_prompt
-    )
+def reformulate_question(llm, question: str, chat_history: list) -> str:
+    """
+    Rephrases a follow-up question into a standalone search query. As with
+    LangChain's history-aware retriever, the question is used as-is when
+    there is no prior conversation.
+    """
+    if not chat_history:
+        return question
+    chain = contextualize_q_prompt | llm | StrOutputParser()
+    return chain.invoke({"input": question, "chat_history": chat_history})
 
-    # 3. Define the main prompt for the AI, instructing it on its persona ('BadgerBot'),
-    #    rules for answering, and how to use the retrieved context.
-    qa_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", """
-    You are 'BadgerBot', the official AI academic advisor for the UW-Madison Computer Sciences department. Your persona is helpful, encouraging, and highly professional. Your sole purpose is to provide accurate information to students based on the official documents provided.
-    
-    **Core Task:**
-    Analyze the user's `input` and the `chat_history` to understand their question fully. Then, carefully search the `context` to construct a comprehensive and accurate answer.
-    
-    **Rules of Engagement:**
-    1.  **Strictly Grounded:** Base your entire answer *only* on the information found in the `context`. Do not use any external knowledge or make assumptions.
-    2.  **Acknowledge Missing Information:** If the answer is not found in the `context`, you MUST state: "I'm sorry, but I couldn't find specific information about that in the provided documents."
-    3.  **Synthesize, Don't Just Recite:** If multiple pieces of the context are relevant, synthesize them into a single, coherent answer.
-    4.  **Formatting:** Use Markdown for clarity.
-        - Use bullet points (`-`) for lists (e.g., course requirements, career resources).
-        - Use bold text (`**text**`) for key terms like course codes, GPAs, or important deadlines.
-    5.  **Role-Play:** You are the 'assistant'. After providing your answer, you must stop. Do not generate a 'human' response or ask a follow-up question.
-    
-    Context:
-    {context}
-    """),
-            MessagesPlaceholder("chat_history"),
-            ("human", "{input}"),
-        ]
-    )
+def retrieve_documents(query: str, timings: dict = None, query_embedding=None, course_filter: dict = None,
+                       trace: dict = None):
+    """
+    Runs the retrieval stages, intent routing, dense vector search over the
+    routed collections, and cross-encoder re-ranking, in process or in the
+    retrieval service. A query embedding computed earlier in the request can
+    be passed in to avoid embedding the same text twice, and `course_filter`
+    restricts the course collection to matching courses.
+    """
+    return retrieval_backend.retrieve(query, timings, query_embedding, course_filter, trace)
 
-    # 4. Create a chain to feed the retrieved documents into the main QA prompt.
+def generate_answer(llm, question: str, chat_history: list, documents) -> str:
+    """Feeds the retrieved documents into the main QA prompt and generates the answer."""
     question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
-    
-    # 5. Assemble the final chain, orchestrating the history-aware retrieval and the final answer generation steps.
-    rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
-    
-    return rag_chain
+    return question_answer_chain.invoke(
+        {"input": question, "chat_history": chat_history, "context": documents}
+    )
+
+def computed_context_documents(question: str) -> list:
+    """
+    Builds context documents from the requisite graph and the degree-audit
+    engine for questions they can answer exactly.
+    """
+    documents = []
+    requisite_summary = get_requisite_graph().describe_for_question(question)
+    if requisite_summary:
+        documents.append(Document(page_content=requisite_summary, metadata={"source": "Requisite_Graph"}))
+    audit_summary = degree_audit.describe_for_question(question)
+    if audit_summary:
+        documents.append(Document(page_content=audit_summary, metadata={"source": "Degree_Audit"}))
+    return documents
+
+def run_conversational_rag(question: str, chat_history: list, timings: dict = None, query_embedding=None,
+                           trace: dict = None) -> str:
+    """
+    Executes the conversational RAG pipeline stage by stage: question
+    reformulation, routing, dense search, re-ranking, and answer generation. Stage
+    durations are recorded into the metrics histograms and `timings`.
+    `query_embedding` may only be supplied for first-turn questions, where
+    the standalone question is the question itself. A sampled request's
+    `trace` receives the intermediate results of each stage.
+    """
+    # 1. Rephrase the question using the chat history so it can be searched on its own.
+    with metrics.timed("reformulate", timings):
+        reformulation_llm = create_llm(REFORMULATION_MAX_TOKENS, REFORMULATION_STOP_SEQUENCES)
+        standalone_question = reformulate_question(reformulation_llm, question, chat_history).strip() or question
+
+    # 2. Turn constraints in the question (course level, breadth, credits) into a
+    #    course metadata pre-filter, then search the routed collections and re-rank the candidates.
+    #    The kind of answer the question calls for sets the generation budget.
+    with metrics.timed("query_analysis", timings):
+        course_filter = query_analysis.build_course_filter(standalone_question)
+        answer_type = query_analysis.classify_answer_type(standalone_question)
+        ANSWER_TYPES.inc(answer_type)
+    documents = retrieve_documents(standalone_question, timings, query_embedding, course_filter, trace)
+
+    # 3. Add grounded context computed by the deterministic engines, so the model does
+    #    not have to reassemble prerequisite chains or degree progress from several chunks.
+    with metrics.timed("grounding", timings):
+        documents = computed_context_documents(standalone_question) + documents
+
+    # 4. Generate the final answer from the original question and the retrieved context,
+    #    within the budget for its answer type and stopping before any invented next turn.
+    if trace is not None:
+        record_prompt_trace(trace, question, standalone_question, chat_history, documents, answer_type, course_filter)
+    with metrics.timed("generate", timings):
+        llm = create_llm(query_analysis.ANSWER_TOKEN_BUDGETS[answer_type], TURN_STOP_SEQUENCES)
+        return generate_answer(llm, question, chat_history, documents)
+
+def record_prompt_trace(trace: dict, question: str, standalone_question: str, chat_history: list, documents: list,
+                        answer_type: str, course_filter: dict):
+    """Records the query analysis and the estimated size of both prompts into a trace."""
+    trace.update({"standalone_question": standalone_question, "answer_type": answer_type, "course_filter": course_filter})
+    context = "\n\n".join(document.page_content for document in documents)
+    trace["prompt_tokens"] = {
+        "reformulate": estimate_tokens(contextualize_q_prompt.format(input=question, chat_history=chat_history)) if chat_history else 0,
+        "generate": estimate_tokens(qa_prompt.format(input=question, chat_history=chat_history, context=context)),
+    }
+
+def normalize_question(question: str) -> str:
+    """Normalizes a question for equality checks: case, whitespace, and trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.!").strip().lower()
 
 # --- API Endpoints ---
 @app.post("/chat")
-def get_answer(request: ChatRequest):
+def get_answer(request: ChatRequest, response: Response):
     """
-    Main API endpoint to process user queries. It orchestrates session
-    management, history retrieval, RAG chain execution, and response storage.
+    Main API endpoint to process user queries. Each question is first checked
+    against its session's rate limit and admitted by the concurrency limiter,
+    so that under overload excess requests are turned away quickly with a
+    `Retry-After` instead of queueing until they time out. Requests that start
+    a new session are only bounded by the concurrency limiter.
     """
-    if not compression_retriever:
+    if not retrieval_backend:
         raise HTTPException(status_code=503, detail="Retriever is not ready.")
 
+    try:
+        if request.session_id:
+            session_limiter.check(request.session_id)
+        with chat_admission.admit():
+            return answer_question(request, response)
+    except Rejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+
+def answer_question(request: ChatRequest, response: Response):
+    """
+    Processes an admitted question. It orchestrates session management,
+    history retrieval, RAG chain execution, and response storage.
+    """
+    request_start = time.perf_counter()
+    timings = {}
+
     # 1. Manage the conversation session. If no session_id is provided, a new one is created.
+    #    A sample of requests also record a retrieval trace (see `tracing.py`).
     session_id = request.session_id if request.session_id else str(uuid.uuid4())
-
-    # 2. Fetch the conversation history for the current session from DynamoDB.
-    chat_history = get_chat_history_from_dynamo(session_id)
-
-    # 3. Dynamically construct the conversational RAG chain, injecting the retrieved chat history.
-    conversational_rag_chain = create_conversational_rag_chain(compression_retriever)
+    trace = start_trace()
+    if trace is not None:
+        trace.update({"session_id": session_id, "question": request.question, "path": "rag"})
+
+    # 2. Fetch the conversation history for the current session, from the in-process
+    #    cache when it is current, otherwise from DynamoDB. A new session has none,
+    #    unless its first question was answered from the client's cache; that turn
+    #    is recorded first so this question is answered in its context.
+    with metrics.timed("history_fetch", timings):
+        if request.session_id:
+            chat_history, turn = load_chat_history(session_id, request.turn)
+        elif request.cached_turn:
+            cached = request.cached_turn
+            turn = save_chat_turn(session_id, [], 0, cached.question, cached.answer)
+            chat_history = [HumanMessage(content=cached.question), AIMessage(content=cached.answer)]
+        else:
+            chat_history, turn = [], 0
 
     try:
-        # 4. Execute the RAG chain with the user's question to generate an answer.
-        result = conversational_rag_chain.invoke(
-            {"input": request.question, "chat_history": chat_history}
-        )
-        answer = result.get("answer", "I apologize, but I couldn't retrieve an answer.")
-
-        # 5. Persist the new question and the AI's answer to the session history in DynamoDB.
-        save_messages_to_dynamo(session_id, request.question, answer)
-
-        # 6. Return the generated answer and the session_id to the client.
-        return {"answer": answer, "session_id": session_id}
+        # 3. Execute the RAG pipeline with the user's question to generate an answer.
+        #    First-turn questions do not depend on any history, so identical ones
+        #    that arrive concurrently share a single pipeline run.
+        #    First-turn questions that match an FAQ intent are served from the precomputed cache.
+        faq_match = None
+        query_embedding = None
+        if not chat_history and faq_cache:
+            with metrics.timed("faq_match", timings):
+                query_embedding = retrieval_backend.embed_query(request.question)
+                faq_match = faq_cache.match(query_embedding)
+
+        if faq_match:
+            intent, answer, _ = faq_match
+            FAQ_HITS.inc(intent)
+            if trace is not None:
+                trace.update({"path": "faq", "faq_intent": intent})
+        elif chat_history:
+            answer = run_conversational_rag(request.question, chat_history, timings, trace=trace)
+        else:
+            wait_start = time.perf_counter()
+            answer, shared = inflight_questions.do(
+                normalize_question(request.question),
+                lambda: run_conversational_rag(request.question, [], timings, query_embedding, trace),
+            )
+            if shared:
+                if trace is not None:
+                    trace["path"] = "coalesced"
+                COALESCED_REQUESTS.inc("/chat")
+                timings["coalesced_wait"] = time.perf_counter() - wait_start
+                metrics.STAGE_SECONDS.observe("coalesced_wait", timings["coalesced_wait"])
+        if not answer:
+            answer = "I apologize, but I couldn't retrieve an answer."
+
+        # 4. Persist the new question and the AI's answer to the session history in
+        #    DynamoDB, writing through to the in-process cache.
+        with metrics.timed("history_save", timings):
+            turn = save_chat_turn(session_id, chat_history, turn, request.question, answer)
+
+        # 5. Report stage timings to the client and return the answer with the session_id.
+        #    An answer given without any history is the same for every session, so
+        #    the client may cache it for first questions.
+        total = time.perf_counter() - request_start
+        metrics.REQUEST_SECONDS.observe("/chat", total)
+        timings["total"] = total
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+        if trace is not None:
+            trace["answer_chars"] = len(answer)
+            trace_sink.write(trace, timings)
+        return {"answer": answer, "session_id": session_id, "turn": turn, "cacheable": not chat_history}
         
     except Exception as e:
         # General error handler for the RAG chain process.
         print(f"Error during chain invocation: {e}")
+        if trace is not None:
+            trace["error"] = str(e)
+            trace_sink.write(trace, timings)
         raise HTTPException(status_code=500, detail="An error occurred while processing your request.")
 
+@app.post("/retrieve/batch")
+def retrieve_batch(request: RetrieveBatchRequest, response: Response):
+    """
+    Resolves many queries at once without calling the LLM, e.g. to annotate
+    every course on a transcript. All queries are embedded in one batch,
+    searched with one matrix query per collection, and re-ranked in one
+    cross-encoder pass. Returns the ranked chunks for each query.
+    """
+    if not retrieval_backend:
+        raise HTTPException(status_code=503, detail="Retriever is not ready.")
+    if not request.queries or len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"queries must contain between 1 and {MAX_BATCH_QUERIES} items.")
+    if request.top_n < 1:
+        raise HTTPException(status_code=400, detail="top_n must be at least 1.")
+
+    request_start = time.perf_counter()
+    timings = {}
+
+    # Embed, route, search and re-rank all queries together.
+    results = retrieval_backend.retrieve_batch(request.queries, request.top_n, timings)
+
+    total = time.perf_counter() - request_start
+    metrics.REQUEST_SECONDS.observe("/retrieve/batch", total)
+    timings["total"] = total
+    response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+    return {"results": results}
+
+@app.get("/requisites")
+def get_requisites(course: str):
+    """
+    Answers prerequisite-path and "what does this unlock" queries for a course
+    directly from the compiled requisite graph, without calling the LLM.
+    """
+    graph = get_requisite_graph()
+    code = graph.resolve(course)
+    if not code or code not in graph.courses:
+        raise HTTPException(status_code=404, detail=f"Course '{course}' was not found in the catalog.")
+    result = graph.prerequisites_for(code)
+    result["unlocks"] = graph.unlocks(code)
+    result["unlocks_eventually"] = graph.unlocks(code, transitive=True)
+    return result
+
+@app.post("/audit")
+def run_degree_audit(request: AuditRequest):
+    """
+    Evaluates a student's completed courses against the compiled major and
+    L&S degree requirements and returns what remains, without calling the LLM.
+    """
+    if not request.completed_courses:
+        raise HTTPException(status_code=400, detail="completed_courses must not be empty.")
+    return degree_audit.audit(request.completed_courses, request.course_credits, request.total_credits)
+
+@app.post("/plan")
+def create_plan(request: PlanRequest):
+    """
+    Searches for a semester-by-semester schedule that completes the major by
+    the last requested term while respecting prerequisites and credit limits.
+    """
+    try:
+        with metrics.timed("plan_search"):
+            return planner.generate_plan(
+                request.completed_courses, request.terms, request.desired_courses,
+                request.course_credits, request.min_credits, request.max_credits,
+            )
+    except planner.PlanningError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Exposes the in-process stage histograms in the Prometheus text format."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def read_root():
     """Provides a simple health check endpoint to confirm the service is operational."""
     return {"status": "UW-Madison CS Advisor API is running."}
 
-# The Mangum handler acts as an adapter, allowing the FastAPI application to
-# run within the AWS Lambda environment.
-handler = Mangum(app)
+# --- AWS Lambda Entry Point ---
+
+def is_warmup_event(event) -> bool:
+    """Recognizes explicit warm-up invocations and EventBridge scheduled pings."""
+    if not isinstance(event, dict):
+        return False
+    return bool(event.get(WARMUP_EVENT_KEY)) or (
+        event.get("source") == "aws.events" and event.get("detail-type") == "Scheduled Event"
+    )
+
+# The Mangum adapter allows the FastAPI application to run within the AWS Lambda
+# environment. Initialization is handled by `initialize` rather than by running
+# the startup event on every invocation.
+mangum_handler = Mangum(app, lifespan="off")
+
+def handler(event, context):
+    """
+    Lambda entry point. Warm-up events take a lightweight path that only makes
+    sure the environment is initialized; all other events are HTTP requests
+    served by FastAPI through Mangum.
+    """
+    if is_warmup_event(event):
+        initialized_now = initialize()
+        START_TYPES.inc("warmup")
+        return {"warm": True, "cold_start": initialized_now, "init_type": LAMBDA_INIT_TYPE}
+    return mangum_handler(event, context)
+
+if INIT_ON_IMPORT:
+    # A failure here is retried by the first request instead of failing the init phase.
+    try:
+        initialize()
+        print(f"Initialized during the Lambda init phase ({LAMBDA_INIT_TYPE}).")
+    except Exception as e:
+        print(f"Initialization during import failed; retrying on the first request: {e}")
 
@@ -0,0 +1,154 @@
+"""
+In-process latency and traffic metrics for the UW-Madison CS Advisor backend.
+
+Each stage of the RAG pipeline records its duration into a fixed-bucket
+histogram. The collected metrics are rendered in the Prometheus text exposition
+format by the `/metrics` endpoint, and per-request stage timings are surfaced
+to clients through the `Server-Timing` response header.
+"""
+
+# --- Core Imports ---
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) for the latency histograms. The range covers both
+# sub-millisecond cache hits and multi-second LLM generations.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Every metric registers itself here so `render_prometheus` can export it.
+_REGISTRY = []
+
+# --- Metric Types ---
+
+class Histogram:
+    """A labelled, thread-safe histogram with cumulative Prometheus buckets."""
+
+    def __init__(self, name: str, help_text: str, label_name: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, label_value: str, value: float):
+        """Records a single observation for the given label value."""
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[label_value] = series
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def count(self, label_value: str) -> int:
+        """Returns the number of observations recorded for the given label value."""
+        with self._lock:
+            series = self._series.get(label_value)
+            return series["count"] if series else 0
+
+    def quantile(self, label_value: str, q: float):
+        """
+        Estimates a quantile from the bucket counts, returning the upper bound
+        of the bucket that contains it, or None if nothing was observed.
+        """
+        with self._lock:
+            series = self._series.get(label_value)
+            if not series or not series["count"]:
+                return None
+            target = q * series["count"]
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                if cumulative >= target:
+                    return upper_bound
+            return self.buckets[-1]
+
+    def render(self):
+        """Returns the histogram as lines in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, series in sorted(self._series.items()):
+                cumulative = 0
+                for upper_bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{self.label_name}="{label_value}",le="{upper_bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{self.label_name}="{label_value}",le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{self.label_name}="{label_value}"}} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{{{self.label_name}="{label_value}"}} {series["count"]}')
+        return lines
+
+
+class Counter:
+    """A labelled, thread-safe, monotonically increasing counter."""
+
+    def __init__(self, name: str, help_text: str, label_name: str):
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self._values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def inc(self, label_value: str, amount: float = 1):
+        """Increments the counter for the given label value."""
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        """Returns the counter as lines in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_value, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{self.label_name}="{label_value}"}} {value}')
+        return lines
+
+# --- Application Metrics ---
+
+STAGE_SECONDS = Histogram(
+    "badgerbot_stage_duration_seconds",
+    "Time spent in each stage of the chat pipeline.",
+    "stage",
+)
+REQUEST_SECONDS = Histogram(
+    "badgerbot_request_duration_seconds",
+    "End-to-end time spent handling a request.",
+    "endpoint",
+)
+
+# --- Timing Helpers ---
+
+@contextmanager
+def timed(stage: str, timings: dict = None):
+    """
+    Times the enclosed block and records it under `stage`. When a per-request
+    `timings` dict is supplied, the duration is also accumulated into it so it
+    can be reported back to the client.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(stage, elapsed)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def server_timing_header(timings: dict) -> str:
+    """Formats per-request stage timings as a `Server-Timing` header value."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def render_prometheus() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
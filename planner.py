@@ -0,0 +1,309 @@
+"""
+Four-year-plan generator for the B.S. in Computer Sciences.
+
+`cs_bs_four_year_plan_data` is a single static sample plan. This module builds
+a personalized semester schedule instead. Starting from a student's completed
+courses, it selects the courses that still satisfy the major requirements
+(using the degree-audit engine) together with any prerequisites they need (using
+the requisite graph). It then searches for a term-by-term schedule that
+respects prerequisites and per-term credit limits.
+
+The search is a depth-first constraint solver over (term, courses done)
+states. Failed states are memoized, and two lower bounds prune early: the
+longest remaining prerequisite chain and the remaining credit volume. It is
+run for increasing per-term major-credit caps, so the first plan found also
+spreads the major coursework as evenly as the prerequisites allow.
+
+Proving that no schedule exists can take exponentially many states, so the
+search is budgeted. Each cap below `max_credits` gets `PLAN_CAP_STATES`
+states before the next cap is tried, and the whole search is bounded by
+`PLAN_MAX_STATES` states and `PLAN_TIMEOUT_S` seconds, past which
+`PlanningError` is raised instead of holding a worker.
+"""
+
+# --- Core Imports ---
+import os
+import time
+from functools import lru_cache
+
+# --- Local Imports ---
+from knowledge_base import cs_bs_four_year_plan_data
+import degree_audit
+from requisites import get_requisite_graph, is_satisfied, courses_in
+
+# Credits assumed for courses outside the catalog when the caller gives none.
+DEFAULT_COURSE_CREDITS = 3.0
+
+# --- Search Budget ---
+PLAN_CAP_STATES = int(os.getenv("PLAN_CAP_STATES", "500"))
+PLAN_MAX_STATES = int(os.getenv("PLAN_MAX_STATES", "10000"))
+PLAN_TIMEOUT_S = float(os.getenv("PLAN_TIMEOUT_S", "1.0"))
+
+
+def _plan_credit_limits():
+    """Reads the per-term credit range used by the sample four-year plan (14-16 credits)."""
+    credits = [
+        term["credits"]
+        for year, terms in cs_bs_four_year_plan_data["four_year_plan"].items() if isinstance(terms, dict)
+        for term in terms.values()
+    ]
+    return min(credits), max(credits)
+
+
+MIN_TERM_CREDITS, MAX_TERM_CREDITS = _plan_credit_limits()
+
+
+class PlanningError(ValueError):
+    """Raised when no schedule satisfies the requested constraints, or none is found within the search budget."""
+
+
+class _BudgetExhausted(Exception):
+    """Stops a search that has used up its states or time."""
+
+# --- Course Selection ---
+
+def _extra_needed(graph, node, have: frozenset) -> frozenset:
+    """
+    The cheapest set of additional courses (including their own prerequisites)
+    that satisfies a course-only requirement tree, given the courses in `have`.
+    """
+    @lru_cache(maxsize=None)
+    def cost(node):
+        if node is None:
+            return frozenset()
+        if node[0] == "course":
+            code = node[1]
+            if code in have:
+                return frozenset()
+            return frozenset({code}) | cost(graph.course_requirements.get(code))
+        options = [cost(child) for child in node[1]]
+        if node[0] == "and":
+            return frozenset().union(*options)
+        return min(options, key=lambda option: (
+            sum(code not in graph.courses for code in option), len(option), sorted(option)
+        ))
+    return cost(node)
+
+
+def select_courses(completed: list, desired: list = ()) -> dict:
+    """
+    Picks the courses still to be taken: missing required courses, the
+    cheapest options for each unmet "choose N" group (preferring the student's
+    desired courses), and every prerequisite those courses need. Returns
+    {course: requirement id or "prerequisite"/"desired"}.
+    """
+    graph = get_requisite_graph()
+    audit = degree_audit.audit(completed)
+    have = frozenset(audit["completed_courses"])
+    selected = {code: "desired" for code in desired if code not in have}
+    used = set()
+
+    def add(code: str, reason: str):
+        if code not in selected or selected[code] in ("desired", "prerequisite"):
+            selected[code] = reason
+        used.add(code)
+
+    for requirement in audit["requirements"]:
+        remaining = requirement.get("remaining")
+        if requirement["group"] != "major" or not remaining:
+            continue
+        if isinstance(remaining.get("courses"), list):
+            for code in remaining["courses"]:
+                add(code, requirement["id"])
+            continue
+
+        # Choose groups: reuse courses already in the plan, then add the cheapest options.
+        options = [code for code in remaining["options"] if code not in used]
+        chosen = [code for code in options if code in selected][:remaining["choose"]]
+        pool = have | frozenset(selected)
+        ranked = sorted(
+            (code for code in options if code not in chosen),
+            key=lambda code: (len(_extra_needed(graph, ("course", code), pool)), code not in graph.courses, code),
+        )
+        chosen += ranked[:remaining["choose"] - len(chosen)]
+        for code in chosen:
+            add(code, requirement["id"])
+
+    # Close the selection under prerequisites until nothing new is needed.
+    changed = True
+    while changed:
+        changed = False
+        for code in list(selected):
+            extra = _extra_needed(graph, graph.course_requirements.get(code), have | frozenset(selected))
+            for prerequisite in extra - set(selected):
+                selected[prerequisite] = "prerequisite"
+                changed = True
+    return {"completed": sorted(have), "selected": selected}
+
+# --- Schedule Search ---
+
+class _Solver:
+    """Memoized depth-first search for a schedule under a per-term credit cap."""
+
+    def __init__(self, courses: list, credits: dict, requirements: dict, completed: frozenset, terms: int, cap: float,
+                 max_states: int = PLAN_MAX_STATES, deadline: float = None):
+        self.courses = frozenset(courses)
+        self.credits = credits
+        self.requirements = requirements
+        self.completed = completed
+        self.terms = terms
+        self.cap = cap
+        self.max_states = max_states
+        self.deadline = deadline
+        self.failed = set()
+        self.states = 0
+
+        # Longest chain of selected courses that depends on each course, used as a
+        # lower bound on the number of terms still needed and as a priority.
+        dependents = {code: [] for code in courses}
+        for code in courses:
+            for prerequisite in courses_in(requirements.get(code)):
+                if prerequisite in dependents:
+                    dependents[prerequisite].append(code)
+
+        @lru_cache(maxsize=None)
+        def height(code):
+            return 1 + max((height(dependent) for dependent in dependents[code]), default=0)
+
+        self.height = {code: height(code) for code in courses}
+
+    def solve(self):
+        return self._search(0, frozenset())
+
+    def _search(self, term: int, done: frozenset):
+        remaining = self.courses - done
+        if not remaining:
+            return []
+        terms_left = self.terms - term
+        if terms_left <= 0 or (term, done) in self.failed:
+            return None
+        self.states += 1
+        if self.states > self.max_states or (self.deadline is not None and time.perf_counter() > self.deadline):
+            raise _BudgetExhausted()
+
+        # Lower bounds: the longest prerequisite chain and the total credit volume.
+        if max(self.height[code] for code in remaining) > terms_left or \
+                sum(self.credits[code] for code in remaining) > terms_left * self.cap:
+            self.failed.add((term, done))
+            return None
+
+        taken = self.completed | done
+        eligible = sorted(
+            (code for code in remaining if is_satisfied(self.requirements.get(code), taken)),
+            key=lambda code: (-self.height[code], -self.credits[code], code),
+        )
+        for packing in self._packings(eligible):
+            rest = self._search(term + 1, done | packing)
+            if rest is not None:
+                return [packing] + rest
+        self.failed.add((term, done))
+        return None
+
+    def _packings(self, eligible: list):
+        """
+        Yields the maximal sets of eligible courses that fit under the credit
+        cap, highest-priority first. Non-maximal sets never need to be tried:
+        taking an eligible course earlier can only relax later terms.
+        """
+        def extend(index: int, chosen: tuple, load: float):
+            if index == len(eligible):
+                if all(code in chosen or load + self.credits[code] > self.cap for code in eligible):
+                    yield frozenset(chosen)
+                return
+            code = eligible[index]
+            if load + self.credits[code] <= self.cap:
+                yield from extend(index + 1, chosen + (code,), load + self.credits[code])
+            yield from extend(index + 1, chosen, load)
+
+        seen = set()
+        for packing in extend(0, (), 0.0):
+            if packing and packing not in seen:
+                seen.add(packing)
+                yield packing
+
+
+def _credit_caps(credits: list, lowest: float, highest: float) -> list:
+    """
+    The per-term caps worth trying: the distinct sums of course credits between
+    `lowest` and `highest`. A cap between two sums admits the same packings as
+    the lower one, so fractional limits are tried exactly.
+    """
+    sums = {0.0}
+    for value in credits:
+        sums |= {round(total + value, 6) for total in sums if total + value <= highest + 1e-9}
+    return sorted(total for total in sums if total >= lowest - 1e-9)
+
+
+def generate_plan(completed_courses, terms, desired_courses=(), course_credits: dict = None,
+                  min_credits: float = MIN_TERM_CREDITS, max_credits: float = MAX_TERM_CREDITS) -> dict:
+    """
+    Builds a term-by-term plan that completes the major by the last of
+    `terms`. Each term's major courses stay within `max_credits`; the rest of
+    the term, up to `min_credits`, is left open for breadth, language, and
+    other degree requirements. Raises PlanningError when no schedule exists.
+    """
+    start = time.perf_counter()
+    terms = list(terms)
+    if not terms:
+        raise PlanningError("At least one term is required.")
+
+    desired, _ = degree_audit.normalize_courses(desired_courses)
+    selection = select_courses(completed_courses, desired)
+    graph = get_requisite_graph()
+    completed = frozenset(selection["completed"])
+    courses = sorted(selection["selected"])
+    overrides = {}
+    for text, value in (course_credits or {}).items():
+        for code in degree_audit.normalize_courses([text])[0]:
+            overrides[code] = value
+    credits = {code: degree_audit.course_credits(code, overrides) or DEFAULT_COURSE_CREDITS for code in courses}
+    requirements = {code: graph.course_requirements.get(code) for code in courses}
+
+    # Try the smallest per-term cap first so the major load is spread evenly. A cap
+    # whose search runs past PLAN_CAP_STATES is skipped; the last cap gets the rest
+    # of the budget, since only it can show that no schedule exists at all.
+    schedule, states = None, 0
+    deadline = start + PLAN_TIMEOUT_S
+    if courses:
+        lowest_cap = max(max(credits.values()), sum(credits.values()) / len(terms))
+        caps = _credit_caps(credits.values(), lowest_cap, max_credits)
+        for index, cap in enumerate(caps):
+            budget = PLAN_MAX_STATES - states
+            if index < len(caps) - 1:
+                budget = min(budget, PLAN_CAP_STATES)
+            solver = _Solver(courses, credits, requirements, completed, len(terms), cap, budget, deadline)
+            try:
+                schedule = solver.solve()
+            except _BudgetExhausted:
+                if index == len(caps) - 1 or time.perf_counter() > deadline:
+                    raise PlanningError(
+                        f"No schedule for the remaining {len(courses)} courses in {len(terms)} terms was found "
+                        f"within the search budget. Try more terms, fewer desired courses, or a higher max_credits."
+                    )
+            finally:
+                states += solver.states
+            if schedule is not None:
+                break
+        if schedule is None:
+            raise PlanningError(
+                f"No schedule completes the remaining {len(courses)} courses in {len(terms)} terms "
+                f"with at most {max_credits:g} credits per term."
+            )
+    schedule = schedule or []
+
+    plan = []
+    for index, name in enumerate(terms):
+        packing = sorted(schedule[index], key=lambda code: graph.position.get(code, 0)) if index < len(schedule) else []
+        major_credits = sum(credits[code] for code in packing)
+        plan.append({
+            "term": name,
+            "courses": [{"code": code, "credits": credits[code], "fulfills": selection["selected"][code]} for code in packing],
+            "major_credits": major_credits,
+            "open_credits": max(0, min_credits - major_credits),
+        })
+    return {
+        "completed_courses": selection["completed"],
+        "terms": plan,
+        "total_major_credits": sum(credits.values()),
+        "search": {"states_explored": states, "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)},
+    }
@@ -0,0 +1,72 @@
+"""
+Prompt templates for the BadgerBot RAG pipeline.
+
+Both prompts are ordered from most to least stable, so that providers and
+inference servers with prefix (KV) caching can reuse as much work as possible
+across requests:
+
+1. The static instructions. These are byte-identical for every request.
+2. The chat history. It only grows within a session, so each turn's prompt
+   shares the previous turn's history as a prefix.
+3. The per-request retrieved context and the latest question.
+"""
+
+# --- LangChain Imports ---
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+# --- Static Instructions ---
+# These strings must not contain template variables or anything else that
+# varies between requests; any change to them invalidates every cached prefix.
+
+CONTEXTUALIZE_INSTRUCTIONS = (
+    "Given a chat history and the latest user question which might reference context in the chat history, "
+    "formulate a standalone question which can be understood without the chat history. Do NOT answer the "
+    "question, just reformulate it if needed and otherwise return it as is."
+)
+
+BADGERBOT_INSTRUCTIONS = """You are 'BadgerBot', the official AI academic advisor for the UW-Madison Computer Sciences department. Your persona is helpful, encouraging, and highly professional. Your sole purpose is to provide accurate information to students based on the official documents provided.
+
+**Core Task:**
+Analyze the user's `input` and the `chat_history` to understand their question fully. Then, carefully search the `context` to construct a comprehensive and accurate answer.
+
+**Rules of Engagement:**
+1.  **Strictly Grounded:** Base your entire answer *only* on the information found in the `context`. Do not use any external knowledge or make assumptions.
+2.  **Acknowledge Missing Information:** If the answer is not found in the `context`, you MUST state: "I'm sorry, but I couldn't find specific information about that in the provided documents."
+3.  **Synthesize, Don't Just Recite:** If multiple pieces of the context are relevant, synthesize them into a single, coherent answer.
+4.  **Formatting:** Use Markdown for clarity.
+    - Use bullet points (`-`) for lists (e.g., course requirements, career resources).
+    - Use bold text (`**text**`) for key terms like course codes, GPAs, or important deadlines.
+5.  **Role-Play:** You are the 'assistant'. After providing your answer, you must stop. Do not generate a 'human' response or ask a follow-up question."""
+
+# --- Stop Sequences ---
+# Prompts are rendered as "System: / Human: / AI:" transcripts. Generation
+# stops before the model starts writing another turn of the conversation,
+# instead of relying on rule 5 of the instructions alone.
+TURN_STOP_SEQUENCES = ["\nHuman:", "\nHUMAN:", "\nUser:", "\nSystem:", "[INST]"]
+
+# A standalone question is a single line.
+REFORMULATION_STOP_SEQUENCES = TURN_STOP_SEQUENCES + ["\nAI:", "\n\n"]
+
+# --- Prompt Templates ---
+
+# Prompt used to rephrase the user's latest question into a standalone query,
+# using the conversation history for context.
+contextualize_q_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", CONTEXTUALIZE_INSTRUCTIONS),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ]
+)
+
+# The main prompt for the AI, instructing it on its persona ('BadgerBot'),
+# rules for answering, and how to use the retrieved context. The retrieved
+# context comes after the history, just before the question.
+qa_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", BADGERBOT_INSTRUCTIONS),
+        MessagesPlaceholder("chat_history"),
+        ("system", "Context:\n{context}"),
+        ("human", "{input}"),
+    ]
+)
@@ -0,0 +1,159 @@
+"""
+Course metadata promotion and query analysis for filtered retrieval.
+
+Each course in the knowledge base carries structured designations: level,
+breadth, gen-ed, credits and honors flags. `course_metadata` promotes them into
+scalar vector-store metadata fields. `build_course_filter` looks for the same
+constraints in a question ("advanced courses that count for physical science
+breadth") and turns them into a Chroma `where` filter for the course
+collection, so dense scoring and re-ranking only consider matching courses.
+
+The filter only applies to the course collection. The other collections (the
+major, L&S and gen-ed requirements) stay unfiltered, because they often hold
+the answer to constrained questions too.
+
+`classify_answer_type` sorts questions into factual lookups, lists, and
+planning questions, which get different generation budgets.
+"""
+
+# --- Core Imports ---
+import os
+import re
+
+# Document types stored in the `doc_type` metadata field.
+COURSE_DOC = "course"
+PROGRAM_DOC = "program"
+
+# --- Metadata Promotion ---
+
+def _credit_range(credits):
+    """Returns (min, max) credits for values such as 3 or "1-3"."""
+    if isinstance(credits, str):
+        parts = [int(part) for part in re.findall(r"\d+", credits)]
+        return (min(parts), max(parts)) if parts else (0, 0)
+    return int(credits), int(credits)
+
+
+def course_metadata(course: dict) -> dict:
+    """
+    Flattens a course's designations into scalar metadata fields that the
+    vector store can index and filter on.
+    """
+    designation = course.get("designation", {})
+    breadth = designation.get("breadth", "")
+    gen_ed = designation.get("gen_ed", "")
+    credits_min, credits_max = _credit_range(course.get("credits", 0))
+    number = re.search(r"(\d+)$", course.get("course_code", ""))
+    return {
+        "source": f"{course.get('course_code', 'Unknown_Course')}.json",
+        "doc_type": COURSE_DOC,
+        "course_code": course.get("course_code", ""),
+        "course_number": int(number.group(1)) if number else 0,
+        "level": designation.get("level", ""),
+        "breadth": breadth,
+        # Physical Science courses also count toward the Natural Science breadth.
+        "counts_natural_science": "Natural Sci" in breadth or "Physical Sci" in breadth,
+        "counts_physical_science": "Physical Sci" in breadth,
+        "gen_ed": gen_ed,
+        "qr_a": gen_ed == "Quantitative Reasoning Part A",
+        "qr_b": gen_ed == "Quantitative Reasoning Part B",
+        "credits_min": credits_min,
+        "credits_max": credits_max,
+        "honors": "honors" in designation,
+        "grad_50_percent": "grad_50_percent" in designation,
+        "workplace": "workplace" in designation,
+    }
+
+# --- Query Analysis ---
+
+# (pattern, metadata constraint) pairs. Patterns are matched against the
+# lower-cased question.
+_CONSTRAINT_PATTERNS = [
+    (r"\badvanced[- ]level\b|\badvanced (?:cs |comp sci |computer science )?(?:courses?|classes)\b", {"level": "Advanced"}),
+    (r"\bintermediate[- ]level\b|\bintermediate (?:cs |comp sci |computer science )?(?:courses?|classes)\b", {"level": "Intermediate"}),
+    (r"\belementary[- ]level\b|\belementary (?:cs |comp sci |computer science )?(?:courses?|classes)\b", {"level": "Elementary"}),
+    (r"\bphysical sci(?:ence)?\b", {"counts_physical_science": True}),
+    (r"\bnatural sci(?:ence)?\b", {"counts_natural_science": True}),
+    (r"\b(?:qr|quantitative reasoning)[- ]?(?:part )?a\b", {"qr_a": True}),
+    (r"\b(?:qr|quantitative reasoning)[- ]?(?:part )?b\b", {"qr_b": True}),
+    (r"\bhonou?rs(?:[- ]only)? (?:courses?|classes|sections?)\b", {"honors": True}),
+    (r"\b50%? ?(?:percent )?graduate coursework\b", {"grad_50_percent": True}),
+    (r"\bworkplace experience\b", {"workplace": True}),
+]
+_CREDITS_RE = re.compile(r"\b(\d)[- ]credits?\b")
+_COURSE_LIST_RE = re.compile(r"\b(?:courses?|classes)\b")
+
+
+def extract_constraints(question: str) -> list:
+    """Returns the course-metadata constraints recognized in a question."""
+    lowered = question.lower()
+    if not _COURSE_LIST_RE.search(lowered):
+        return []
+    constraints = []
+    for pattern, constraint in _CONSTRAINT_PATTERNS:
+        if re.search(pattern, lowered) and constraint not in constraints:
+            constraints.append(constraint)
+    # "Natural science" is implied by "physical science", so keep only the narrower one.
+    if {"counts_physical_science": True} in constraints and {"counts_natural_science": True} in constraints:
+        constraints.remove({"counts_natural_science": True})
+    credits = _CREDITS_RE.search(lowered)
+    if credits:
+        value = int(credits.group(1))
+        constraints += [{"credits_min": {"$lte": value}}, {"credits_max": {"$gte": value}}]
+    return constraints
+
+
+def build_course_filter(question: str):
+    """
+    Builds a Chroma `where` filter for the course collection that keeps only
+    the courses matching the constraints in the question, or None if the
+    question has no recognizable constraints.
+    """
+    constraints = extract_constraints(question)
+    if not constraints:
+        return None
+    # Chroma requires at least two operands for "$and".
+    return constraints[0] if len(constraints) == 1 else {"$and": constraints}
+
+# --- Answer Types ---
+
+FACTUAL = "factual"
+LIST = "list"
+PLANNING = "planning"
+
+# Maximum tokens generated for each answer type. Factual lookups ("how many
+# credits is CS 240") need a sentence or two; planning answers lay out several
+# semesters.
+ANSWER_TOKEN_BUDGETS = {
+    FACTUAL: int(os.getenv("FACTUAL_MAX_TOKENS", "256")),
+    LIST: int(os.getenv("LIST_MAX_TOKENS", "640")),
+    PLANNING: int(os.getenv("PLANNING_MAX_TOKENS", "1024")),
+}
+
+_PLANNING_RE = re.compile(
+    r"\b(?:plan|planning|schedule|roadmap|four[- ]year|4[- ]year|semesters?|next (?:term|year)|"
+    r"what should i take|in what order|graduate (?:on time|early|in))\b"
+)
+_LIST_RE = re.compile(
+    r"^(?:which|list|name)\b|\b(?:what are|what courses|what classes|options|electives|all the|"
+    r"requirements|resources|scholarships|ways to|examples)\b"
+)
+_FACTUAL_RE = re.compile(
+    r"^(?:how many|how much|what is|what's|who|when|where|is|are|does|do|can|did|was)\b"
+)
+
+
+def classify_answer_type(question: str) -> str:
+    """
+    Classifies the answer a question calls for as a factual lookup, a list,
+    or a plan. Questions with no clear cue get the list budget.
+    """
+    lowered = re.sub(r"\s+", " ", question.lower()).strip()
+    if _PLANNING_RE.search(lowered):
+        return PLANNING
+    if _LIST_RE.search(lowered):
+        return LIST
+    if _FACTUAL_RE.search(lowered):
+        return FACTUAL
+    return LIST
+
@@ -0,0 +1,493 @@
+"""
+Requisite graph engine for prerequisite-chain questions.
+
+Every course in `all_course_data` stores its requisites as free text, e.g.
+"E C E/COMP SCI 354 and (COMP SCI 367 or 400) or graduate/professional
+standing". This module compiles those strings into AND/OR expression trees,
+links them into a prerequisite DAG, and precomputes transitive closures and a
+topological order. Questions such as "what do I need before CS 537" or "what
+does CS 400 unlock" can then be answered with dictionary lookups instead of
+asking the LLM to piece together several retrieved chunks.
+
+Expression trees are nested tuples:
+    ("course", "COMP SCI 400")
+    ("condition", "graduate/professional standing")
+    ("and", (child, child, ...))
+    ("or", (child, child, ...))
+"""
+
+# --- Core Imports ---
+import re
+from functools import lru_cache
+
+# --- Local Imports ---
+from knowledge_base import all_course_data
+
+# --- Tokenization ---
+
+# A subject is one or more upper-case words, e.g. "MATH", "E C E", "F&W ECOL".
+_SUBJECT = r"[A-Z][A-Z&]*(?: [A-Z&]+)*"
+_TOKEN_RE = re.compile(
+    rf"(?P<placement>placement into (?:{_SUBJECT}) \d{{2,3}})"
+    rf"|(?P<course>(?:{_SUBJECT})(?:/(?:{_SUBJECT}))* \d{{2,3}})\b"
+    r"|(?P<number>\b\d{2,3}\b)"
+    r"|(?P<lparen>\()|(?P<rparen>\))|(?P<comma>,)|(?P<semi>;)"
+    r"|(?P<word>[^\s,;()]+)"
+)
+# Qualifiers that only date an equivalent course and carry no requirement.
+_QUALIFIER_RE = re.compile(r"\s*prior to (?:Spring|Summer|Fall) \d{4}")
+
+# Common ways students write subjects in questions, mapped to catalog subjects.
+_SUBJECT_ALIASES = {
+    "CS": "COMP SCI", "COMPSCI": "COMP SCI", "COMP SCI": "COMP SCI",
+    "ECE": "E C E", "E C E": "E C E", "MATH": "MATH", "STAT": "STAT",
+    "LIS": "L I S", "L I S": "L I S", "ISYE": "I SY E", "I SY E": "I SY E",
+    "BMI": "B M I", "B M I": "B M I", "DS": "DS", "ME": "M E", "M E": "M E",
+}
+_MENTION_RE = re.compile(
+    r"\b(comp\s*sci|compsci|cs|e\s*c\s*e|ece|math|stat|l\s*i\s*s|lis|i\s*sy\s*e|isye|b\s*m\s*i|bmi|ds)\s*(\d{3})\b"
+    r"|\b(\d{3})\b",
+    re.IGNORECASE,
+)
+
+
+def _split_code(code: str):
+    """Splits a catalog code such as "COMP SCI/E C E 354" into its subjects and number."""
+    subjects, number = code.rsplit(" ", 1)
+    return subjects.split("/"), number
+
+
+def _tokenize(text: str, aliases: dict):
+    """
+    Turns a requisite string into (kind, value) tokens. Bare numbers inherit
+    the subjects of the last explicit course, so "COMP SCI 200, 220" yields
+    two course tokens.
+    """
+    tokens = []
+    last_subjects = None
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "course":
+            last_subjects, number = _split_code(value)
+            tokens.append(("course", _canonical(last_subjects, number, aliases)))
+        elif kind == "number":
+            if last_subjects:
+                tokens.append(("course", _canonical(last_subjects, value, aliases)))
+            else:
+                tokens.append(("word", value))
+        elif kind == "placement":
+            tokens.append(("word", value))
+        elif kind == "word" and value.lower() in ("and", "or"):
+            tokens.append((value.lower(), value))
+        else:
+            tokens.append((kind, value))
+    return tokens
+
+
+def _canonical(subjects, number: str, aliases: dict) -> str:
+    """Resolves a (possibly cross-listed) course reference to its catalog code."""
+    for subject in subjects:
+        code = aliases.get((subject, number))
+        if code:
+            return code
+    return f"{'/'.join(subjects)} {number}"
+
+# --- Parsing ---
+
+def _combine(op: str, children):
+    """Builds an AND/OR node, flattening nested nodes of the same type and dropping duplicates."""
+    flat = []
+    for child in children:
+        if child is None:
+            continue
+        for node in (child[1] if child[0] == op else (child,)):
+            if node not in flat:
+                flat.append(node)
+    if not flat:
+        return None
+    if len(flat) == 1:
+        return flat[0]
+    return (op, tuple(flat))
+
+
+def _parse_atoms(atoms):
+    """
+    Combines adjacent operands that have no connective between them. Runs of
+    words form a single condition; a course followed by a parenthesised
+    alternative is an OR; a course qualified by a condition is an AND.
+    """
+    if not atoms:
+        return None
+    if all(atom[0] == "condition" for atom in atoms):
+        return ("condition", " ".join(atom[1] for atom in atoms))
+    courses = [atom for atom in atoms if atom[0] != "condition"]
+    conditions = [atom for atom in atoms if atom[0] == "condition"]
+    node = _combine("or", courses)
+    return _combine("and", [node] + conditions) if conditions else node
+
+
+def _parse_item(tokens):
+    """Parses a comma-free run of tokens, where AND binds tighter than OR."""
+    disjuncts, conjuncts, atoms, words = [], [], [], []
+
+    def flush_words():
+        if words:
+            atoms.append(("condition", " ".join(words)))
+            words.clear()
+
+    for kind, value in tokens:
+        if kind == "word":
+            words.append(value)
+            continue
+        flush_words()
+        if kind in ("course", "group"):
+            atoms.append(("course", value) if kind == "course" else value)
+        elif kind == "and":
+            conjuncts.append(_parse_atoms(atoms))
+            atoms = []
+        elif kind == "or":
+            conjuncts.append(_parse_atoms(atoms))
+            disjuncts.append(_combine("and", conjuncts))
+            conjuncts, atoms = [], []
+    flush_words()
+    conjuncts.append(_parse_atoms(atoms))
+    disjuncts.append(_combine("and", conjuncts))
+    return _combine("or", disjuncts)
+
+
+def _parse_list(items):
+    """
+    Combines comma-separated items. A connective before an item closes the
+    list built so far: "A, B, and C, or D" becomes OR(AND(A, B, C), D).
+    """
+    current = []
+    for connective, node in items:
+        current.append(node)
+        if connective:
+            current = [_combine(connective, current)]
+    return _combine("or", current)
+
+
+def _parse_tokens(tokens, pos: int = 0):
+    """Parses tokens up to the matching close parenthesis (or the end). Returns (node, pos)."""
+    segments, items, item = [], [], []
+
+    def close_item():
+        if item:
+            connective = None
+            if item[0][0] in ("and", "or"):
+                connective = item.pop(0)[0]
+            items.append((connective, _parse_item(list(item))))
+            item.clear()
+
+    while pos < len(tokens):
+        kind, value = tokens[pos]
+        pos += 1
+        if kind == "lparen":
+            node, pos = _parse_tokens(tokens, pos)
+            if node is not None:
+                item.append(("group", node))
+        elif kind == "rparen":
+            break
+        elif kind == "comma":
+            close_item()
+        elif kind == "semi":
+            close_item()
+            segments.append(_parse_list(items))
+            items = []
+        else:
+            item.append((kind, value))
+    close_item()
+    segments.append(_parse_list(items))
+    return _combine("or", segments), pos
+
+
+def parse_requisites(text: str, aliases: dict = None):
+    """
+    Compiles a requisite string into an AND/OR expression tree, or None if it
+    has no requirements. Exclusion sentences ("Not open to students with
+    credit for ...") and notes ("... does not fulfill the prerequisite") are
+    not requirements and are skipped.
+    """
+    aliases = aliases if aliases is not None else _catalog_aliases()
+    if not text or text.strip().lower() == "none":
+        return None
+    sentences = [sentence.strip().rstrip(".") for sentence in re.split(r"(?<=\.)\s+", text.strip())]
+    kept = [
+        sentence for sentence in sentences
+        if sentence and not sentence.lower().startswith("not open to") and "does not fulfill" not in sentence.lower()
+    ]
+    node, _ = _parse_tokens(_tokenize(_QUALIFIER_RE.sub("", "; ".join(kept)), aliases))
+    return node
+
+
+def course_requirement(node):
+    """
+    Projects an expression tree onto courses only. Non-course conditions such
+    as class standing or instructor consent are dropped, and an OR whose
+    alternatives are all conditions disappears.
+    """
+    if node is None or node[0] == "condition":
+        return None
+    if node[0] == "course":
+        return node
+    return _combine(node[0], [course_requirement(child) for child in node[1]])
+
+
+def conditions_of(node):
+    """Lists the non-course conditions mentioned anywhere in an expression tree."""
+    if node is None or node[0] == "course":
+        return []
+    if node[0] == "condition":
+        return [node[1]]
+    found = []
+    for child in node[1]:
+        for condition in conditions_of(child):
+            if condition not in found:
+                found.append(condition)
+    return found
+
+
+def courses_in(node):
+    """Returns every course code mentioned in an expression tree, in order of appearance."""
+    if node is None or node[0] == "condition":
+        return []
+    if node[0] == "course":
+        return [node[1]]
+    found = []
+    for child in node[1]:
+        for code in courses_in(child):
+            if code not in found:
+                found.append(code)
+    return found
+
+
+def is_satisfied(node, completed) -> bool:
+    """Evaluates a course-only expression tree against a set of completed course codes."""
+    if node is None:
+        return True
+    if node[0] == "course":
+        return node[1] in completed
+    if node[0] == "and":
+        return all(is_satisfied(child, completed) for child in node[1])
+    return any(is_satisfied(child, completed) for child in node[1])
+
+
+def format_requirement(node) -> str:
+    """Renders an expression tree back into readable text with explicit grouping."""
+    if node is None:
+        return "None"
+    if node[0] in ("course", "condition"):
+        return node[1]
+    joined = f" {node[0].upper()} ".join(
+        f"({format_requirement(child)})" if child[0] in ("and", "or") else format_requirement(child)
+        for child in node[1]
+    )
+    return joined
+
+# --- Requisite Graph ---
+
+@lru_cache(maxsize=1)
+def _catalog_aliases() -> dict:
+    """Maps every (subject, number) of each cross-listed catalog course to its catalog code."""
+    aliases = {}
+    for course in all_course_data:
+        subjects, number = _split_code(course["course_code"])
+        for subject in subjects:
+            aliases[(subject, number)] = course["course_code"]
+    return aliases
+
+
+class RequisiteGraph:
+    """
+    A compiled prerequisite DAG over the course catalog. Transitive closures,
+    a topological order, and cheapest prerequisite paths are computed once at
+    construction so that queries are plain lookups.
+    """
+
+    def __init__(self, courses: list):
+        self.aliases = _catalog_aliases()
+        self.courses = {course["course_code"]: course for course in courses}
+        self.requisites = {}
+        self.course_requirements = {}
+        self.prerequisites = {}
+        self.unlocks_direct = {}
+
+        # 1. Compile every requisite string and record the direct edges.
+        for code, course in self.courses.items():
+            tree = parse_requisites(course.get("requisites", ""), self.aliases)
+            self.requisites[code] = tree
+            self.course_requirements[code] = course_requirement(tree)
+            self.prerequisites[code] = [c for c in courses_in(self.course_requirements[code]) if c != code]
+            for prerequisite in self.prerequisites[code]:
+                self.unlocks_direct.setdefault(prerequisite, []).append(code)
+                self.prerequisites.setdefault(prerequisite, [])
+
+        # 2. Order all nodes so that every course comes after its prerequisites.
+        self.topological_order = self._topological_sort()
+        self.position = {code: i for i, code in enumerate(self.topological_order)}
+
+        # 3. Precompute closures and cheapest paths in dependency order.
+        self.ancestors = {}
+        self.shortest_paths = {}
+        for code in self.topological_order:
+            ancestors = set()
+            for prerequisite in self.prerequisites[code]:
+                ancestors.add(prerequisite)
+                ancestors |= self.ancestors[prerequisite]
+            self.ancestors[code] = frozenset(ancestors)
+            self.shortest_paths[code] = self._cheapest(self.course_requirements.get(code))
+
+        self.descendants = {code: set() for code in self.topological_order}
+        for code in reversed(self.topological_order):
+            for dependent in self.unlocks_direct.get(code, []):
+                self.descendants[code].add(dependent)
+                self.descendants[code] |= self.descendants[dependent]
+
+    def _topological_sort(self) -> list:
+        """Kahn's algorithm; edges that would close a cycle are dropped with a warning."""
+        indegree = {code: len(prerequisites) for code, prerequisites in self.prerequisites.items()}
+        ready = sorted((code for code, degree in indegree.items() if degree == 0), key=_sort_key)
+        order = []
+        while ready:
+            code = ready.pop(0)
+            order.append(code)
+            for dependent in self.unlocks_direct.get(code, []):
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    ready.append(dependent)
+            ready.sort(key=_sort_key)
+        if len(order) < len(indegree):
+            cyclic = sorted((code for code in indegree if code not in set(order)), key=_sort_key)
+            print(f"Requisite cycle detected; ignoring prerequisites of: {', '.join(cyclic)}")
+            for code in cyclic:
+                for prerequisite in self.prerequisites[code]:
+                    self.unlocks_direct[prerequisite].remove(code)
+                self.prerequisites[code] = []
+                self.course_requirements[code] = None
+            order.extend(cyclic)
+        return order
+
+    def _cheapest(self, node) -> frozenset:
+        """
+        Smallest set of courses that satisfies `node`, choosing the cheapest OR
+        branch. Branches through courses in the current catalog are preferred
+        over retired or outside courses that merely have no listed requisites.
+        """
+        if node is None:
+            return frozenset()
+        if node[0] == "course":
+            return frozenset({node[1]}) | self.shortest_paths.get(node[1], frozenset())
+        options = [self._cheapest(child) for child in node[1]]
+        if node[0] == "and":
+            return frozenset().union(*options)
+        return min(options, key=lambda option: (
+            sum(code not in self.courses for code in option), len(option), sorted(map(_sort_key, option))
+        ))
+
+    def _ordered(self, codes) -> list:
+        return sorted(codes, key=lambda code: self.position.get(code, 0))
+
+    # --- Query API ---
+
+    def resolve(self, text: str):
+        """Resolves user-written course references ("CS 537", "ece 552") to a catalog code."""
+        codes = find_course_mentions(text, self.aliases)
+        return codes[0] if codes else None
+
+    def prerequisites_for(self, code: str) -> dict:
+        """Describes everything required before taking `code`."""
+        tree = self.requisites.get(code)
+        return {
+            "course": code,
+            "requisites_text": self.courses.get(code, {}).get("requisites"),
+            "requirement": format_requirement(self.course_requirements.get(code)),
+            "direct_prerequisites": self._ordered(self.prerequisites.get(code, [])),
+            "all_prerequisites": self._ordered(self.ancestors.get(code, ())),
+            "shortest_path": self._ordered(self.shortest_paths.get(code, ())),
+            "other_conditions": conditions_of(tree),
+        }
+
+    def unlocks(self, code: str, transitive: bool = False) -> list:
+        """Courses that list `code` as a prerequisite, optionally following the chain."""
+        found = self.descendants.get(code, set()) if transitive else self.unlocks_direct.get(code, [])
+        return self._ordered(found)
+
+    def eligible_courses(self, completed) -> list:
+        """Catalog courses not yet completed whose course prerequisites are all met."""
+        completed = set(completed)
+        return self._ordered(
+            code for code in self.courses
+            if code not in completed and is_satisfied(self.course_requirements[code], completed)
+        )
+
+    def describe_for_question(self, question: str):
+        """
+        Builds a grounded text summary of the prerequisite chain and unlocked
+        courses for each course mentioned in a prerequisite-style question, or
+        returns None if the question is not about requisites.
+        """
+        lowered = question.lower()
+        asks_before = any(cue in lowered for cue in _PREREQUISITE_CUES)
+        asks_after = any(cue in lowered for cue in _UNLOCK_CUES)
+        if not (asks_before or asks_after):
+            return None
+        codes = [code for code in find_course_mentions(question, self.aliases) if code in self.courses]
+        if not codes:
+            return None
+
+        lines = ["Prerequisite information computed from the official course requisites:"]
+        for code in codes:
+            info = self.prerequisites_for(code)
+            if asks_before:
+                lines.append(f"- {code} requisites (as listed): {info['requisites_text']}")
+                if info["all_prerequisites"]:
+                    lines.append(f"  - Course requirement: {info['requirement']}")
+                    lines.append(f"  - Shortest prerequisite chain, in order: {', '.join(info['shortest_path'])}")
+                    lines.append(f"  - All courses that appear anywhere in its prerequisite chain: {', '.join(info['all_prerequisites'])}")
+                else:
+                    lines.append("  - No course prerequisites.")
+            if asks_after:
+                direct = self.unlocks(code)
+                lines.append(f"- Courses that list {code} as a prerequisite: {', '.join(direct) if direct else 'none'}")
+        return "\n".join(lines)
+
+
+_PREREQUISITE_CUES = ("prereq", "pre-req", "requisite", "before", "need to take", "required for", "eligible", "qualify", "chain")
+_UNLOCK_CUES = ("unlock", "after taking", "after i take", "open up", "opens up", "lead to", "leads to", "can i take after", "allow me to take")
+
+
+def _sort_key(code: str):
+    _, number = _split_code(code)
+    return (int(number) if number.isdigit() else 0, code)
+
+
+def find_course_mentions(text: str, aliases: dict = None) -> list:
+    """
+    Extracts course references from free text, e.g. "CS 537 and 564" gives
+    ["COMP SCI 537", "COMP SCI 564"]. Bare numbers are only taken as courses
+    after a subject has been mentioned.
+    """
+    aliases = aliases if aliases is not None else _catalog_aliases()
+    found = []
+    subject = None
+    for match in _MENTION_RE.finditer(text):
+        if match.group(1):
+            key = re.sub(r"\s+", " ", match.group(1).upper())
+            subject = _SUBJECT_ALIASES.get(key, _SUBJECT_ALIASES.get(key.replace(" ", ""), key))
+            number = match.group(2)
+        elif subject:
+            number = match.group(3)
+        else:
+            continue
+        code = _canonical([subject], number, aliases)
+        if code not in found:
+            found.append(code)
+    return found
+
+
+@lru_cache(maxsize=1)
+def get_requisite_graph() -> RequisiteGraph:
+    """Returns the process-wide requisite graph, compiling it on first use."""
+    return RequisiteGraph(all_course_data)
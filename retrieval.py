@@ -0,0 +1,332 @@
+"""
+Knowledge-base indexing and intent-routed retrieval for the RAG pipeline.
+
+The knowledge base is split into sub-indexes, one Chroma collection per kind
+of content: course descriptions, the CS major requirements, the L&S and
+university general-education requirements, and the advising, career and
+scholarship resources. A nearest-centroid router compares each query embedding
+with the centroids of a few seed questions per collection. Only the
+collections the query is close to are searched, so a question about
+scholarships is never scored against 75 course descriptions, and the
+cross-encoder re-ranks fewer, more relevant candidates.
+"""
+
+# --- Core Imports ---
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# --- LangChain Imports ---
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+
+# --- Local Imports ---
+from knowledge_base import (
+    cs_bs_description_data, cs_bs_how_to_get_in_data, cs_bs_requirements_data,
+    cs_bs_advanced_requirements_data, cs_bs_residence_honors_data,
+    cs_bs_learning_outcomes_data, cs_bs_four_year_plan_data,
+    cs_bs_scholarships_data, cs_bs_advising_careers_data,
+    all_course_data, ls_bs_degree_requirements_data,
+    university_general_education_requirements_data
+)
+import metrics
+from query_analysis import course_metadata, PROGRAM_DOC
+from requisites import find_course_mentions
+
+# --- Retrieval Settings ---
+# Dense candidates passed to the re-ranker, across all searched collections.
+SEARCH_K = int(os.getenv("SEARCH_K", "12"))
+
+# Collections whose centroid similarity is within this margin of the best one
+# are searched too, up to ROUTE_MAX_COLLECTIONS of them.
+ROUTE_MARGIN = float(os.getenv("ROUTE_MARGIN", "0.05"))
+ROUTE_MAX_COLLECTIONS = int(os.getenv("ROUTE_MAX_COLLECTIONS", "2"))
+
+# When no centroid is at least this similar, the router is unsure and every
+# collection is searched.
+ROUTE_MIN_SCORE = float(os.getenv("ROUTE_MIN_SCORE", "0.2"))
+
+# Cascade pruning: dense candidates whose cosine similarity is below this fraction
+# of the best candidate's are dropped before the cross-encoder (0 disables it).
+# At least the re-ranker's top_n candidates are always kept. It ships disabled:
+# no cutoff has yet been measured with the production embedding and cross-encoder
+# models, and an untested cutoff could silently drop chunks the cross-encoder
+# would have kept. Choose one with `benchmarks/bench_rerank_cascade.py`, e.g. the
+# highest cutoff whose minimum recall@4 stays at 1.0.
+RERANK_RELATIVE_CUTOFF = float(os.getenv("RERANK_RELATIVE_CUTOFF", "0"))
+
+# --- Collections ---
+COURSES = "courses"
+MAJOR = "major"
+GEN_ED = "gen_ed"
+CAREERS = "careers"
+COLLECTIONS = (COURSES, MAJOR, GEN_ED, CAREERS)
+
+# Example questions for each collection. Their mean embedding is the
+# collection's centroid in the router.
+ROUTE_SEEDS = {
+    COURSES: [
+        "What is CS 537 about?",
+        "What are the prerequisites for COMP SCI 540?",
+        "Which courses cover machine learning?",
+        "How many credits is CS 400?",
+        "Is there an honors section of CS 354?",
+        "Which advanced courses count for physical science breadth?",
+    ],
+    MAJOR: [
+        "What are the requirements for the computer sciences major?",
+        "How do I declare the CS major?",
+        "Which math courses does the CS major require?",
+        "What are the advanced requirement areas for the major?",
+        "What are the residence and quality of work requirements?",
+        "What does the four-year plan look like?",
+        "What are the learning outcomes of the CS degree?",
+    ],
+    GEN_ED: [
+        "What general education requirements do I need to complete?",
+        "What are the L&S requirements for a Bachelor of Science?",
+        "How many semesters of a foreign language does L&S require?",
+        "What counts toward the ethnic studies requirement?",
+        "What is the Communication Part A requirement?",
+        "How many total credits do I need to graduate?",
+    ],
+    CAREERS: [
+        "What scholarships are available for CS students?",
+        "Where can I find career resources?",
+        "How do I find an internship as a CS major?",
+        "Who are the computer sciences advisors?",
+        "How do I schedule an advising appointment?",
+        "Are there career fairs for computer science students?",
+    ],
+}
+
+ROUTE_SELECTIONS = metrics.Counter(
+    "badgerbot_route_selections_total",
+    "Queries that searched each knowledge-base collection.",
+    "collection",
+)
+RERANK_PRUNING = metrics.Counter(
+    "badgerbot_rerank_pruning_total",
+    "Dense candidates kept for or pruned before the cross-encoder by the relative cutoff.",
+    "outcome",
+)
+RERANK_CANDIDATES = metrics.Histogram(
+    "badgerbot_rerank_candidates",
+    "Dense candidates passed to the cross-encoder per query.",
+    "collections",
+    buckets=(1, 2, 4, 6, 8, 10, 12, 16, 24, 32),
+)
+
+# --- Document Loading ---
+
+def _merge(parts) -> dict:
+    merged = {}
+    for part in parts:
+        merged.update(part)
+    return merged
+
+
+def load_collection_documents() -> dict:
+    """Structures the knowledge-base content into documents for each collection."""
+    major_data = _merge([
+        cs_bs_description_data, cs_bs_how_to_get_in_data, cs_bs_requirements_data,
+        cs_bs_advanced_requirements_data, cs_bs_residence_honors_data,
+        cs_bs_learning_outcomes_data, cs_bs_four_year_plan_data,
+    ])
+    careers_data = _merge([cs_bs_advising_careers_data, cs_bs_scholarships_data])
+    return {
+        # Course designations (level, breadth, credits, honors) are promoted into filterable metadata.
+        COURSES: [
+            Document(page_content=json.dumps(course, indent=2), metadata=course_metadata(course))
+            for course in all_course_data
+        ],
+        MAJOR: [Document(page_content=json.dumps(major_data, indent=2), metadata={"source": "CS_BS_Major_Master_Document", "doc_type": PROGRAM_DOC})],
+        GEN_ED: [
+            Document(page_content=json.dumps(ls_bs_degree_requirements_data, indent=2), metadata={"source": "LS_BS_Degree_Requirements", "doc_type": PROGRAM_DOC}),
+            Document(page_content=json.dumps(university_general_education_requirements_data, indent=2), metadata={"source": "University_General_Requirements", "doc_type": PROGRAM_DOC}),
+        ],
+        CAREERS: [Document(page_content=json.dumps(careers_data, indent=2), metadata={"source": "CS_BS_Advising_Careers_Scholarships", "doc_type": PROGRAM_DOC})],
+    }
+
+# --- Intent Router ---
+
+class IntentRouter:
+    """Picks the collections to search by comparing a query embedding with per-collection centroids."""
+
+    def __init__(self, centroids: dict):
+        self.names = list(centroids)
+        matrix = np.asarray([centroids[name] for name in self.names], dtype=np.float32)
+        self.centroids = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    @classmethod
+    def from_seeds(cls, embeddings, seeds: dict = ROUTE_SEEDS):
+        """Builds the router from the mean normalized embedding of each collection's seed questions."""
+        centroids = {}
+        for name, questions in seeds.items():
+            vectors = np.asarray(embeddings.embed_documents(questions), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            centroids[name] = vectors.mean(axis=0)
+        return cls(centroids)
+
+    def scores(self, query_embedding) -> dict:
+        """Returns the cosine similarity between the query and each centroid."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        similarities = self.centroids @ (query / np.linalg.norm(query))
+        return {name: float(score) for name, score in zip(self.names, similarities)}
+
+    def route(self, query_embedding) -> list:
+        """Returns the collections to search, most similar first."""
+        ranked = sorted(self.scores(query_embedding).items(), key=lambda item: -item[1])
+        best = ranked[0][1]
+        if best < ROUTE_MIN_SCORE:
+            return [name for name, _ in ranked]
+        return [name for name, score in ranked if score >= best - ROUTE_MARGIN][:ROUTE_MAX_COLLECTIONS]
+
+# --- Retriever ---
+
+class KnowledgeRetriever:
+    """
+    Dense search over the routed collections followed by cross-encoder
+    re-ranking. The two stages are separate methods so each can be timed.
+    """
+
+    def __init__(self, indexes: dict, sizes: dict, router: IntentRouter, reranker, search_k: int = SEARCH_K,
+                 rerank_cutoff: float = RERANK_RELATIVE_CUTOFF):
+        # Each index exposes Chroma's collection `query` interface: a Chroma
+        # collection, or a `shared_index.SharedMatrixIndex` in preload mode.
+        self.indexes = indexes
+        self.sizes = sizes
+        self.router = router
+        self.reranker = reranker
+        self.search_k = search_k
+        self.rerank_cutoff = rerank_cutoff
+
+    def select_collections(self, question: str, query_embedding, course_filter: dict = None) -> list:
+        """
+        Routes a query to collections. Questions that name a course or carry
+        course constraints always include the course collection.
+        """
+        collections = self.router.route(query_embedding)
+        if COURSES not in collections and (course_filter or find_course_mentions(question)):
+            collections.append(COURSES)
+        for name in collections:
+            ROUTE_SELECTIONS.inc(name)
+        return collections
+
+    def dense_search(self, query_embedding, collections=COLLECTIONS, course_filter: dict = None, with_distances: bool = False) -> list:
+        """
+        Searches each collection and returns the overall `search_k` closest
+        chunks. `course_filter` is a metadata filter for the course collection.
+        With `with_distances`, returns `(document, distance)` pairs instead.
+        """
+        return self.batch_dense_search([query_embedding], [collections], [course_filter], with_distances)[0]
+
+    def batch_dense_search(self, query_embeddings: list, collections: list, course_filters: list, with_distances: bool = False) -> list:
+        """
+        Dense search for many queries at once. Queries that search the same
+        collection with the same filter are sent to the index as a single
+        multi-vector query. Returns the candidate chunks of each query, as
+        `(document, distance)` pairs with `with_distances`.
+        """
+        # 1. Group the queries by (collection, filter).
+        groups = {}
+        for index, (names, course_filter) in enumerate(zip(collections, course_filters)):
+            for name in names:
+                search_filter = course_filter if name == COURSES else None
+                key = (name, json.dumps(search_filter, sort_keys=True))
+                groups.setdefault(key, (search_filter, []))[1].append(index)
+
+        # 2. Run one matrix search per group.
+        scored = [[] for _ in query_embeddings]
+        for (name, _), (search_filter, indexes) in groups.items():
+            result = self.indexes[name].query(
+                query_embeddings=[list(query_embeddings[index]) for index in indexes],
+                n_results=min(self.search_k, self.sizes[name]),
+                where=search_filter,
+                include=["documents", "metadatas", "distances"],
+            )
+            for row, index in enumerate(indexes):
+                for text, metadata, distance in zip(result["documents"][row], result["metadatas"][row], result["distances"][row]):
+                    scored[index].append((Document(page_content=text, metadata=metadata or {}), distance))
+
+        # 3. Merge each query's results across collections. Every collection uses the
+        #    same embedding model and distance, so distances are comparable.
+        candidates = []
+        for names, pairs in zip(collections, scored):
+            pairs.sort(key=lambda pair: pair[1])
+            candidates.append(pairs[:self.search_k] if with_distances else [document for document, _ in pairs[:self.search_k]])
+            RERANK_CANDIDATES.observe(str(len(names)), len(candidates[-1]))
+        return candidates
+
+    def prune_candidates(self, candidates: list, cutoff: float = None) -> list:
+        """
+        The cheap first stage of the re-ranking cascade. Takes `(document, distance)`
+        pairs, closest first, and drops those whose dense similarity is below
+        `cutoff` times the closest one's, keeping at least `top_n`.
+        """
+        cutoff = self.rerank_cutoff if cutoff is None else cutoff
+        if cutoff <= 0 or not candidates:
+            return candidates
+        # The embeddings are unit-normalized, so a squared L2 distance d is a cosine similarity of 1 - d / 2.
+        similarities = [1 - distance / 2 for _, distance in candidates]
+        if similarities[0] <= 0:
+            return candidates
+        passing = sum(1 for similarity in similarities if similarity >= cutoff * similarities[0])
+        kept = candidates[:max(passing, self.reranker.top_n)]
+        RERANK_PRUNING.inc("kept", len(kept))
+        RERANK_PRUNING.inc("pruned", len(candidates) - len(kept))
+        return kept
+
+    def rerank(self, query: str, candidates: list) -> list:
+        """Re-scores the dense candidates with the cross-encoder and keeps the best ones."""
+        return [document for document, _ in self.score_candidates(query, candidates)[:self.reranker.top_n]]
+
+    def score_candidates(self, query: str, candidates: list) -> list:
+        """Scores every dense candidate with the cross-encoder, returning `(document, score)` pairs, best first."""
+        if not candidates:
+            return []
+        return self.batch_rerank([query], [candidates], top_n=len(candidates))[0]
+
+    def batch_rerank(self, queries: list, candidates: list, top_n: int = None) -> list:
+        """
+        Re-ranks the candidates of many queries with a single cross-encoder
+        pass. Returns the best `(document, score)` pairs for each query.
+        """
+        top_n = top_n or self.reranker.top_n
+        pairs = [(query, document.page_content) for query, documents in zip(queries, candidates) for document in documents]
+        scores = iter(self.reranker.model.score(pairs) if pairs else [])
+        ranked = []
+        for documents in candidates:
+            scored = [(document, float(next(scores))) for document in documents]
+            scored.sort(key=lambda pair: -pair[1])
+            ranked.append(scored[:top_n])
+        return ranked
+
+
+def chunk_id(document: Document) -> str:
+    """A stable identifier for a chunk: its source and a hash of its text."""
+    digest = hashlib.sha1(document.page_content.encode("utf-8")).hexdigest()[:10]
+    return f"{document.metadata.get('source', 'unknown')}#{digest}"
+
+
+def chunk_collections() -> dict:
+    """Splits each collection's documents into the chunks that are indexed."""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
+    return {name: text_splitter.split_documents(documents) for name, documents in load_collection_documents().items()}
+
+
+def build_retriever(embeddings, reranker) -> KnowledgeRetriever:
+    """
+    Chunks each collection's documents, indexes them into their own in-memory
+    Chroma collection, and builds the intent router.
+    """
+    indexes, sizes = {}, {}
+    for name, chunks in chunk_collections().items():
+        vectorstore = Chroma.from_documents(chunks, embeddings, collection_name=f"badgerbot_{name}")
+        indexes[name] = vectorstore._collection
+        sizes[name] = len(chunks)
+    print("Indexed collections: " + ", ".join(f"{name} ({size} chunks)" for name, size in sizes.items()))
+    return KnowledgeRetriever(indexes, sizes, IntentRouter.from_seeds(embeddings), reranker)
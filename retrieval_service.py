@@ -0,0 +1,355 @@
+"""
+Retrieval tier of the UW-Madison CS Advisor backend, in process or remote.
+
+Retrieval (query embedding, routing, dense search and cross-encoder
+re-ranking) is CPU-bound and needs both HuggingFace models in memory, while
+the rest of a `/chat` request mostly waits on DynamoDB and the LLM. The API
+therefore talks to retrieval through one of two interchangeable backends:
+
+- `LocalRetrieval` loads the models and the index in process. This is the
+  default and what AWS Lambda uses.
+- `RemoteRetrieval` sends the same calls to a separate retrieval service over
+  a pooled HTTP session. It is used when `RETRIEVAL_SERVICE_URL` is set.
+
+With a remote service, API replicas hold no models and can be scaled on LLM
+concurrency alone, while the retrieval service is scaled on CPU. Concurrent
+requests from every replica reach the same micro-batchers in the service, so
+they share embedding and re-ranking forward passes.
+
+Run the service with:
+    uvicorn retrieval_service:service --port 8100
+and start the API with RETRIEVAL_SERVICE_URL=http://localhost:8100.
+"""
+
+# --- Core Imports ---
+import os
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+# --- HTTP Imports ---
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- FastAPI Imports ---
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+# --- LangChain Imports ---
+from langchain.schema import Document
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+from langchain.retrievers.document_compressors import CrossEncoderReranker
+
+# --- Local Imports ---
+import metrics
+import query_analysis
+from batching import BatchedEmbeddings, BatchedCrossEncoder
+from faq_cache import knowledge_base_hash
+from retrieval import build_retriever, chunk_id, IntentRouter, KnowledgeRetriever
+from shared_index import SHARED_INDEX_DIR, EMBEDDING_MODEL_NAME, load_snapshot, model_load_lock, report_worker_memory
+from tracing import candidate_records
+
+# --- Remote Settings ---
+RETRIEVAL_SERVICE_URL = os.getenv("RETRIEVAL_SERVICE_URL", "")
+RETRIEVAL_TIMEOUT_S = float(os.getenv("RETRIEVAL_TIMEOUT_S", "10"))
+# Keep-alive connections per API process; size it to the API's request concurrency.
+RETRIEVAL_POOL_SIZE = int(os.getenv("RETRIEVAL_POOL_SIZE", "32"))
+RETRIEVAL_RETRIES = int(os.getenv("RETRIEVAL_RETRIES", "2"))
+
+RETRIEVAL_RPC_SECONDS = metrics.Histogram(
+    "badgerbot_retrieval_rpc_seconds",
+    "Round-trip time of calls to the remote retrieval service.",
+    "method",
+)
+
+# --- Local Backend ---
+
+class LocalRetrieval:
+    """Runs retrieval in process with the given embeddings and `KnowledgeRetriever`."""
+
+    def __init__(self, embeddings, retriever: KnowledgeRetriever):
+        self.embeddings = embeddings
+        self.retriever = retriever
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def retrieve(self, query: str, timings: dict = None, query_embedding=None, course_filter: dict = None,
+                 trace: dict = None) -> list:
+        """
+        Runs the retrieval stages separately, intent routing, dense vector search
+        over the routed collections, and cross-encoder re-ranking, so that each
+        can be timed on its own. A query embedding computed earlier in the
+        request can be passed in to avoid embedding the same text twice. When a
+        `trace` is given, the searched collections and every candidate's scores
+        are recorded into it.
+        """
+        with metrics.timed("routing", timings):
+            if query_embedding is None:
+                query_embedding = self.embeddings.embed_query(query)
+            collections = self.retriever.select_collections(query, query_embedding, course_filter)
+        with metrics.timed("dense_search", timings):
+            candidates = self.retriever.dense_search(query_embedding, collections, course_filter, with_distances=True)
+            kept = self.retriever.prune_candidates(candidates)
+        with metrics.timed("rerank", timings):
+            scored = self.retriever.score_candidates(query, [document for document, _ in kept])
+        top_n = self.retriever.reranker.top_n
+
+        if trace is not None:
+            distances = {chunk_id(document): round(float(distance), 4) for document, distance in candidates}
+            trace["collections"] = collections
+            trace["candidates"] = candidate_records(
+                [(chunk_id(document), score) for document, score in scored], top_n, distances,
+                [(chunk_id(document), distance) for document, distance in candidates[len(kept):]],
+            )
+        return [document for document, _ in scored[:top_n]]
+
+    def retrieve_batch(self, queries: List[str], top_n: int, timings: dict = None) -> list:
+        """
+        Resolves many queries with one embedding pass, one matrix query per
+        collection and one cross-encoder pass. Returns each query's routed
+        collections and ranked chunks.
+        """
+        # 1. Embed every query in a single forward pass.
+        with metrics.timed("batch_embed", timings):
+            embeddings = self.embeddings.embed_documents(queries)
+
+        # 2. Route each query and build its course filter, then search the collections.
+        with metrics.timed("routing", timings):
+            course_filters = [query_analysis.build_course_filter(query) for query in queries]
+            collections = [
+                self.retriever.select_collections(query, embedding, course_filter)
+                for query, embedding, course_filter in zip(queries, embeddings, course_filters)
+            ]
+        with metrics.timed("dense_search", timings):
+            candidates = self.retriever.batch_dense_search(embeddings, collections, course_filters, with_distances=True)
+            candidates = [[document for document, _ in self.retriever.prune_candidates(pairs)] for pairs in candidates]
+
+        # 3. Re-rank the candidates of all queries together.
+        with metrics.timed("rerank", timings):
+            ranked = self.retriever.batch_rerank(queries, candidates, top_n)
+
+        return [
+            {
+                "query": query,
+                "collections": names,
+                "documents": [
+                    {"source": document.metadata.get("source"), "content": document.page_content, "score": score}
+                    for document, score in pairs
+                ],
+            }
+            for query, names, pairs in zip(queries, collections, ranked)
+        ]
+
+
+def load_local_retrieval(kb_hash: str = None) -> LocalRetrieval:
+    """
+    Loads the models and the retrieval index. In preload mode (SHARED_INDEX_DIR)
+    the index is mapped from the shared snapshot and workers take turns
+    loading the models.
+    """
+    kb_hash = kb_hash or knowledge_base_hash()
+    snapshot = load_snapshot(SHARED_INDEX_DIR, kb_hash) if SHARED_INDEX_DIR else None
+    if SHARED_INDEX_DIR and snapshot is None:
+        print(f"No usable shared index in {SHARED_INDEX_DIR}; building a private one.")
+
+    # 1. Load the embedding model. Query embeddings from concurrent requests are
+    #    micro-batched into a single forward pass.
+    # 2. Configure the re-ranking model. Like the query embeddings, re-ranking pairs
+    #    from concurrent requests are scored together.
+    #    In preload mode, workers take turns loading the models.
+    with (model_load_lock(SHARED_INDEX_DIR) if SHARED_INDEX_DIR else nullcontext(0.0)) as model_lock_wait:
+        query_embeddings = BatchedEmbeddings(HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME))
+        cross_encoder_model = BatchedCrossEncoder(HuggingFaceCrossEncoder(model_name="cross-encoder/ms-marco-MiniLM-L-6-v2"))
+    compressor = CrossEncoderReranker(model=cross_encoder_model, top_n=4)
+
+    # 3. Chunk the knowledge base into one vector-store collection per kind of content
+    #    (courses, major, gen-ed, careers) and build the intent router over them.
+    #    In preload mode the chunks, their embeddings and the router centroids are
+    #    mapped from the shared index instead of being embedded again.
+    if snapshot:
+        indexes, sizes, centroids = snapshot
+        retriever = KnowledgeRetriever(indexes, sizes, IntentRouter(centroids), compressor)
+        print(f"Mapped shared index from {SHARED_INDEX_DIR}.")
+    else:
+        retriever = build_retriever(query_embeddings, compressor)
+
+    backend = LocalRetrieval(query_embeddings, retriever)
+    backend.shared_index = bool(snapshot)
+    backend.model_lock_wait_s = round(model_lock_wait, 3)
+    return backend
+
+# --- Remote Backend ---
+
+class RemoteRetrieval:
+    """
+    Calls a retrieval service with the same interface as `LocalRetrieval`.
+    Connections are kept alive in a pool shared by all request threads, and
+    idempotent calls are retried on connection errors and 502-504 responses.
+    """
+
+    def __init__(self, base_url: str, timeout: float = RETRIEVAL_TIMEOUT_S, pool_size: int = RETRIEVAL_POOL_SIZE,
+                 retries: int = RETRIEVAL_RETRIES):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=0.05, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset({"GET", "POST"}))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, path: str, payload: dict, timings: dict = None) -> dict:
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            body = response.json()
+        finally:
+            elapsed = time.perf_counter() - start
+            RETRIEVAL_RPC_SECONDS.observe(path, elapsed)
+        # The service's own stage timings are reported alongside the round trip,
+        # so the difference is the network and serialization overhead.
+        if timings is not None:
+            timings["retrieval_rpc"] = timings.get("retrieval_rpc", 0.0) + elapsed
+            for stage, seconds in body.get("timings", {}).items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+        return body
+
+    def ready(self) -> bool:
+        """Returns whether the service is up and has loaded its models."""
+        try:
+            return self.session.get(f"{self.base_url}/", timeout=self.timeout).json().get("ready", False)
+        except (requests.RequestException, ValueError):
+            return False
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._post("/embed", {"texts": [text]})["embeddings"][0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._post("/embed", {"texts": texts})["embeddings"]
+
+    def retrieve(self, query: str, timings: dict = None, query_embedding=None, course_filter: dict = None,
+                 trace: dict = None) -> list:
+        body = self._post("/retrieve", {
+            "query": query,
+            "query_embedding": list(query_embedding) if query_embedding is not None else None,
+            "course_filter": course_filter,
+            "trace": trace is not None,
+        }, timings)
+        if trace is not None:
+            trace.update(body.get("trace") or {})
+        return [Document(page_content=item["content"], metadata=item["metadata"]) for item in body["documents"]]
+
+    def retrieve_batch(self, queries: List[str], top_n: int, timings: dict = None) -> list:
+        return self._post("/retrieve/batch", {"queries": queries, "top_n": top_n}, timings)["results"]
+
+# --- Retrieval Service ---
+
+class EmbedRequest(BaseModel):
+    """Texts to embed with the query embedding model."""
+    texts: List[str]
+
+class RetrieveRequest(BaseModel):
+    """A single retrieval, optionally with the query's embedding and course filter already computed."""
+    query: str
+    query_embedding: Optional[List[float]] = None
+    course_filter: Optional[Dict] = None
+    # Return the searched collections and candidate scores for the caller's trace.
+    trace: bool = False
+
+class RetrieveBatchRequest(BaseModel):
+    """Many retrievals resolved together."""
+    queries: List[str]
+    top_n: int = 4
+
+service = FastAPI(
+    title="UW-Madison CS Advisor Retrieval Service",
+    description="Embedding, routed dense search, and re-ranking for the CS Advisor API tier.",
+    version="1.0.0",
+)
+
+local_retrieval = None
+
+
+@service.on_event("startup")
+def load_service_models():
+    """Loads the models and index once per service worker."""
+    global local_retrieval
+    startup_start = time.perf_counter()
+    local_retrieval = load_local_retrieval()
+    print("Retrieval service ready.")
+    if SHARED_INDEX_DIR:
+        report_worker_memory(SHARED_INDEX_DIR, shared_index=local_retrieval.shared_index,
+                             model_lock_wait_s=local_retrieval.model_lock_wait_s,
+                             startup_s=round(time.perf_counter() - startup_start, 3))
+
+
+def _require_ready():
+    """Rejects requests that arrive before the models have loaded."""
+    if not local_retrieval:
+        raise HTTPException(status_code=503, detail="Retrieval models are not loaded.")
+
+
+@service.post("/embed")
+def embed(request: EmbedRequest):
+    """
+    Embeds texts with the query embedding model. A single text is a query
+    from an API replica's `embed_query` and joins the micro-batcher, so that
+    queries from every replica share forward passes; a list is already a
+    batch and is embedded as one.
+    """
+    _require_ready()
+    timings = {}
+    with metrics.timed("embed", timings):
+        if len(request.texts) == 1:
+            embeddings = [local_retrieval.embed_query(request.texts[0])]
+        else:
+            embeddings = local_retrieval.embed_documents(request.texts)
+    return {"embeddings": [list(map(float, embedding)) for embedding in embeddings], "timings": timings}
+
+
+@service.post("/retrieve")
+def retrieve(request: RetrieveRequest, response: Response):
+    """
+    Routes, searches and re-ranks a single query, returning the top chunks
+    with the stage timings and, when requested, the candidate trace.
+    """
+    _require_ready()
+    timings = {}
+    trace = {} if request.trace else None
+    documents = local_retrieval.retrieve(request.query, timings, request.query_embedding, request.course_filter, trace)
+    response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+    return {
+        "documents": [{"content": document.page_content, "metadata": document.metadata} for document in documents],
+        "timings": timings,
+        "trace": trace,
+    }
+
+
+@service.post("/retrieve/batch")
+def retrieve_batch(request: RetrieveBatchRequest, response: Response):
+    """Resolves many queries together with one embedding and one re-ranking pass."""
+    _require_ready()
+    timings = {}
+    results = local_retrieval.retrieve_batch(request.queries, request.top_n, timings)
+    response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+    return {"results": results, "timings": timings}
+
+
+@service.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Exposes the service's stage and batch-size histograms in the Prometheus text format."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@service.get("/")
+def read_root():
+    """Health check; `ready` turns true once the models and index are loaded."""
+    return {"status": "Retrieval service is running.", "ready": local_retrieval is not None}
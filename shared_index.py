@@ -0,0 +1,289 @@
+"""
+Preload mode: one read-only retrieval index shared by every worker.
+
+When `main:app` runs under gunicorn or uvicorn with several workers, each
+worker used to chunk and embed the whole knowledge base on startup and keep
+its own Chroma copy of the result. That meant N cold embedding passes and N
+copies of the index.
+
+In preload mode the index is built once, before the workers start, into a
+snapshot directory (on `/dev/shm` by default, so it lives in shared memory):
+
+- `<collection>.npy`: the chunk embedding matrix, one float32 row per chunk.
+- `<collection>.json`: the chunk texts and metadata.
+- `router.npy`: the intent router's collection centroids.
+- `manifest.json`: the knowledge-base hash and embedding model the snapshot was
+  built from, so workers never map a stale index.
+
+Workers memory-map the matrices read-only. Whether they are forked from a
+preloaded master (gunicorn) or spawned fresh (`uvicorn --workers`), every
+worker maps the same physical pages. Searching is an exact matrix product over
+the mapped rows, with Chroma's squared-L2 distance and `where` filter syntax.
+
+The embedding model and cross-encoder are still loaded by each worker, after
+the fork: the models hold thread pools and allocator state that must not be
+inherited. Workers take a file lock around model loading so only one reads
+the weights at a time, instead of N workers spiking memory and disk together.
+
+Each worker records its memory use (RSS, PSS and shared pages) in the snapshot
+directory after startup; `python shared_index.py status` prints it per worker.
+
+Usage:
+    python shared_index.py build [--dir /dev/shm/badgerbot-index]
+    python shared_index.py status [--dir /dev/shm/badgerbot-index]
+"""
+
+# --- Core Imports ---
+import argparse
+import fcntl
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# --- Local Imports ---
+import metrics
+
+# --- Preload Settings ---
+# Set SHARED_INDEX_DIR to enable preload mode in `main.load_retriever`.
+_DEFAULT_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+SHARED_INDEX_DIR = os.getenv("SHARED_INDEX_DIR", "")
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+MANIFEST_FILE = "manifest.json"
+ROUTER_FILE = "router.npy"
+MODEL_LOCK_FILE = "model-load.lock"
+WORKERS_DIR = "workers"
+
+WORKER_MEMORY = metrics.Histogram(
+    "badgerbot_worker_memory_bytes",
+    "Worker memory after startup, by kind (rss, pss, shared).",
+    "kind",
+    buckets=tuple(2 ** power * 1024 * 1024 for power in range(4, 14)),
+)
+
+
+def default_directory() -> str:
+    return SHARED_INDEX_DIR or os.path.join(_DEFAULT_DIR, "badgerbot-index")
+
+# --- Where Filters ---
+
+_OPERATORS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def matches_filter(metadata: dict, where: dict) -> bool:
+    """Evaluates a Chroma `where` filter against one chunk's metadata."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_OPERATORS[operator](value, operand) for operator, operand in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+# --- Shared Index ---
+
+class SharedMatrixIndex:
+    """
+    Exact nearest-neighbour search over a memory-mapped embedding matrix,
+    answering queries in the same shape as a Chroma collection's `query`.
+    """
+
+    def __init__(self, matrix: np.ndarray, texts: list, metadatas: list):
+        self.matrix = matrix
+        self.texts = texts
+        self.metadatas = metadatas
+        # Row norms are small and private to each worker; the matrix itself is never written.
+        self.norms = np.einsum("ij,ij->i", matrix, matrix)
+
+    def query(self, query_embeddings, n_results: int, where: dict = None, include=None) -> dict:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        distances = (queries * queries).sum(axis=1)[:, None] + self.norms[None, :] - 2 * (queries @ self.matrix.T)
+        allowed = np.arange(len(self.texts))
+        if where:
+            allowed = np.asarray([row for row in allowed if matches_filter(self.metadatas[row], where)], dtype=int)
+
+        result = {"documents": [], "metadatas": [], "distances": []}
+        for row_distances in distances:
+            candidate_distances = row_distances[allowed]
+            order = allowed[np.argsort(candidate_distances, kind="stable")[:n_results]]
+            result["documents"].append([self.texts[row] for row in order])
+            result["metadatas"].append([self.metadatas[row] for row in order])
+            result["distances"].append([float(row_distances[row]) for row in order])
+        return result
+
+# --- Snapshot Build and Load ---
+
+def build_snapshot(embeddings, directory: str, kb_hash: str, model_name: str = EMBEDDING_MODEL_NAME) -> dict:
+    """
+    Chunks and embeds every collection once and writes the snapshot. Files are
+    written under temporary names and renamed, so a worker never maps a
+    half-written matrix.
+    """
+    from retrieval import chunk_collections, IntentRouter
+
+    os.makedirs(directory, exist_ok=True)
+    sizes = {}
+    for name, chunks in chunk_collections().items():
+        matrix = np.asarray(embeddings.embed_documents([chunk.page_content for chunk in chunks]), dtype=np.float32)
+        _atomic_save(os.path.join(directory, f"{name}.npy"), lambda f, m=matrix: np.save(f, m))
+        payload = {"texts": [chunk.page_content for chunk in chunks], "metadatas": [chunk.metadata for chunk in chunks]}
+        _atomic_save(os.path.join(directory, f"{name}.json"), lambda f, p=payload: f.write(json.dumps(p).encode("utf-8")))
+        sizes[name] = len(chunks)
+
+    router = IntentRouter.from_seeds(embeddings)
+    _atomic_save(os.path.join(directory, ROUTER_FILE), lambda f: np.save(f, router.centroids))
+
+    manifest = {"knowledge_base_hash": kb_hash, "embedding_model": model_name, "collections": sizes,
+                "router_collections": router.names, "built_at": int(time.time())}
+    _atomic_save(os.path.join(directory, MANIFEST_FILE), lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+    print(f"Built shared index in {directory}: " + ", ".join(f"{name} ({size} chunks)" for name, size in sizes.items()))
+    return manifest
+
+
+def _atomic_save(path: str, write):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        write(f)
+    os.replace(temporary, path)
+
+
+def load_snapshot(directory: str, kb_hash: str, model_name: str = EMBEDDING_MODEL_NAME):
+    """
+    Maps a snapshot read-only. Returns `(indexes, sizes, router_centroids)`, or
+    None when the snapshot is missing or was built from other content.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("knowledge_base_hash") != kb_hash or manifest.get("embedding_model") != model_name:
+        print(f"Shared index in {directory} is stale; ignoring it.")
+        return None
+
+    indexes, sizes = {}, {}
+    for name, size in manifest["collections"].items():
+        matrix = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        with open(os.path.join(directory, f"{name}.json")) as f:
+            payload = json.load(f)
+        indexes[name] = SharedMatrixIndex(matrix, payload["texts"], payload["metadatas"])
+        sizes[name] = size
+    centroids = np.load(os.path.join(directory, ROUTER_FILE))
+    return indexes, sizes, dict(zip(manifest["router_collections"], centroids))
+
+# --- Worker Coordination ---
+
+@contextmanager
+def model_load_lock(directory: str):
+    """Serializes model loading across the workers sharing `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, MODEL_LOCK_FILE), "a") as lock_file:
+        start = time.perf_counter()
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        waited = time.perf_counter() - start
+        try:
+            yield waited
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def memory_usage(pid: int = None) -> dict:
+    """
+    Returns a process's resident (RSS), proportional (PSS) and shared memory in
+    bytes. PSS splits each shared page between the processes mapping it, so
+    summing it across workers gives their real combined footprint.
+    """
+    usage = {"rss": 0, "pss": 0, "shared": 0}
+    try:
+        with open(f"/proc/{pid or 'self'}/smaps_rollup") as f:
+            for line in f:
+                field, _, value = line.partition(":")
+                if field == "Rss":
+                    usage["rss"] = int(value.split()[0]) * 1024
+                elif field == "Pss":
+                    usage["pss"] = int(value.split()[0]) * 1024
+                elif field in ("Shared_Clean", "Shared_Dirty"):
+                    usage["shared"] += int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        # Without /proc (e.g. macOS), fall back to the peak RSS of this process.
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage["rss"] = peak if sys.platform == "darwin" else peak * 1024
+    return usage
+
+
+def report_worker_memory(directory: str, **details) -> dict:
+    """Records this worker's memory use in the metrics and in the snapshot directory."""
+    usage = memory_usage()
+    for kind, value in usage.items():
+        WORKER_MEMORY.observe(kind, value)
+    record = {"pid": os.getpid(), "reported_at": int(time.time()), **usage, **details}
+    workers_dir = os.path.join(directory, WORKERS_DIR)
+    os.makedirs(workers_dir, exist_ok=True)
+    _atomic_save(os.path.join(workers_dir, f"{os.getpid()}.json"), lambda f: f.write(json.dumps(record).encode("utf-8")))
+    print(f"Worker {os.getpid()} ready: RSS {usage['rss'] / 2**20:.0f} MB, PSS {usage['pss'] / 2**20:.0f} MB, "
+          f"shared {usage['shared'] / 2**20:.0f} MB.")
+    return record
+
+
+def print_status(directory: str):
+    """Prints the current memory use of every live worker that reported into `directory`."""
+    workers_dir = os.path.join(directory, WORKERS_DIR)
+    names = sorted(os.listdir(workers_dir)) if os.path.isdir(workers_dir) else []
+    print(f"{'pid':>8} {'RSS MB':>8} {'PSS MB':>8} {'shared MB':>10} {'lock wait s':>12} {'startup s':>10}")
+    totals = {"rss": 0, "pss": 0}
+    for name in names:
+        with open(os.path.join(workers_dir, name)) as f:
+            record = json.load(f)
+        try:
+            os.kill(record["pid"], 0)
+        except OSError:
+            os.remove(os.path.join(workers_dir, name))  # The worker has exited.
+            continue
+        usage = memory_usage(record["pid"])
+        totals["rss"] += usage["rss"]
+        totals["pss"] += usage["pss"]
+        print(f"{record['pid']:>8} {usage['rss'] / 2**20:>8.0f} {usage['pss'] / 2**20:>8.0f} "
+              f"{usage['shared'] / 2**20:>10.0f} {record.get('model_lock_wait_s', 0):>12.2f} {record.get('startup_s', 0):>10.2f}")
+    print(f"{'total':>8} {totals['rss'] / 2**20:>8.0f} {totals['pss'] / 2**20:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the shared retrieval index, or report worker memory.")
+    parser.add_argument("command", choices=["build", "status"])
+    parser.add_argument("--dir", default=default_directory(), help="Snapshot directory (default: SHARED_INDEX_DIR or /dev/shm).")
+    parser.add_argument("--force", action="store_true", help="With 'build', rebuild even if the snapshot is current.")
+    args = parser.parse_args()
+    if args.command == "build":
+        from faq_cache import knowledge_base_hash
+        kb_hash = knowledge_base_hash()
+        if not args.force and load_snapshot(args.dir, kb_hash) is not None:
+            print(f"Shared index in {args.dir} is up to date.")
+        else:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            build_snapshot(HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME), args.dir, kb_hash)
+    else:
+        print_status(args.dir)
@@ -0,0 +1,69 @@
+"""
+Single-flight request coalescing for the UW-Madison CS Advisor backend.
+
+When several requests for the same key arrive while one is already being
+processed, only the first (the "leader") executes the work. The others wait for
+the leader to finish and share its result, so a burst of identical questions
+costs a single retrieval and generation.
+"""
+
+# --- Core Imports ---
+import threading
+
+
+class _Call:
+    """Tracks a single in-flight computation and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share the same key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Executes `fn` for `key`, unless a call for the same key is already in
+        flight, in which case this blocks until that call completes and reuses
+        its outcome. Returns a `(result, shared)` tuple, where `shared` is True
+        for callers that piggybacked on another request. Errors raised by the
+        leader are re-raised in every waiting caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # The key is released before waking the waiters so that any request
+            # arriving from now on starts a fresh call instead of a stale one.
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """Returns the number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,9 @@
+"""Shared test setup: makes the flat modules importable and gives `main` the settings it reads on import."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("TOGETHER_API_KEY", "test")
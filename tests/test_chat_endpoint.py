@@ -0,0 +1,48 @@
+"""Tests for which `/chat` answers the client may cache."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    saved, seen = [], []
+
+    def save_chat_turn(session_id, chat_history, turn, question, answer):
+        saved.append((question, answer))
+        return turn + 1
+
+    def run_conversational_rag(question, chat_history, *args, **kwargs):
+        seen.append([message.content for message in chat_history])
+        return f"answer to {question}"
+
+    monkeypatch.setattr(main, "initialized", True)
+    monkeypatch.setattr(main, "retrieval_backend", object())
+    monkeypatch.setattr(main, "faq_cache", None)
+    monkeypatch.setattr(main, "save_chat_turn", save_chat_turn)
+    monkeypatch.setattr(main, "run_conversational_rag", run_conversational_rag)
+    return TestClient(main.app), saved, seen
+
+
+def test_first_question_is_cacheable(client):
+    http, saved, seen = client
+    body = http.post("/chat", json={"question": "What is CS 400?"}).json()
+
+    assert body["cacheable"] is True
+    assert seen == [[]]
+    assert saved == [("What is CS 400?", "answer to What is CS 400?")]
+
+
+def test_cached_first_turn_starts_the_session(client):
+    http, saved, seen = client
+    body = http.post("/chat", json={
+        "question": "What are its prerequisites?",
+        "cached_turn": {"question": "What is CS 400?", "answer": "A data structures course."},
+    }).json()
+
+    assert body["cacheable"] is False
+    assert body["turn"] == 2
+    assert seen == [["What is CS 400?", "A data structures course."]]
+    assert saved[0] == ("What is CS 400?", "A data structures course.")
@@ -0,0 +1,107 @@
+"""Tests for the DynamoDB chat-history layouts, against moto's in-memory DynamoDB."""
+
+import boto3
+import pytest
+
+import chat_store
+
+moto = pytest.importorskip("moto")
+
+
+@pytest.fixture
+def store():
+    with moto.mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        dynamodb.create_table(
+            TableName=chat_store.SESSION_TABLE,
+            KeySchema=[{"AttributeName": "session_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "session_id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield chat_store.create_chat_store(chat_store.SESSION_LAYOUT, dynamodb)
+
+
+@pytest.fixture
+def turn_store():
+    with moto.mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        dynamodb.create_table(
+            TableName=chat_store.TURNS_TABLE,
+            KeySchema=[
+                {"AttributeName": "session_id", "KeyType": "HASH"},
+                {"AttributeName": "turn", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "session_id", "AttributeType": "S"},
+                {"AttributeName": "turn", "AttributeType": "N"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield chat_store.create_chat_store(chat_store.TURNS_LAYOUT, dynamodb)
+
+
+def contents(messages):
+    return [message.content for message in messages]
+
+
+def test_append_at_current_turn_skips_reread(store):
+    assert store.append("s1", "q1", "a1", 0) == (1, None)
+    assert store.append("s1", "q2", "a2", 1) == (2, None)
+
+    history, turn = store.load("s1")
+    assert turn == 2
+    assert contents(history) == ["q1", "a1", "q2", "a2"]
+
+
+def test_stale_append_rereads_and_appends_after_latest_turn(store):
+    store.append("s1", "q1", "a1", 0)
+    # Another process appended turn 2 after this one read the session at turn 1.
+    store.append("s1", "q2", "a2", 1)
+
+    new_turn, refreshed = store.append("s1", "q3", "a3", 1)
+
+    assert new_turn == 3
+    assert contents(refreshed) == ["q1", "a1", "q2", "a2", "q3", "a3"]
+    history, turn = store.load("s1")
+    assert turn == 3
+    assert contents(history) == contents(refreshed)
+
+
+def test_legacy_item_without_turn_counter(store):
+    store.table.put_item(Item={"session_id": "s1", "messages": [
+        {"type": "human", "content": "q1"}, {"type": "ai", "content": "a1"},
+    ]})
+
+    assert store.append("s1", "q2", "a2", 1) == (2, None)
+    assert store.load("s1")[1] == 2
+
+
+def test_turn_append_at_current_turn_skips_reread(turn_store):
+    assert turn_store.append("s1", "q1", "a1", 0) == (1, None)
+    assert turn_store.append("s1", "q2", "a2", 1) == (2, None)
+
+    history, turn = turn_store.load("s1")
+    assert turn == 2
+    assert contents(history) == ["q1", "a1", "q2", "a2"]
+
+
+def test_stale_turn_append_rereads_consistently(turn_store, monkeypatch):
+    turn_store.append("s1", "q1", "a1", 0)
+    # Another process claimed turn 2 after this one read the session at turn 1.
+    turn_store.append("s1", "q2", "a2", 1)
+    reads = []
+    query = turn_store.table.query
+
+    def recording_query(**kwargs):
+        reads.append(kwargs.get("ConsistentRead"))
+        return query(**kwargs)
+
+    monkeypatch.setattr(turn_store.table, "query", recording_query)
+    new_turn, refreshed = turn_store.append("s1", "q3", "a3", 1)
+
+    assert reads == [True]
+    assert new_turn == 3
+    assert contents(refreshed) == ["q1", "a1", "q2", "a2", "q3", "a3"]
+    history, turn = turn_store.load("s1")
+    assert turn == 3
+    assert contents(history) == contents(refreshed)
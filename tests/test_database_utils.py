@@ -0,0 +1,57 @@
+"""Tests for SQLite chat-history expiry."""
+
+import time
+
+import pytest
+
+import database_utils
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database_utils, "DB_PATH", str(tmp_path / "history.db"))
+    monkeypatch.setattr(database_utils, "CHAT_HISTORY_TTL_DAYS", 30)
+    database_utils.create_chat_history_table()
+    return database_utils
+
+
+def insert_expired(db, session_id: str, count: int):
+    conn = db.get_db_connection()
+    old = int(time.time() - 31 * 86400)
+    conn.executemany(
+        "INSERT INTO chat_history (session_id, message_type, content, created_at) VALUES (?, ?, ?, ?)",
+        [(session_id, "human" if i % 2 == 0 else "ai", f"old message {i}", old) for i in range(count)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def row_count(db, session_id: str) -> int:
+    conn = db.get_db_connection()
+    count = conn.execute("SELECT COUNT(*) FROM chat_history WHERE session_id = ?", (session_id,)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_expire_then_write_again_starts_fresh(db):
+    insert_expired(db, "s1", 10)
+
+    db.add_message_to_history("s1", "human", "new question")
+
+    history = db.get_chat_history("s1")
+    assert [message.content for message in history] == ["new question"]
+    assert row_count(db, "s1") == 1
+
+
+def test_reading_an_expired_session_deletes_it(db):
+    insert_expired(db, "s1", 4)
+
+    assert db.get_chat_history("s1") == []
+    assert row_count(db, "s1") == 0
+
+
+def test_active_session_is_kept(db):
+    db.add_message_to_history("s1", "human", "question")
+    db.add_message_to_history("s1", "ai", "answer")
+
+    assert [message.content for message in db.get_chat_history("s1")] == ["question", "answer"]
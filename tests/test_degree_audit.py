@@ -0,0 +1,45 @@
+"""Tests for the L&S breadth rules of the degree audit."""
+
+import pytest
+
+import degree_audit
+
+HUMANITIES_CATALOG = {
+    "ART HIST 201": {"course_code": "ART HIST 201", "credits": 3, "designation": {"breadth": "Humanities"}},
+    "PHILOS 101": {"course_code": "PHILOS 101", "credits": 3, "designation": {"breadth": "Humanities"}},
+    "MUSIC 113": {"course_code": "MUSIC 113", "credits": 3, "designation": {"breadth": "Humanities"}},
+    "ENGL 241": {"course_code": "ENGL 241", "credits": 3, "designation": {"breadth": "Literature"}},
+    "ENGL 242": {"course_code": "ENGL 242", "credits": 3, "designation": {"breadth": "Literature"}},
+}
+
+
+@pytest.fixture
+def humanities_rule(monkeypatch):
+    monkeypatch.setattr(degree_audit, "_CATALOG", HUMANITIES_CATALOG)
+    return next(rule for rule in degree_audit.compile_rules() if rule["id"] == "ls_humanities")
+
+
+def test_humanities_total_without_enough_literature_is_incomplete(humanities_rule):
+    result = degree_audit._evaluate_credits(
+        humanities_rule, ["ART HIST 201", "PHILOS 101", "MUSIC 113", "ENGL 241"], {}, [])
+
+    assert result["status"] == degree_audit.INCOMPLETE
+    assert "remaining" not in result
+    literature = result["sub_requirements"][0]
+    assert literature["id"] == "ls_literature"
+    assert literature["status"] == degree_audit.INCOMPLETE
+    assert literature["remaining"] == {"credits": 3}
+
+
+def test_humanities_with_six_literature_credits_is_complete(humanities_rule):
+    result = degree_audit._evaluate_credits(
+        humanities_rule, ["ART HIST 201", "PHILOS 101", "ENGL 241", "ENGL 242"], {}, [])
+
+    assert result["status"] == degree_audit.COMPLETE
+    assert result["sub_requirements"][0]["status"] == degree_audit.COMPLETE
+
+
+def test_format_audit_lists_literature_under_humanities():
+    text = degree_audit.format_audit(degree_audit.audit(["CS 200", "CS 300"]))
+
+    assert "- L&S Breadth: Humanities: incomplete; 12 more credits needed\n  - of which Literature: incomplete; 6 more credits needed" in text
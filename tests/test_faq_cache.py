@@ -0,0 +1,34 @@
+"""Smoke test for the offline FAQ cache build (`python faq_cache.py`)."""
+
+import json
+import os
+import runpy
+import sys
+
+import main
+import faq_cache
+
+FAQ_CACHE_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faq_cache.py")
+
+
+class StubBackend:
+    """Stands in for the retrieval backend; only embeddings are needed by the build."""
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_main_build_path_uses_retrieval_backend(tmp_path, monkeypatch):
+    output = tmp_path / "faq_answers.json"
+    monkeypatch.setattr(main, "load_retriever", lambda: setattr(main, "retrieval_backend", StubBackend()))
+    monkeypatch.setattr(main, "run_conversational_rag", lambda question, chat_history: f"Answer to: {question}")
+    monkeypatch.setattr(sys, "argv", ["faq_cache.py", "--force", "--output", str(output)])
+
+    runpy.run_path(FAQ_CACHE_SCRIPT, run_name="__main__")
+
+    cache = json.loads(output.read_text())
+    assert cache["kb_hash"] == faq_cache.knowledge_base_hash()
+    assert [entry["intent"] for entry in cache["intents"]] == [intent["intent"] for intent in faq_cache.FAQ_INTENTS]
+    first = cache["intents"][0]
+    assert first["answer"] == f"Answer to: {faq_cache.FAQ_INTENTS[0]['question']}"
+    assert len(first["embeddings"]) == len(faq_cache.FAQ_INTENTS[0]["paraphrases"])
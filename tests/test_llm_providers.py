@@ -0,0 +1,37 @@
+"""Tests for the hedge delay of the LLM provider layer."""
+
+import pytest
+
+import llm_providers
+
+
+def test_window_quantile_is_exact():
+    window = llm_providers.LatencyWindow(size=100)
+    for seconds in range(1, 101):
+        window.observe(seconds / 100)
+
+    assert window.quantile(0.5) == pytest.approx(0.505)
+    assert window.quantile(0.95) == pytest.approx(0.9505)
+    assert window.quantile(1.0) == pytest.approx(1.0)
+
+
+def test_window_keeps_only_recent_latencies():
+    window = llm_providers.LatencyWindow(size=3)
+    for seconds in (5.0, 5.0, 5.0, 0.1, 0.2, 0.3):
+        window.observe(seconds)
+
+    assert window.count() == 3
+    assert window.quantile(1.0) == pytest.approx(0.3)
+
+
+def test_hedge_delay_waits_for_enough_samples(monkeypatch):
+    monkeypatch.setattr(llm_providers, "_latency_windows", {})
+    backend = llm_providers.StubBackend()
+    llm = llm_providers.ProviderLLM(backends=(backend,))
+    for _ in range(llm_providers.LLM_HEDGE_MIN_SAMPLES - 1):
+        llm_providers.latency_window(backend.name).observe(0.3)
+    assert llm._hedge_delay(backend) is None
+
+    llm_providers.latency_window(backend.name).observe(0.3)
+    # A histogram would report the 0.5s bucket bound here.
+    assert llm._hedge_delay(backend) == pytest.approx(0.3)
@@ -0,0 +1,19 @@
+"""Tests for `/plan` request validation."""
+
+from fastapi.testclient import TestClient
+
+import main
+import planner
+
+
+def test_inverted_credit_range_is_rejected_before_planning(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("the planner should not run for invalid input")
+
+    monkeypatch.setattr(planner, "generate_plan", fail)
+    # Validation needs no models; skip the retriever load the first request would trigger.
+    monkeypatch.setattr(main, "initialized", True)
+    response = TestClient(main.app).post("/plan", json={"terms": ["Fall 2026"], "min_credits": 18, "max_credits": 12})
+
+    assert response.status_code == 422
+    assert "min_credits (18) must not exceed max_credits (12)" in response.text
@@ -0,0 +1,36 @@
+"""Tests for the four-year-plan search budget and credit caps."""
+
+import time
+
+import pytest
+
+import planner
+from knowledge_base import all_course_data
+
+CS_CATALOG = [course["course_code"] for course in all_course_data if course["course_code"].startswith("COMP SCI")]
+TERMS = [f"Term {i}" for i in range(9)]
+
+
+def test_credit_caps_include_fractional_sums():
+    assert planner._credit_caps([3.0, 4.0, 1.5], 4.2, 9.5) == [4.5, 5.5, 7.0, 8.5]
+
+
+def test_fractional_max_credits_is_tried_exactly():
+    plan = planner.generate_plan([], TERMS[:8], course_credits={"CS 200": 3.5}, max_credits=15.5)
+
+    assert max(term["major_credits"] for term in plan["terms"]) <= 15.5
+
+
+def test_wide_catalog_search_stops_at_the_budget(monkeypatch):
+    monkeypatch.setattr(planner, "PLAN_TIMEOUT_S", 0.5)
+    start = time.perf_counter()
+
+    with pytest.raises(planner.PlanningError, match="search budget"):
+        planner.generate_plan([], TERMS, CS_CATALOG[-40:])
+    assert time.perf_counter() - start < 2.0
+
+
+def test_skipped_caps_still_find_a_plan():
+    plan = planner.generate_plan([], TERMS[:6], CS_CATALOG[-10:])
+
+    assert plan["search"]["states_explored"] <= planner.PLAN_CAP_STATES + 50
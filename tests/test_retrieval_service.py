@@ -0,0 +1,36 @@
+"""Tests for the retrieval service's `/embed` endpoint."""
+
+from fastapi.testclient import TestClient
+
+import retrieval_service
+
+
+class RecordingRetrieval:
+    def __init__(self):
+        self.calls = []
+
+    def embed_query(self, text):
+        self.calls.append(("query", text))
+        return [1.0, 0.0]
+
+    def embed_documents(self, texts):
+        self.calls.append(("documents", texts))
+        return [[0.0, 1.0] for _ in texts]
+
+
+def test_single_text_joins_the_query_batcher(monkeypatch):
+    backend = RecordingRetrieval()
+    monkeypatch.setattr(retrieval_service, "local_retrieval", backend)
+    response = TestClient(retrieval_service.service).post("/embed", json={"texts": ["what is CS 400?"]})
+
+    assert response.json()["embeddings"] == [[1.0, 0.0]]
+    assert backend.calls == [("query", "what is CS 400?")]
+
+
+def test_many_texts_are_embedded_as_one_batch(monkeypatch):
+    backend = RecordingRetrieval()
+    monkeypatch.setattr(retrieval_service, "local_retrieval", backend)
+    response = TestClient(retrieval_service.service).post("/embed", json={"texts": ["a", "b"]})
+
+    assert response.json()["embeddings"] == [[0.0, 1.0], [0.0, 1.0]]
+    assert backend.calls == [("documents", ["a", "b"])]
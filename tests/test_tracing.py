@@ -0,0 +1,15 @@
+"""Tests for retrieval trace records."""
+
+from tracing import candidate_records
+
+
+def test_candidate_records_marks_kept_and_pruned_chunks():
+    records = candidate_records(
+        [("a#1", 0.9), ("b#2", 0.4)], 1, {"a#1": 0.2, "b#2": 0.5}, [("c#3", 1.23456)],
+    )
+
+    assert records == [
+        {"id": "a#1", "dense_distance": 0.2, "rerank_score": 0.9, "kept": True},
+        {"id": "b#2", "dense_distance": 0.5, "rerank_score": 0.4, "kept": False},
+        {"id": "c#3", "dense_distance": 1.2346, "rerank_score": None, "kept": False, "pruned": True},
+    ]
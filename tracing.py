@@ -0,0 +1,197 @@
+"""
+Sampled per-request retrieval traces for offline profiling.
+
+When an answer is slow or wrong, the stage histograms in `/metrics` cannot
+say which chunks were retrieved or why. With `TRACE_SAMPLE_RATE` above zero, a
+sample of `/chat` requests record a trace with:
+
+- the question, the standalone question, and the answer type and course filter;
+- the collections searched and every dense candidate, by chunk id, with its
+  dense distance, its cross-encoder score, and whether it reached the prompt;
+- the stage durations of the request;
+- estimated token counts of the reformulation and answer prompts.
+
+Traces are appended as JSON lines to `TRACE_DIR/traces.jsonl`, which is
+rotated at `TRACE_MAX_BYTES` keeping `TRACE_BACKUPS` old files.
+
+`python tracing.py report` aggregates the traces into a hot-path report:
+where request time goes, the slowest requests, and which chunks are retrieved
+and re-ranked without ever reaching the prompt.
+"""
+
+# --- Core Imports ---
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import random
+import statistics
+import time
+import uuid
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+# --- Trace Settings ---
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "5"))
+TRACE_FILE = "traces.jsonl"
+
+# Prompts are not tokenized with the provider's tokenizer; about four characters
+# per token is close enough for English text to compare prompt sizes.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+# --- Trace Recording ---
+
+def start_trace(sample_rate: float = TRACE_SAMPLE_RATE):
+    """Returns a new, empty trace for a sampled request, or None."""
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        return None
+    return {"trace_id": uuid.uuid4().hex, "timestamp": round(time.time(), 3)}
+
+
+def candidate_records(scored_candidates: list, kept: int, distances: dict, pruned: list = ()) -> list:
+    """
+    Describes the dense candidates of a query. `scored_candidates` are
+    `(chunk id, cross-encoder score)` pairs, best first, of which the first
+    `kept` go into the prompt. `distances` maps chunk ids to dense distances,
+    and `pruned` holds the `(chunk id, distance)` pairs dropped before re-ranking.
+    """
+    records = []
+    for rank, (identifier, score) in enumerate(scored_candidates):
+        records.append({
+            "id": identifier,
+            "dense_distance": distances.get(identifier),
+            "rerank_score": round(float(score), 4),
+            "kept": rank < kept,
+        })
+    for identifier, distance in pruned:
+        records.append({"id": identifier, "dense_distance": round(float(distance), 4),
+                        "rerank_score": None, "kept": False, "pruned": True})
+    return records
+
+
+class TraceSink:
+    """Appends traces as JSON lines to a size-rotated file."""
+
+    def __init__(self, directory: str = TRACE_DIR, max_bytes: int = TRACE_MAX_BYTES, backups: int = TRACE_BACKUPS):
+        self.directory = directory
+        self._logger = None
+        self._max_bytes = max_bytes
+        self._backups = backups
+
+    def _get_logger(self):
+        if self._logger is None:
+            os.makedirs(self.directory, exist_ok=True)
+            handler = RotatingFileHandler(os.path.join(self.directory, TRACE_FILE), maxBytes=self._max_bytes,
+                                          backupCount=self._backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger(f"badgerbot.traces.{id(self)}")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def write(self, trace: dict, timings: dict):
+        """Adds the request's stage timings (in ms) to the trace and appends it."""
+        trace["stages_ms"] = {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}
+        try:
+            self._get_logger().info(json.dumps(trace, default=str))
+        except Exception as e:
+            print(f"Error writing retrieval trace: {e}")
+
+# --- Offline Report ---
+
+def load_traces(directory: str = TRACE_DIR) -> list:
+    """Reads every trace in the current and rotated files."""
+    traces = []
+    for path in sorted(glob.glob(os.path.join(directory, TRACE_FILE + "*"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    continue
+    return traces
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def print_report(traces: list, top: int = 10):
+    """Prints where request time goes and how retrieval candidates are used."""
+    if not traces:
+        print("No traces found.")
+        return
+    print(f"{len(traces)} traced requests, {Counter(trace.get('path', 'rag') for trace in traces)}")
+
+    # 1. Stage latency and each stage's share of total request time.
+    stages = {}
+    for trace in traces:
+        for stage, ms in trace.get("stages_ms", {}).items():
+            stages.setdefault(stage, []).append(ms)
+    total_time = sum(stages.get("total", [])) or 1.0
+    print(f"\n{'stage':<16} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'share':>7}")
+    for stage, values in sorted(stages.items(), key=lambda item: -sum(item[1])):
+        share = "" if stage == "total" else f"{sum(values) / total_time:>6.0%}"
+        print(f"{stage:<16} {len(values):>6} {_percentile(values, 0.5):>9.1f} {_percentile(values, 0.95):>9.1f} "
+              f"{max(values):>9.1f} {share:>7}")
+
+    # 2. The slowest requests and the stage that dominated each.
+    print("\nSlowest requests:")
+    slowest = sorted(traces, key=lambda trace: -trace.get("stages_ms", {}).get("total", 0))[:top]
+    for trace in slowest:
+        stage_ms = {stage: ms for stage, ms in trace.get("stages_ms", {}).items() if stage != "total"}
+        dominant = max(stage_ms, key=stage_ms.get) if stage_ms else "-"
+        print(f"  {trace.get('stages_ms', {}).get('total', 0):>8.1f} ms  {dominant:<12} "
+              f"{trace.get('standalone_question') or trace.get('question', '')}"[:160])
+
+    # 3. Prompt sizes, and generation time per thousand prompt tokens.
+    prompt_tokens = [trace["prompt_tokens"]["generate"] for trace in traces if trace.get("prompt_tokens", {}).get("generate")]
+    if prompt_tokens:
+        per_k = [trace["stages_ms"]["generate"] / trace["prompt_tokens"]["generate"] * 1000
+                 for trace in traces if trace.get("prompt_tokens", {}).get("generate") and "generate" in trace.get("stages_ms", {})]
+        print(f"\nAnswer prompt tokens (estimated): p50 {_percentile(prompt_tokens, 0.5):.0f}, "
+              f"p95 {_percentile(prompt_tokens, 0.95):.0f}, max {max(prompt_tokens)}; "
+              f"generation {statistics.median(per_k):.0f} ms per 1k prompt tokens (median)")
+
+    # 4. Chunks that are often re-ranked but rarely make it into the prompt: candidates
+    #    the cross-encoder scores for nothing.
+    retrieved, kept = Counter(), Counter()
+    candidates_per_request, pruned = [], 0
+    for trace in traces:
+        candidates = trace.get("candidates", [])
+        if candidates:
+            candidates_per_request.append(len(candidates))
+        for candidate in candidates:
+            if candidate.get("pruned"):
+                pruned += 1
+                continue
+            retrieved[candidate["id"]] += 1
+            kept[candidate["id"]] += candidate.get("kept", False)
+    if retrieved:
+        print(f"\nDense candidates per request: mean {statistics.mean(candidates_per_request):.1f}; "
+              f"{pruned / sum(candidates_per_request):.0%} pruned before re-ranking; "
+              f"{sum(kept.values()) / sum(retrieved.values()):.0%} of re-ranked candidates reach the prompt")
+        print(f"{'re-ranked':>10} {'kept':>6}  chunk (most often re-ranked without being kept)")
+        for identifier, count in sorted(retrieved.items(), key=lambda item: -(item[1] - kept[item[0]]))[:top]:
+            print(f"{count:>10} {kept[identifier]:>6}  {identifier}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate sampled /chat retrieval traces into a hot-path report.")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--dir", default=TRACE_DIR, help="Directory holding traces.jsonl and its rotated files.")
+    parser.add_argument("--top", type=int, default=10, help="Rows to show in the per-request and per-chunk tables.")
+    args = parser.parse_args()
+    print_report(load_traces(args.dir), args.top)